@@ -0,0 +1,271 @@
+"""Mergeable, persisted KPI aggregation state.
+
+Keeps counts, sums and sums of squares per intent, per satisfaction level and
+per mistake bitmask, which is everything calculate_kpis, the intent/quality
+matrix, the mistake Pareto and the co-occurrence matrix need. Each consumed results file is tracked by
+a watermark, so only results appended since the last run are read; states
+built from different files can be merged. A watermark belongs to the results
+path given, whether its JSON array or its .jsonl journal is read.
+"""
+import hashlib
+import json
+import math
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+from storage.jsonl_store import atomic_write, iter_json_array, iter_records, journal_path
+from mistakes import cooccurrence, has_mistake, mistake_counts
+
+STATE_VERSION = 3
+SATISFACTION_LEVELS = ['satisfied', 'neutral', 'unsatisfied']
+INTENT_FIELDS = ['count', 'quality_sum', 'quality_sumsq', 'mistake_chats', 'mistake_count_sum']
+CONSUME_BATCH_SIZE = 50_000
+
+class SourceChangedError(ValueError):
+    """A results file no longer starts with the records its watermark covers."""
+
+def _head_hash(path: Path) -> Optional[str]:
+    """Hash of the first record, the same for a JSON array and its journal; notices a replaced file."""
+    for record in iter_records(str(path)):
+        return hashlib.sha256(json.dumps(record, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+    return None
+
+def _native(value: Any) -> Any:
+    # numpy scalars are not JSON serialisable
+    return value.item() if hasattr(value, "item") else value
+
+class AggregationState:
+    """Sufficient statistics for the aggregator's KPIs, Pareto and intent matrix"""
+
+    def __init__(self):
+        self.intents: Dict[str, Dict[str, Any]] = {}
+        self.satisfaction: Dict[str, int] = {}
+        # Chats per mistake_mask value (JSON keys are strings)
+        self.masks: Dict[str, int] = {}
+        self.hidden_dissatisfied = 0
+        # Watermark per consumed results file: records read, byte offset into its journal
+        # (None until the journal has been read), first-record hash
+        self.sources: Dict[str, Dict[str, Any]] = {}
+
+    # --- Persistence ---
+
+    @classmethod
+    def load(cls, path: str) -> "AggregationState":
+        state = cls()
+        if not os.path.exists(path):
+            return state
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != STATE_VERSION:
+            raise ValueError(f"Unsupported aggregation state version in {path}; delete it to rebuild")
+        state.intents = data["intents"]
+        state.satisfaction = data["satisfaction"]
+        state.masks = data["masks"]
+        state.hidden_dissatisfied = data["hidden_dissatisfied"]
+        state.sources = data["sources"]
+        return state
+
+    def save(self, path: str) -> None:
+        data = {
+            "version": STATE_VERSION,
+            "intents": self.intents,
+            "satisfaction": self.satisfaction,
+            "masks": self.masks,
+            "hidden_dissatisfied": self.hidden_dissatisfied,
+            "sources": self.sources,
+        }
+        with atomic_write(path) as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+
+    # --- Updates ---
+
+    @property
+    def count(self) -> int:
+        return sum(stats["count"] for stats in self.intents.values())
+
+    def add_frame(self, df: pd.DataFrame) -> "AggregationState":
+        """Fold rows shaped like SupportChatAggregator.create_dataframe() into the state"""
+        if df.empty:
+            return self
+        grouped = df.assign(quality_sq=df['quality_score'] ** 2).groupby('intent').agg(
+            count=('quality_score', 'size'),
+            quality_sum=('quality_score', 'sum'),
+            quality_sumsq=('quality_sq', 'sum'),
+            mistake_chats=('has_mistakes', 'sum'),
+            mistake_count_sum=('mistake_count', 'sum'),
+        )
+        for intent, row in grouped.iterrows():
+            stats = self.intents.setdefault(intent, {field: 0 for field in INTENT_FIELDS})
+            for field in INTENT_FIELDS:
+                stats[field] += _native(row[field])
+
+        for level, count in df['satisfaction'].value_counts().items():
+            self.satisfaction[level] = self.satisfaction.get(level, 0) + int(count)
+        for mask, count in df['mistake_mask'].value_counts().items():
+            self.masks[str(mask)] = self.masks.get(str(mask), 0) + int(count)
+        self.hidden_dissatisfied += int(
+            ((df['satisfaction'] == 'satisfied') & has_mistake(df['mistake_mask'], ['no_resolution'])).sum()
+        )
+        return self
+
+    def merge(self, other: "AggregationState") -> "AggregationState":
+        """Combine partial aggregates built from different results files"""
+        shared = set(self.sources) & set(other.sources)
+        if shared:
+            raise ValueError(f"Both states already include {', '.join(sorted(shared))}; merging would double count")
+        for intent, other_stats in other.intents.items():
+            stats = self.intents.setdefault(intent, {field: 0 for field in INTENT_FIELDS})
+            for field in INTENT_FIELDS:
+                stats[field] += other_stats[field]
+        for level, count in other.satisfaction.items():
+            self.satisfaction[level] = self.satisfaction.get(level, 0) + count
+        for mask, count in other.masks.items():
+            self.masks[mask] = self.masks.get(mask, 0) + count
+        self.hidden_dissatisfied += other.hidden_dissatisfied
+        self.sources.update(other.sources)
+        return self
+
+    def iter_new_results(self, results_path: str) -> Iterator[List[Dict]]:
+        """Yield batches of results appended to `results_path` since its watermark.
+
+        The watermark advances after each batch is consumed. A JSON array output
+        is read through its append-only .jsonl journal when present, which lets
+        the read resume at a byte offset; plain JSON arrays are re-scanned and
+        only the records past the watermark are returned. The record count carries
+        over when the journal appears or goes away, so no result is read twice.
+        Raises SourceChangedError, before yielding anything, when the file was
+        replaced or shrank since the watermark.
+        """
+        results_path = Path(results_path)
+        journal = Path(journal_path(str(results_path)))
+        source = journal if journal.exists() else results_path
+        key = str(results_path.resolve())
+        mark = self.sources.get(key, {"records": 0, "journal_offset": None, "head": None})
+
+        def changed() -> SourceChangedError:
+            return SourceChangedError(f"{results_path} was replaced since it was aggregated; delete the state file to rebuild")
+
+        if mark["head"] is not None and _head_hash(source) != mark["head"]:
+            raise changed()
+
+        def advance(batch: List[Dict], offset: Optional[int]) -> None:
+            mark["records"] += len(batch)
+            mark["journal_offset"] = offset
+            mark["head"] = mark["head"] or _head_hash(source)
+            self.sources[key] = mark
+
+        batch: List[Dict] = []
+        if source.suffix == ".jsonl":
+            with open(source, "rb") as f:
+                offset = mark["journal_offset"]
+                if offset is not None:
+                    if source.stat().st_size < offset:
+                        raise changed()
+                    f.seek(offset)
+                else:
+                    # Watermark taken on the JSON array: skip the records it covers
+                    offset = skipped = 0
+                    while skipped < mark["records"]:
+                        line = f.readline()
+                        if not line.endswith(b"\n"):
+                            raise changed()
+                        offset += len(line)
+                        skipped += bool(line.strip())
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        # Torn line from a writer still appending; read it next time
+                        break
+                    offset += len(line)
+                    if line.strip():
+                        batch.append(json.loads(line))
+                    if len(batch) >= CONSUME_BATCH_SIZE:
+                        yield batch
+                        advance(batch, offset)
+                        batch = []
+                if batch or offset != mark["journal_offset"]:
+                    yield batch
+                    advance(batch, offset)
+        else:
+            seen = 0
+            for record in iter_json_array(str(source)):
+                seen += 1
+                if seen <= mark["records"]:
+                    continue
+                batch.append(record)
+                if len(batch) >= CONSUME_BATCH_SIZE:
+                    yield batch
+                    advance(batch, None)
+                    batch = []
+            if seen < mark["records"]:
+                raise changed()
+            if batch:
+                yield batch
+                advance(batch, None)
+
+    # --- Reports ---
+
+    def kpis(self) -> Dict[str, Any]:
+        """Same structure and rounding as SupportChatAggregator.calculate_kpis"""
+        n = self.count
+        if n == 0:
+            raise ValueError("No analysis results aggregated yet")
+        quality_sum = sum(s["quality_sum"] for s in self.intents.values())
+        quality_sumsq = sum(s["quality_sumsq"] for s in self.intents.values())
+        mistake_chats = sum(s["mistake_chats"] for s in self.intents.values())
+        mistake_count_sum = sum(s["mistake_count_sum"] for s in self.intents.values())
+
+        return {
+            'avg_quality_score': round(quality_sum / n, 2),
+            'quality_score_std': round(_sample_std(n, quality_sum, quality_sumsq), 2),
+            'satisfaction_distribution': {
+                level: round(self.satisfaction.get(level, 0) / n * 100, 1) for level in SATISFACTION_LEVELS
+            },
+            'mistake_rate': round(mistake_chats / n * 100, 1),
+            'avg_mistakes_per_chat': round(mistake_count_sum / n, 2),
+            'hidden_dissatisfaction_rate': round(self.hidden_dissatisfied / n * 100, 1),
+        }
+
+    def intent_quality_matrix(self) -> pd.DataFrame:
+        """Same layout as SupportChatAggregator.create_intent_quality_matrix"""
+        rows = {}
+        for intent in sorted(self.intents):
+            s = self.intents[intent]
+            rows[intent] = {
+                'avg_quality': s["quality_sum"] / s["count"],
+                'std_quality': _sample_std(s["count"], s["quality_sum"], s["quality_sumsq"]),
+                'chat_count': s["count"],
+                'mistake_rate': s["mistake_chats"] / s["count"],
+                'avg_mistakes': s["mistake_count_sum"] / s["count"],
+            }
+        intent_stats = pd.DataFrame.from_dict(rows, orient='index').round(2)
+        intent_stats.index.name = 'intent'
+        intent_stats['mistake_rate'] = (intent_stats['mistake_rate'] * 100).round(1)
+        return intent_stats.sort_values('avg_quality', ascending=False)
+
+    def mistake_pareto(self) -> pd.DataFrame:
+        """Same layout as SupportChatAggregator.create_mistake_pareto"""
+        counts = mistake_counts(self._mask_keys(), list(self.masks.values())).sort_values(ascending=False)
+        mistake_df = pd.DataFrame({
+            'mistake_type': counts.index,
+            'count': counts.values,
+            'percentage': (counts.values / counts.sum() * 100).round(1)
+        })
+        mistake_df['cumulative_percentage'] = mistake_df['percentage'].cumsum().round(1)
+        return mistake_df
+
+    def mistake_cooccurrence(self) -> pd.DataFrame:
+        """Same layout as SupportChatAggregator.create_mistake_cooccurrence"""
+        return cooccurrence(self._mask_keys(), list(self.masks.values()))
+
+    def _mask_keys(self) -> List[int]:
+        return [int(mask) for mask in self.masks]
+
+def _sample_std(n: int, total: float, total_sq: float) -> float:
+    """Sample standard deviation (ddof=1, like pandas) from a count, sum and sum of squares"""
+    if n < 2:
+        return math.nan
+    variance = (n * total_sq - total * total) / (n * (n - 1))
+    return math.sqrt(max(variance, 0.0))
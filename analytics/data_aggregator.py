@@ -1,11 +1,150 @@
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 import argparse
-import json
+import sys
 from pathlib import Path
+import numpy as np
 import pandas as pd
 import warnings
 warnings.filterwarnings('ignore')
 
+# Allow running as `python analytics/data_aggregator.py` from the repo root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from storage.jsonl_store import RecordStream
+from storage.record_index import RecordIndex
+from judge_agent.intent_classifier import is_intent_only
+from aggregation_state import AggregationState, SourceChangedError
+from mistakes import MISTAKE_TYPES, NO_MISTAKES, BIT_VALUES, MASK_DTYPE, flags_to_mask, has_mistake, mistake_counts, cooccurrence
+
+DEFAULT_OUTPUT_PATH = 'analytics/support_analytics.parquet'
+
+# Compact on-disk/in-memory schema of the analytics table
+CATEGORICAL_COLUMNS = ['scenario', 'scenario_type', 'intent', 'satisfaction']
+INTEGER_COLUMNS = ['chat_id', 'message_count', 'quality_score', 'mistake_count', 'mistake_mask']
+COLUMNAR_FORMATS = {'.parquet': 'parquet', '.arrow': 'feather', '.feather': 'feather'}
+
+def to_analytics_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Categorical labels and the smallest integer dtype that fits each count/score column"""
+    df = df.copy()
+    for col in CATEGORICAL_COLUMNS:
+        if col in df:
+            df[col] = df[col].astype('category')
+    for col in INTEGER_COLUMNS:
+        if col in df:
+            df[col] = pd.to_numeric(df[col], downcast='integer')
+    return df
+
+def write_columnar(df: pd.DataFrame, path: str) -> None:
+    if COLUMNAR_FORMATS.get(Path(path).suffix.lower()) == 'feather':
+        df.to_feather(path)
+    else:
+        df.to_parquet(path, index=False)
+
+def read_analytics(path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Load (a projection of) an aggregated analytics file written by save()"""
+    fmt = COLUMNAR_FORMATS.get(Path(path).suffix.lower())
+    legacy_flags = [f'mistake_{m}' for m in MISTAKE_TYPES]
+    fold_flags = columns is not None and 'mistake_mask' in columns and 'mistake_mask' not in _column_names(path, fmt)
+    if fold_flags:
+        # Written before mistakes were stored as a bitmask: fold the boolean columns
+        columns, requested = [col for col in columns if col != 'mistake_mask'] + legacy_flags, columns
+    if fmt == 'parquet':
+        df = pd.read_parquet(path, columns=columns)
+    elif fmt == 'feather':
+        df = pd.read_feather(path, columns=columns)
+    else:
+        dtypes = {col: 'category' for col in CATEGORICAL_COLUMNS}
+        df = to_analytics_dtypes(pd.read_csv(path, usecols=columns, dtype=dtypes))
+    if fold_flags:
+        df['mistake_mask'] = flags_to_mask(df)
+        df = df[requested]
+    return df
+
+def _column_names(path: str, fmt: Optional[str]) -> List[str]:
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.read_schema(path).names
+    if fmt == 'feather':
+        import pyarrow as pa
+        with pa.memory_map(path) as source:
+            return pa.ipc.open_file(source).schema.names
+    return pd.read_csv(path, nrows=0).columns.tolist()
+
+# Dimensions of the dashboard rollup cube; each cell holds counts and sums
+CUBE_DIMENSIONS = ['intent', 'satisfaction', 'scenario_type', 'quality_score', 'mistake_mask']
+
+def rollup_path(output_path: str) -> str:
+    """Cube file stored next to an analytics table, e.g. support_analytics.cube.parquet"""
+    path = Path(output_path)
+    return str(path.with_name(f"{path.stem}.cube{path.suffix}"))
+
+def transcript_index_path(output_path: str) -> str:
+    """Byte-offset index of the source records, e.g. support_analytics.transcripts.npy"""
+    path = Path(output_path)
+    return str(path.with_name(f"{path.stem}.transcripts.npy"))
+
+def build_rollup_cube(df: pd.DataFrame) -> pd.DataFrame:
+    """Pre-aggregate the analytics table over intent x satisfaction x scenario_type x quality_score"""
+    measures = {
+        'chat_count': ('chat_id', 'size'),
+        'quality_sum': ('quality_score', 'sum'),
+        'mistake_chats': ('has_mistakes', 'sum'),
+    }
+    if 'mistake_count' in df:
+        measures['mistake_count_sum'] = ('mistake_count', 'sum')
+    cube = df.groupby(CUBE_DIMENSIONS, observed=True, dropna=False).agg(**measures)
+    return cube.reset_index()
+
+ANALYSIS_FIELDS = ['intent', 'satisfaction', 'quality_score', 'thought_process', 'agent_mistakes']
+
+def _list_lengths(series: pd.Series) -> pd.Series:
+    """len() of each stored list without copying it; NaN where the value is missing"""
+    if series.isna().all():
+        # An entirely missing column is float, which the .str accessor rejects
+        return pd.Series(np.nan, index=series.index)
+    return series.str.len()
+
+def _fill_text(series: pd.Series, default: str) -> pd.Series:
+    """Fill missing values; re-infer the dtype in case the column was entirely missing"""
+    return series.fillna(default).infer_objects()
+
+def _fill_numeric(series: pd.Series, default: int) -> pd.Series:
+    """Fill missing values, keeping an integer dtype when every value is integral"""
+    if not series.isna().any():
+        return series
+    filled = series.fillna(default)
+    if (filled % 1 == 0).all():
+        return filled.astype('int64')
+    return filled
+
+def encode_mistakes(mistakes: pd.Series) -> Dict[str, Any]:
+    """Encode agent_mistakes lists into has_mistakes, mistake_count and the mistake_mask bitmask.
+
+    A missing list counts as ['none']; a chat has mistakes unless its list is
+    empty or exactly ['none'].
+    """
+    n = len(mistakes)
+    categories = MISTAKE_TYPES + [NO_MISTAKES]
+    exploded = mistakes.explode()
+    codes = pd.Categorical(exploded, categories=categories).codes
+    lengths = _list_lengths(mistakes)
+    # explode() turns empty and missing lists into a single NaN row
+    rows = np.arange(n).repeat(lengths.fillna(1).clip(lower=1).astype('int64'))
+    
+    # Scatter every (row, mistake) pair into a boolean matrix in one step
+    onehot = np.zeros((n, len(categories)), dtype=bool)
+    known = codes >= 0
+    onehot[rows[known], codes[known]] = True
+    
+    lengths = lengths.fillna(0).astype('int64').to_numpy()
+    only_none = (lengths == 1) & onehot[:, -1]
+    has_mistakes = (lengths > 0) & ~only_none
+    
+    return {
+        'has_mistakes': has_mistakes,
+        'mistake_count': np.where(has_mistakes, lengths, 0),
+        'mistake_mask': (onehot[:, :-1] @ BIT_VALUES).astype(MASK_DTYPE),
+    }
+
 class SupportChatAggregator:
     """Aggregate and process support chat data for analytics"""
     
@@ -14,76 +153,60 @@ class SupportChatAggregator:
         Initialize with paths to data files
         
         Args:
-            chats_path: Path to generated_chats.json
-            results_path: Path to analysis_results.json
+            chats_path: Path to generated_chats.json (or its .jsonl journal)
+            results_path: Path to analysis_results.json (or its .jsonl journal)
         """
         self.chats_path = Path(chats_path)
         self.results_path = Path(results_path)
         self.chats_data = None
         self.results_data = None
         self.df = None
+        self.intent_only_skipped = 0
         
     def load_data(self) -> None:
-        """Load JSON data files"""
+        """Open JSON/JSONL data files as streams that are read lazily on iteration"""
         print("Loading data files...")
         
-        with open(self.chats_path, 'r', encoding='utf-8') as f:
-            self.chats_data = json.load(f)
-            
-        with open(self.results_path, 'r', encoding='utf-8') as f:
-            self.results_data = json.load(f)
+        self.chats_data = RecordStream(self.chats_path)
+        self.results_data = RecordStream(self.results_path)
             
         print(f"Loaded {len(self.chats_data)} chats and {len(self.results_data)} analysis results")
         
     def create_dataframe(self) -> pd.DataFrame:
         """Create unified DataFrame from chats and results"""
         
-        records = []
-        
+        # Only references to the decoded objects are collected per row; every
+        # column is then built in bulk instead of through one dict per record.
+        chat_ids, chats, analyses = [], [], []
+        self.intent_only_skipped = 0
         for i, result_item in enumerate(self.results_data):
+            # Classifier-only records carry an intent but no judgement to score
+            if is_intent_only(result_item):
+                self.intent_only_skipped += 1
+                continue
+            chat_ids.append(result_item.get('chat_id', i))
+            chats.append(result_item.get('original_chat', {}))
             # Get the analysis data (nested under "analysis" -> "result")
-            analysis_wrapper = result_item.get('analysis', {})
-            analysis = analysis_wrapper.get('result', {})
-            original_chat = result_item.get('original_chat', {})
-            
-            # Basic chat info
-            record = {
-                'chat_id': result_item.get('chat_id', i),
-                'scenario': original_chat.get('scenario', 'unknown'),
-                'scenario_type': original_chat.get('type', 'unknown'),
-                'message_count': len(original_chat.get('messages', [])),
-                
-                # Analysis results
-                'intent': analysis.get('intent', 'unknown'),
-                'satisfaction': analysis.get('satisfaction', 'unknown'),
-                'quality_score': analysis.get('quality_score', 0),
-                'rationale': analysis.get('thought_process', ''),
-                
-                # Process agent mistakes
-                'has_mistakes': False,
-                'mistake_count': 0,
-            }
-            
-            # Handle agent mistakes
-            mistakes = analysis.get('agent_mistakes', ['none'])
-            if mistakes and mistakes != ['none']:
-                record['has_mistakes'] = True
-                record['mistake_count'] = len(mistakes)
-                
-                # Create boolean columns for each mistake type
-                for mistake in ['ignored_question', 'incorrect_info', 'rude_tone', 
-                               'no_resolution', 'unnecessary_escalation']:
-                    record[f'mistake_{mistake}'] = mistake in mistakes
-            else:
-                record['has_mistakes'] = False
-                record['mistake_count'] = 0
-                for mistake in ['ignored_question', 'incorrect_info', 'rude_tone', 
-                               'no_resolution', 'unnecessary_escalation']:
-                    record[f'mistake_{mistake}'] = False
+            analyses.append(result_item.get('analysis', {}).get('result', {}))
+        
+        chat_df = pd.DataFrame.from_records(chats, columns=['scenario', 'type', 'messages'])
+        analysis_df = pd.DataFrame.from_records(analyses, columns=ANALYSIS_FIELDS)
+        
+        columns = {
+            'chat_id': chat_ids,
+            'scenario': _fill_text(chat_df['scenario'], 'unknown'),
+            'scenario_type': _fill_text(chat_df['type'], 'unknown'),
+            'message_count': _list_lengths(chat_df['messages']).fillna(0).astype('int64'),
             
-            records.append(record)
+            # Analysis results
+            'intent': _fill_text(analysis_df['intent'], 'unknown'),
+            'satisfaction': _fill_text(analysis_df['satisfaction'], 'unknown'),
+            'quality_score': _fill_numeric(analysis_df['quality_score'], 0),
+            'rationale': _fill_text(analysis_df['thought_process'], ''),
+        }
+        columns.update(encode_mistakes(analysis_df['agent_mistakes']))
         
-        self.df = pd.DataFrame(records)
+        self.df = pd.DataFrame(columns)
         return self.df
     
     def calculate_kpis(self) -> Dict[str, Any]:
@@ -116,7 +239,7 @@ class SupportChatAggregator:
         # Customers who are "satisfied" but still have unresolved issues
         hidden_dissat = self.df[
             (self.df['satisfaction'] == 'satisfied') & 
-            (self.df['mistake_no_resolution'] == True)
+            has_mistake(self.df['mistake_mask'], ['no_resolution'])
         ]
         kpis['hidden_dissatisfaction_rate'] = round(
             (len(hidden_dissat) / len(self.df)) * 100, 1
@@ -142,15 +265,11 @@ class SupportChatAggregator:
     def create_mistake_pareto(self) -> pd.DataFrame:
         """Create Pareto analysis of mistakes"""
         
-        mistake_cols = ['mistake_ignored_question', 'mistake_incorrect_info', 
-                       'mistake_rude_tone', 'mistake_no_resolution', 
-                       'mistake_unnecessary_escalation']
-        
-        mistake_counts = self.df[mistake_cols].sum().sort_values(ascending=False)
+        counts = mistake_counts(self.df['mistake_mask']).sort_values(ascending=False)
         mistake_df = pd.DataFrame({
-            'mistake_type': mistake_counts.index.str.replace('mistake_', ''),
-            'count': mistake_counts.values,
-            'percentage': (mistake_counts.values / mistake_counts.sum() * 100).round(1)
+            'mistake_type': counts.index,
+            'count': counts.values,
+            'percentage': (counts.values / counts.sum() * 100).round(1)
         })
         
         # Calculate cumulative percentage for Pareto
@@ -158,25 +277,77 @@ class SupportChatAggregator:
         
         return mistake_df
     
+    def create_mistake_cooccurrence(self) -> pd.DataFrame:
+        """Create mistake type co-occurrence matrix (diagonal = chats with that mistake)"""
+        return cooccurrence(self.df['mistake_mask'])
+    
     def save_to_csv(self, output_path: str = 'support_analytics.csv'):
         """Save aggregated data to CSV"""
         if self.df is not None:
             self.df.to_csv(output_path, index=False)
             print(f"Data saved to {output_path}")
     
-    def run_complete_analysis(self):
-        """Run complete analysis pipeline"""
-        
-        print("=" * 50)
-        print("SUPPORT CHAT ANALYTICS - COMPLETE ANALYSIS")
-        print("=" * 50)
-        
-        # Load and process data
-        self.load_data()
-        self.create_dataframe()
+    def save_to_columnar(self, output_path: str = 'support_analytics.parquet'):
+        """Save aggregated data to Parquet (or Arrow IPC for .arrow/.feather) with compact dtypes"""
+        if self.df is not None:
+            write_columnar(to_analytics_dtypes(self.df), output_path)
+            print(f"Data saved to {output_path}")
+    
+    def save(self, output_path: str):
+        """Save aggregated data and its rollup cube in the format implied by the file extension"""
+        if self.df is None:
+            return
+        cube_path = rollup_path(output_path)
+        cube = build_rollup_cube(self.df)
+        if Path(output_path).suffix.lower() in COLUMNAR_FORMATS:
+            self.save_to_columnar(output_path)
+            write_columnar(to_analytics_dtypes(cube), cube_path)
+        else:
+            self.save_to_csv(output_path)
+            cube.to_csv(cube_path, index=False)
+        print(f"Rollup cube ({len(cube)} cells) saved to {cube_path}")
+
+    def build_transcript_index(self, output_path: str) -> RecordIndex:
+        """Index the results file by byte offset so the dashboard can open single transcripts"""
+        index = RecordIndex.build(str(self.results_path), transcript_index_path(output_path),
+                                  keep=lambda record: not is_intent_only(record))
+        print(f"Transcript index ({len(index)} records) saved to {index.index_path}")
+        return index
+    
+    def _consume_new_results(self, state: AggregationState) -> int:
+        new_rows = skipped = 0
+        for batch in state.iter_new_results(str(self.results_path)):
+            self.results_data = batch
+            state.add_frame(self.create_dataframe())
+            new_rows += len(batch) - self.intent_only_skipped
+            skipped += self.intent_only_skipped
+        self.intent_only_skipped = skipped
+        return new_rows
+
+    def update_state(self, state_path: str) -> AggregationState:
+        """Fold results appended since the last run into the persisted aggregation state"""
+        state = AggregationState.load(state_path)
+        try:
+            new_rows = self._consume_new_results(state)
+        except SourceChangedError:
+            # A state built from this file alone can simply be rebuilt from scratch
+            if set(state.sources) - {str(Path(self.results_path).resolve())}:
+                raise
+            print(f"Warning: {self.results_path} was replaced since it was aggregated; rebuilding {state_path}")
+            state = AggregationState()
+            new_rows = self._consume_new_results(state)
+        # The frame only held the last batch; it is not a view of all results
+        self.results_data = None
+        self.df = None
+        state.save(state_path)
+        print(f"Aggregated {new_rows} new analysis results ({state.count} total) into {state_path}")
+        self.report_intent_only()
+        return state
+    
+    def print_report(self, kpis: Dict[str, Any], intent_matrix: Optional[pd.DataFrame], mistake_pareto: Optional[pd.DataFrame],
+                     mistake_cooccurrence: Optional[pd.DataFrame] = None):
+        """Print KPIs, the intent matrix, the Pareto table, mistake co-occurrence and derived insights"""
         
-        # Calculate KPIs
-        kpis = self.calculate_kpis()
         print("\n🔹 HIGH-LEVEL KPIs")
         print("-" * 30)
         print(f"Average Quality Score (AQS): {kpis['avg_quality_score']}/5.0")
@@ -191,8 +362,7 @@ class SupportChatAggregator:
         # Intent vs Quality Matrix
         print("\n🔹 INTENT VS QUALITY MATRIX")
         print("-" * 30)
-        if not self.df.empty:
-            intent_matrix = self.create_intent_quality_matrix()
+        if intent_matrix is not None:
             print(intent_matrix.to_string())
         else:
             print("No data available")
@@ -200,25 +370,27 @@ class SupportChatAggregator:
         # Pareto Analysis
         print("\n🔹 PARETO ANALYSIS - MISTAKE DISTRIBUTION")
         print("-" * 30)
-        if not self.df.empty:
-            mistake_pareto = self.create_mistake_pareto()
+        if mistake_pareto is not None:
             print(mistake_pareto.to_string(index=False))
         else:
             print("No mistakes data available")
         
+        if mistake_cooccurrence is not None:
+            print("\n🔹 MISTAKE CO-OCCURRENCE")
+            print("-" * 30)
+            print(mistake_cooccurrence.to_string())
+        
         # Business Insights
         print("\n🔹 BUSINESS INSIGHTS")
         print("-" * 30)
         
-        if not self.df.empty:
+        if intent_matrix is not None and mistake_pareto is not None:
             # Find weakest intent
-            intent_matrix = self.create_intent_quality_matrix()
             weakest_intent = intent_matrix.iloc[-1]
             print(f"⚠️  Lowest quality intent: {weakest_intent.name} "
                   f"(avg score: {weakest_intent['avg_quality']}/5.0)")
             
             # Pareto insight
-            mistake_pareto = self.create_mistake_pareto()
             if len(mistake_pareto) >= 2:
                 top_mistakes = mistake_pareto.head(2)
                 if top_mistakes['cumulative_percentage'].iloc[1] >= 70:
@@ -227,15 +399,62 @@ class SupportChatAggregator:
                     print(f"   Focus on: {', '.join(top_mistakes['mistake_type'].tolist())}")
         else:
             print("No data available for insights")
+    
+    def report_intent_only(self) -> None:
+        if self.intent_only_skipped:
+            print(f"Skipped {self.intent_only_skipped} intent-only results from the local classifier (no judgement to score)")
+
+    def run_complete_analysis(self):
+        """Run complete analysis pipeline"""
+        
+        print("=" * 50)
+        print("SUPPORT CHAT ANALYTICS - COMPLETE ANALYSIS")
+        print("=" * 50)
+        
+        # Load and process data
+        self.load_data()
+        self.create_dataframe()
+        self.report_intent_only()
+        
+        # Calculate KPIs
+        kpis = self.calculate_kpis()
+        intent_matrix = mistake_pareto = mistake_cooccurrence = None
+        if not self.df.empty:
+            intent_matrix = self.create_intent_quality_matrix()
+            mistake_pareto = self.create_mistake_pareto()
+            mistake_cooccurrence = self.create_mistake_cooccurrence()
+        self.print_report(kpis, intent_matrix, mistake_pareto, mistake_cooccurrence)
         
         return self.df, kpis
+    
+    def run_incremental_analysis(self, state_path: str, merge_paths: List[str] = ()):
+        """Report KPIs from the persisted state after consuming only the new results
+        
+        Args:
+            state_path: Aggregation state updated in place
+            merge_paths: States from other runs to combine into this report (not saved)
+        """
+        
+        print("=" * 50)
+        print("SUPPORT CHAT ANALYTICS - INCREMENTAL ANALYSIS")
+        print("=" * 50)
+        
+        state = self.update_state(state_path)
+        for path in merge_paths:
+            state.merge(AggregationState.load(path))
+        
+        kpis = state.kpis()
+        self.print_report(kpis, state.intent_quality_matrix(), state.mistake_pareto(), state.mistake_cooccurrence())
+        return state, kpis
 
 
 def main():
     parser = argparse.ArgumentParser(description="Aggregate and process support chat data for analytics")
     parser.add_argument("--chats", type=str, default="data\examples\groq_dataset_260.json", help="Path to generated chats JSON")
     parser.add_argument("--results", type=str, default="data\examples\groq_analysis_130.json", help="Path to analysis results JSON")
-    parser.add_argument("--output", type=str, default="analytics/support_analytics.csv", help="Output CSV path")
+    parser.add_argument("--output", type=str, help="Output path: .parquet or .arrow for the columnar format, .csv for text (default: analytics/support_analytics.parquet; not written with --state unless given)")
+    parser.add_argument("--state", type=str, help="Persisted aggregation state: only results added since the last run are read and KPIs are computed from it")
+    parser.add_argument("--merge", type=str, nargs="+", default=[], help="Aggregation states from other runs to combine into the --state report")
     
     args = parser.parse_args()
     
@@ -252,11 +471,24 @@ def main():
         results_path=args.results
     )
     
-    # Run analysis
-    df, kpis = aggregator.run_complete_analysis()
+    if args.state:
+        # Incremental KPIs; the per-chat table is only rebuilt when explicitly requested
+        try:
+            aggregator.run_incremental_analysis(args.state, args.merge)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+        if not args.output:
+            return
+        aggregator.load_data()
+        df = aggregator.create_dataframe()
+    else:
+        # Run analysis
+        df, kpis = aggregator.run_complete_analysis()
     
     # Save processed data
-    aggregator.save_to_csv(args.output)
+    aggregator.save(args.output or DEFAULT_OUTPUT_PATH)
+    aggregator.build_transcript_index(args.output or DEFAULT_OUTPUT_PATH)
     
     # Show sample of the data
     print("\n📊 Sample of processed data:")
@@ -0,0 +1,57 @@
+"""Bitmask encoding of agent mistakes for the analytics layer.
+
+Every mistake type from judge_agent.config.MISTAKE_TYPES owns one bit, so a
+chat's mistakes fit in a single small integer (`mistake_mask`). Counts,
+co-occurrence and filters are computed with vectorized bitwise operations;
+the optional `weights` let the same helpers run over pre-aggregated data
+(cube cells or a mask histogram) where each mask stands for several chats.
+"""
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from judge_agent.config import MISTAKE_TYPES as MISTAKE_REGISTRY, MISTAKE_BITS, NO_MISTAKES
+
+MISTAKE_TYPES = [m["name"] for m in sorted(MISTAKE_REGISTRY, key=lambda m: m["bit"])]
+BIT_VALUES = np.array([1 << MISTAKE_BITS[name] for name in MISTAKE_TYPES], dtype=np.int64)
+MASK_DTYPE = np.min_scalar_type(int(BIT_VALUES.sum()))
+
+def mask_of(names: Iterable[str]) -> int:
+    """Bitmask selecting the given mistake types"""
+    return sum(1 << MISTAKE_BITS[name] for name in names)
+
+def decode_mask(mask: int) -> list:
+    return [name for name in MISTAKE_TYPES if mask >> MISTAKE_BITS[name] & 1]
+
+def mistake_flags(masks) -> np.ndarray:
+    """Boolean matrix with one column per mistake type, in MISTAKE_TYPES order"""
+    return (np.asarray(masks, dtype=np.int64)[:, None] & BIT_VALUES) != 0
+
+def flags_to_mask(flags: pd.DataFrame) -> np.ndarray:
+    """Fold legacy boolean mistake_* columns into masks"""
+    values = np.zeros(len(flags), dtype=np.int64)
+    for name, bit in zip(MISTAKE_TYPES, BIT_VALUES):
+        values |= np.where(flags[f'mistake_{name}'].to_numpy(dtype=bool), bit, 0)
+    return values.astype(MASK_DTYPE)
+
+def has_mistake(masks, names: Iterable[str], require_all: bool = False) -> np.ndarray:
+    """Rows whose mask contains any (or, with require_all, every) of the given types"""
+    selected = mask_of(names)
+    hits = np.asarray(masks, dtype=np.int64) & selected
+    return hits == selected if require_all else hits != 0
+
+def mistake_counts(masks, weights: Optional[Iterable] = None) -> pd.Series:
+    """Number of chats with each mistake type"""
+    flags = mistake_flags(masks)
+    weights = np.ones(len(flags), dtype=np.int64) if weights is None else np.asarray(weights, dtype=np.int64)
+    return pd.Series(weights @ flags, index=MISTAKE_TYPES)
+
+def cooccurrence(masks, weights: Optional[Iterable] = None) -> pd.DataFrame:
+    """Chats having both the row and the column mistake; the diagonal holds per-type counts"""
+    flags = mistake_flags(masks).astype(np.int64)
+    if weights is not None:
+        flags_weighted = flags * np.asarray(weights, dtype=np.int64)[:, None]
+    else:
+        flags_weighted = flags
+    return pd.DataFrame(flags_weighted.T @ flags, index=MISTAKE_TYPES, columns=MISTAKE_TYPES)
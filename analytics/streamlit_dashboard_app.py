@@ -1,9 +1,21 @@
 # app.py
+import math
+import os
 import streamlit as st
-import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
+from data_aggregator import read_analytics, rollup_path, build_rollup_cube, transcript_index_path
+from storage.record_index import RecordIndex
+from mistakes import MISTAKE_TYPES, has_mistake
+
+DEFAULT_DATA_PATH = 'analytics/support_analytics.parquet'
+LEGACY_DATA_PATH = 'analytics/support_analytics.csv'
+# Фільтри, KPI та графіки працюють лише з цими колонками; довгий 'rationale'
+# читається окремо і тільки для таблиці деталей
+SUMMARY_COLUMNS = ['chat_id', 'intent', 'satisfaction', 'quality_score',
+                   'has_mistakes', 'scenario_type', 'mistake_mask']
+PAGE_SIZES = [25, 50, 100]
 
 st.set_page_config(
     page_title="Support Chat Analytics",
@@ -15,48 +27,74 @@ st.title("💬 Support Chat Quality Analytics")
 st.markdown("Аналіз якості підтримки клієнтів")
 
 @st.cache_data
-def load_data(file_path):
+def load_data(file_path, columns):
     try:
-        df = pd.read_csv(file_path)
-        return df
+        return read_analytics(file_path, columns=list(columns))
     except FileNotFoundError:
         st.error(f"Файл {file_path} не знайдено. Спочатку запусти data_aggregator.py")
         return None
 
+@st.cache_data
+def load_cube(file_path):
+    # KPI та графіки рахуються з rollup-куба (intent × satisfaction × scenario_type × quality_score),
+    # тож зміна фільтра не чіпає рядкові дані. Для старих файлів без куба будуємо його один раз
+    cube_path = rollup_path(file_path)
+    if os.path.exists(cube_path):
+        cube = read_analytics(cube_path)
+        # Куби, збережені до появи mistake_mask, перебудовуємо з рядків
+        if 'mistake_mask' in cube:
+            return cube
+    df = load_data(file_path, tuple(SUMMARY_COLUMNS))
+    return None if df is None else build_rollup_cube(df)
+
+@st.cache_resource
+def load_transcript_index(index_path, modified):
+    # modified входить у ключ кешу, щоб перебудований індекс підхоплювався без перезапуску
+    return RecordIndex(index_path)
+
 # Sidebar for file selection
 st.sidebar.header("📁 Налаштування даних")
-csv_path = st.sidebar.text_input("Шлях до CSV файлу", value='analytics/support_analytics.csv')
+default_path = DEFAULT_DATA_PATH if os.path.exists(DEFAULT_DATA_PATH) else LEGACY_DATA_PATH
+data_path = st.sidebar.text_input("Шлях до файлу даних (Parquet, Arrow або CSV)", value=default_path)
 
-df = load_data(csv_path)
+cube = load_cube(data_path)
 
-if df is not None:
+if cube is not None:
     # Бокова панель з фільтрами
     st.sidebar.header("🔍 Фільтри")
     
-    intents = ['Всі'] + sorted(df['intent'].unique().tolist())
+    intents = ['Всі'] + sorted(cube['intent'].dropna().unique().tolist())
     selected_intent = st.sidebar.selectbox("Виберіть інтент", intents)
+    selected_mistakes = st.sidebar.multiselect("Типи помилок (будь-яка з вибраних)", MISTAKE_TYPES)
     
-    # Фільтруємо дані
-    filtered_df = df.copy()
+    # Фільтруємо комірки куба; помилки зберігаються бітовою маскою
+    cube_slice = cube
     if selected_intent != 'Всі':
-        filtered_df = filtered_df[filtered_df['intent'] == selected_intent]
+        cube_slice = cube_slice[cube_slice['intent'] == selected_intent]
+    if selected_mistakes:
+        cube_slice = cube_slice[has_mistake(cube_slice['mistake_mask'], selected_mistakes)]
+    total_chats = int(cube_slice['chat_count'].sum())
+    if total_chats == 0:
+        st.warning("Немає чатів для вибраних фільтрів")
+        st.stop()
     
     # KPI картки
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("Всього чатів", len(filtered_df))
+        st.metric("Всього чатів", total_chats)
     
     with col2:
-        avg_score = filtered_df['quality_score'].mean()
+        avg_score = cube_slice['quality_sum'].sum() / total_chats
         st.metric("Середня оцінка", f"{avg_score:.2f}/5.0")
     
     with col3:
-        mistake_rate = (filtered_df['has_mistakes'].sum() / len(filtered_df) * 100)
+        mistake_rate = cube_slice['mistake_chats'].sum() / total_chats * 100
         st.metric("Помилки", f"{mistake_rate:.1f}%")
     
     with col4:
-        sat_rate = (filtered_df['satisfaction'] == 'satisfied').mean() * 100
+        satisfied = cube_slice.loc[cube_slice['satisfaction'] == 'satisfied', 'chat_count'].sum()
+        sat_rate = satisfied / total_chats * 100
         st.metric("Задоволені", f"{sat_rate:.1f}%")
     
     # Графіки
@@ -66,7 +104,8 @@ if df is not None:
     
     with col1:
         # Якість по інтентах
-        intent_quality = filtered_df.groupby('intent')['quality_score'].mean().sort_values()
+        by_intent = cube_slice.groupby('intent', observed=True)[['quality_sum', 'chat_count']].sum()
+        intent_quality = (by_intent['quality_sum'] / by_intent['chat_count']).sort_values()
         fig = px.bar(
             x=intent_quality.values,
             y=intent_quality.index,
@@ -80,7 +119,9 @@ if df is not None:
     
     with col2:
         # Розподіл задоволеності
-        sat_counts = filtered_df['satisfaction'].value_counts()
+        sat_counts = cube_slice.groupby('satisfaction', observed=True)['chat_count'].sum()
+        sat_counts = sat_counts.sort_values(ascending=False, kind='stable')
+        sat_counts = sat_counts[sat_counts > 0]
         colors = {'satisfied': '#2ecc71', 'neutral': '#f39c12', 'unsatisfied': '#e74c3c'}
         fig = px.pie(
             values=sat_counts.values,
@@ -99,20 +140,63 @@ if df is not None:
     display_cols = ['chat_id', 'intent', 'satisfaction', 'quality_score', 
                     'has_mistakes', 'scenario_type', 'rationale']
     
-    display_df = filtered_df[display_cols].copy()
+    # Рядкові дані потрібні лише таблиці деталей
+    df = load_data(data_path, tuple(SUMMARY_COLUMNS))
+    filtered_df = df
+    if selected_intent != 'Всі':
+        filtered_df = filtered_df[filtered_df['intent'] == selected_intent]
+    if selected_mistakes:
+        filtered_df = filtered_df[has_mistake(filtered_df['mistake_mask'], selected_mistakes)]
+    index_path = transcript_index_path(data_path)
+    index = None
+    if RecordIndex.exists(index_path):
+        index = load_transcript_index(index_path, os.path.getmtime(index_path))
+    if index is not None and (index.is_stale() or len(index) != len(df)):
+        st.warning("Індекс транскриптів застарів. Перезапусти data_aggregator.py")
+        index = None
+    
+    # Пагінація на сервері: пояснення і транскрипти читаються лише для поточної сторінки
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        page_size = st.selectbox("Рядків на сторінці", PAGE_SIZES, index=1)
+    page_count = max(1, math.ceil(len(filtered_df) / page_size))
+    with col2:
+        page = st.number_input("Сторінка", min_value=1, max_value=page_count, value=1,
+                               key=f"page_{selected_intent}_{'_'.join(selected_mistakes)}_{page_size}")
+    page_df = filtered_df.iloc[(page - 1) * page_size:page * page_size]
+    
+    if index is not None:
+        rationale = [index.read(row).get('analysis', {}).get('result', {}).get('thought_process', '')
+                     for row in page_df.index]
+    else:
+        rationale = load_data(data_path, ('rationale',))['rationale'].loc[page_df.index]
+    display_df = page_df.assign(rationale=rationale)[display_cols]
     display_df.columns = ['ID', 'Інтент', 'Задоволення', 'Оцінка', 
                          'Помилки', 'Тип', 'Пояснення']
     
+    st.caption(f"Сторінка {page} з {page_count} · всього {len(filtered_df)} чатів")
     st.dataframe(display_df, width="stretch", hide_index=True)
     
     # Кнопка для завантаження
     csv = display_df.to_csv(index=False).encode('utf-8')
     st.download_button(
-        "📥 Завантажити дані CSV",
+        "📥 Завантажити сторінку CSV",
         csv,
         "filtered_data.csv",
         "text/csv"
     )
+    
+    # Транскрипт вибраного чату
+    st.subheader("💬 Транскрипт чату")
+    if index is None:
+        st.info("Індекс транскриптів не знайдено. Запусти data_aggregator.py, щоб переглядати діалоги")
+    elif not page_df.empty:
+        row = st.selectbox("Чат", page_df.index.tolist(),
+                           format_func=lambda r: f"#{page_df.at[r, 'chat_id']} · {page_df.at[r, 'intent']}")
+        record = index.read(row)
+        for message in record.get('original_chat', {}).get('messages', []):
+            with st.chat_message("user" if message.get('role') == 'user' else "assistant"):
+                st.markdown(message.get('content', ''))
 
 else:
     st.info("👈 Запусти спочатку data_aggregator.py щоб створити CSV файл")
\ No newline at end of file
@@ -1,46 +1,399 @@
-from llm_factory import get_llm_provider
+from llm_factory import get_llm_provider, get_cascade_provider
+from providers.cache import DEFAULT_CACHE_DIR
+from providers import telemetry
+from providers.base import resilience_summary
 
 import argparse
 import json
+import asyncio
 import os
-from typing import Dict
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from judge_agent.evaluation_agent import LLMJudge
+from judge_agent.cascade import CascadeJudge
+from judge_agent.dialogue import format_dialogue
+from judge_agent.config import DIALOGUE_TOKEN_BUDGET
+from judge_agent.intent_classifier import DEFAULT_MODEL_PATH, DEFAULT_THRESHOLD, DEFAULT_INTENT_OUTPUT, is_intent_only, load_classifier
+from storage.resume_index import ResumeIndex, chat_fingerprint, DONE, FAILED, SKIPPED, INTENT_ONLY
+from storage.jsonl_store import JsonlStore, journal_path, iter_records, count_records
+from storage.work_queue import WorkQueue, DEFAULT_LEASE_SECONDS, PENDING, LEASED, default_worker_id
+
+DEFAULT_OUTPUT = "data/analysis_results.json"
+
+# Chats leased per queue round trip when --batch packs several into one request
+QUEUE_LEASE_BATCH = 16
+QUEUE_POLL_SECONDS = 5
+
+def record_compression(analysis: Optional[Dict], compression: Optional[Dict]) -> Optional[Dict]:
+    # Results judged on a shortened transcript say by how much
+    if compression and analysis and isinstance(analysis.get("result"), dict):
+        analysis["result"]["dialogue_compression"] = compression
+    return analysis
 
 def analyze_chat(judge: LLMJudge, chat_data: Dict) -> Dict:
-    # Convert chat messages to a readable string for the judge
-    messages_str = ""
-    for msg in chat_data.get("messages", []):
-        role = "Customer" if msg["role"] == "user" else "Agent"
-        messages_str += f"{role}: {msg['content']}\n"
-    
     # The judge evaluates the dialogue using the registered metrics
-    results = judge.evaluate_dialogue(messages_str)
+    dialogue, compression = judge.serialize(chat_data)
+    results = judge.evaluate_dialogue(dialogue)
     
     # Since we only use one metric for now, we return its result
     # We can also return the whole Dict[metric_name, result] if needed
-    return results.get("support_quality_analysis", results)
+    return record_compression(results.get("support_quality_analysis", results), compression)
+
+async def analyze_chat_async(judge: LLMJudge, chat_data: Dict) -> Dict:
+    dialogue, compression = judge.serialize(chat_data)
+    results = await judge.aevaluate_dialogue(dialogue)
+    return record_compression(results.get("support_quality_analysis", results), compression)
+
+# (dataset index, chat, analysis, error) for one processed chat
+Outcome = Tuple[int, Dict, Optional[Dict], Optional[Exception]]
+
+def iter_units(judge: LLMJudge, pending: Iterable[Tuple[int, Dict]], batch: bool, max_batch_size: Optional[int]) -> Iterator[List[Tuple[int, Dict]]]:
+    """Group pending chats into work units: single chats, or token-budgeted batches."""
+    if not batch:
+        for item in pending:
+            yield [item]
+        return
+    items = ((str(i + 1), judge.serialize(chat)[0], (i, chat)) for i, chat in pending)
+    for unit in judge.iter_batches(items, max_batch_size=max_batch_size):
+        yield [payload for _, _, payload in unit]
+
+def describe_unit(unit: List[Tuple[int, Dict]], total: int) -> str:
+    if len(unit) == 1:
+        return f"[{unit[0][0]+1}/{total}] Analyzing chat..."
+    return f"[{unit[0][0]+1}-{unit[-1][0]+1}/{total}] Analyzing batch of {len(unit)} chats..."
+
+def classify_unit(judge: LLMJudge, unit: List[Tuple[int, Dict]]) -> Tuple[List[Outcome], List[Tuple[int, Dict]]]:
+    """Label the chats the local intent classifier is confident about; the rest still go to the judge."""
+    if judge.intent_classifier is None:
+        return [], unit
+    labeled, remaining = [], []
+    for (i, chat), label in zip(unit, judge.classify_intents([format_dialogue(chat) for _, chat in unit])):
+        if label is None:
+            remaining.append((i, chat))
+        else:
+            labeled.append((i, chat, label, None))
+    return labeled, remaining
+
+def batch_outcome(i: int, chat: Dict, serialized: Dict, results: Dict, errors: Dict) -> Outcome:
+    chat_id = str(i + 1)
+    return (i, chat, record_compression(results.get(chat_id), serialized[chat_id][1]), errors.get(chat_id))
+
+def analyze_unit(judge: LLMJudge, unit: List[Tuple[int, Dict]]) -> List[Outcome]:
+    labeled, unit = classify_unit(judge, unit)
+    if not unit:
+        return labeled
+    if len(unit) == 1:
+        i, chat = unit[0]
+        try:
+            outcomes = [(i, chat, analyze_chat(judge, chat), None)]
+        except Exception as e:
+            outcomes = [(i, chat, None, e)]
+    else:
+        serialized = {str(i + 1): judge.serialize(chat) for i, chat in unit}
+        results, errors = judge.evaluate_batch([(chat_id, text) for chat_id, (text, _) in serialized.items()])
+        outcomes = [batch_outcome(i, chat, serialized, results, errors) for i, chat in unit]
+    return sorted(labeled + outcomes, key=lambda outcome: outcome[0])
+
+async def analyze_unit_async(judge: LLMJudge, unit: List[Tuple[int, Dict]]) -> List[Outcome]:
+    labeled, unit = classify_unit(judge, unit)
+    if not unit:
+        return labeled
+    if len(unit) == 1:
+        i, chat = unit[0]
+        try:
+            outcomes = [(i, chat, await analyze_chat_async(judge, chat), None)]
+        except Exception as e:
+            outcomes = [(i, chat, None, e)]
+    else:
+        serialized = {str(i + 1): judge.serialize(chat) for i, chat in unit}
+        results, errors = await judge.aevaluate_batch([(chat_id, text) for chat_id, (text, _) in serialized.items()])
+        outcomes = [batch_outcome(i, chat, serialized, results, errors) for i, chat in unit]
+    return sorted(labeled + outcomes, key=lambda outcome: outcome[0])
+
+async def analyze_concurrently(
+    judge: LLMJudge,
+    units: Iterable[List[Tuple[int, Dict]]],
+    concurrency: int,
+    total: int,
+    on_result: Callable[[int, Dict, Optional[Dict], Optional[Exception]], None],
+) -> None:
+    """Keep up to `concurrency` judge requests in flight, committing results in dataset order."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(unit: List[Tuple[int, Dict]]) -> List[Outcome]:
+        async with semaphore:
+            print(describe_unit(unit, total))
+            return await analyze_unit_async(judge, unit)
+
+    # Awaiting in submission order acts as a reorder buffer: finished tasks hold
+    # their result until every earlier chat has been committed. The window bounds
+    # how far reading the (streamed) input can run ahead of the slowest request.
+    window = deque()
+    for unit in units:
+        window.append(asyncio.create_task(run(unit)))
+        if len(window) >= concurrency * 4:
+            for outcome in await window.popleft():
+                on_result(*outcome)
+    while window:
+        for outcome in await window.popleft():
+            on_result(*outcome)
+
+def process_units(judge: LLMJudge, units: Iterable[List[Tuple[int, Dict]]], concurrency: int, total: int,
+                  on_result: Callable[[int, Dict, Optional[Dict], Optional[Exception]], None]) -> None:
+    if concurrency > 1:
+        asyncio.run(analyze_concurrently(judge, units, concurrency, total, on_result))
+    else:
+        for unit in units:
+            print(describe_unit(unit, total))
+            for outcome in analyze_unit(judge, unit):
+                on_result(*outcome)
+
+def renew_leases(queue: WorkQueue, worker: str, stop: threading.Event) -> None:
+    # Heartbeat: a slow batch keeps its chats instead of having them leased again and judged twice
+    while not stop.wait(queue.lease_seconds / 3):
+        try:
+            queue.renew(worker)
+        except Exception as e:
+            print(f"Warning: Could not renew leases: {e}")
+
+def run_queue_worker(args, judge: LLMJudge, total: int) -> None:
+    """Lease chats from the shared work queue until it is drained, then merge the results."""
+    queue = WorkQueue(args.queue, lease_seconds=args.lease_seconds)
+    worker = args.worker_id or default_worker_id()
+    stat = os.stat(args.input)
+    added = queue.enqueue(enumerate(iter_records(args.input)), source=f"{Path(args.input).resolve()}:{stat.st_size}:{stat.st_mtime_ns}")
+    if added:
+        print(f"Enqueued {added} chats in {args.queue}.")
+    # Skipped chats are invalid input; only failures are worth another attempt
+    if FAILED in args.retry:
+        print(f"Re-queued {queue.requeue([FAILED])} failed chats.")
+    lease_size = (args.batch_size or QUEUE_LEASE_BATCH) if args.batch else 1
+    leased = {}
+
+    def leased_chats() -> Iterator[Tuple[int, Dict]]:
+        while True:
+            items = queue.lease(worker, limit=lease_size)
+            if not items:
+                return
+            for fingerprint, position, chat in items:
+                leased[position] = fingerprint
+                yield position, chat
+
+    def commit_result(i: int, chat: Dict, analysis: Optional[Dict], error: Optional[Exception]) -> None:
+        fingerprint = leased.pop(i)
+        if error is not None:
+            print(f"Error analyzing chat {i+1}: {error}")
+            if not queue.fail(worker, fingerprint, str(error)):
+                print(f"Chat {i+1} was taken over by another worker after its lease expired.")
+            return
+        if not queue.ack(fingerprint, {"chat_id": i + 1, "original_chat": chat, "analysis": analysis}):
+            print(f"Chat {i+1} was already analyzed by another worker.")
+
+    print(f"Worker {worker} analyzing chats from {args.queue} using {args.provider}...")
+    stop_heartbeat = threading.Event()
+    heartbeat = threading.Thread(target=renew_leases, args=(queue, worker, stop_heartbeat), name="lease-heartbeat", daemon=True)
+    heartbeat.start()
+    try:
+        while True:
+            process_units(judge, iter_units(judge, leased_chats(), args.batch, args.batch_size),
+                          args.concurrency, total, commit_result)
+            counts = queue.counts()
+            if counts[PENDING]:
+                continue
+            if not counts[LEASED]:
+                break
+            # Chats held by other workers either finish or come back when their lease expires
+            print(f"Waiting for {counts[LEASED]} chats leased by other workers...")
+            time.sleep(min(QUEUE_POLL_SECONDS, queue.next_expiry() or 0) + 0.1)
+    finally:
+        stop_heartbeat.set()
+        heartbeat.join()
+        queue.release(worker)
+
+    print(f"Queue status: {queue.counts()}")
+    # Every worker ends up here once the queue drains; only the elected one merges
+    not_merging = queue.claim_merge(worker)
+    if not_merging is None:
+        print(f"Merged {queue.merge(args.output)} analysis results into {args.output}")
+    else:
+        print(f"Not merging: {not_merging}.")
+    queue.close()
+
+class ResultCommitter:
+    """Filters chats against the resume index and records finished analyses in the results journal."""
+
+    def __init__(self, store: JsonlStore, index: ResumeIndex, retry: Iterable[str], total: int, intent_only: bool = False):
+        self.store = store
+        self.index = index
+        self.retry = set(retry)
+        self.total = total
+        # Intent-only runs accept classifier labels; full runs judge those chats again
+        self.intent_only = intent_only
+        self.fingerprints = {}
+        self.held_back = {FAILED: 0, SKIPPED: 0}
+        self.superseded = 0
+
+    def pending(self, chats: Iterable[Tuple[int, Dict]]) -> Iterator[Tuple[int, Dict]]:
+        """Yield the (dataset index, chat) pairs that still need a judgement."""
+        for i, chat in chats:
+            fingerprint = chat_fingerprint(chat)
+            status = self.index.get(fingerprint)
+            if status == DONE or (status == INTENT_ONLY and self.intent_only):
+                continue
+            if status in self.held_back and status not in self.retry:
+                self.held_back[status] += 1
+                continue
+
+            if not chat or "error" in chat:
+                print(f"[{i+1}/{self.total}] Skipping invalid chat.")
+                self.index.mark(fingerprint, SKIPPED, chat_id=i + 1)
+                continue
+
+            self.fingerprints[i] = fingerprint
+            yield i, chat
+
+    def commit(self, i: int, chat: Dict, analysis: Optional[Dict], error: Optional[Exception]) -> None:
+        fingerprint = self.fingerprints.pop(i)
+        if error is not None:
+            print(f"Error analyzing chat {i+1}: {error}")
+            self.index.mark(fingerprint, FAILED, chat_id=i + 1, error=str(error))
+            return
+
+        # Combine original chat with its analysis for the final report
+        record = {
+            "chat_id": i + 1,
+            "original_chat": chat,
+            "analysis": analysis
+        }
+        self.store.append(record)
+        status = INTENT_ONLY if is_intent_only(record) else DONE
+        if status == DONE and self.index.get(fingerprint) == INTENT_ONLY:
+            self.superseded += 1
+        self.index.mark(fingerprint, status, chat_id=i + 1)
+
+    def drop_superseded(self) -> None:
+        """Remove intent-only records of chats that have since been fully judged."""
+        if self.superseded:
+            self.store.retain(lambda record: not (
+                is_intent_only(record) and self.index.get(chat_fingerprint(record.get("original_chat"))) == DONE
+            ))
+            print(f"Replaced {self.superseded} intent-only results with full judgements.")
+
+def open_results(output_path: str) -> Tuple[JsonlStore, ResumeIndex]:
+    """Open the results journal and the resume index of processed chats."""
+    # Results are appended to a JSONL journal and compacted into the legacy JSON
+    # array at the end, so a checkpoint costs one fsync'd line instead of a rewrite.
+    store = JsonlStore(journal_path(output_path))
+    if not store.exists() and os.path.exists(output_path):
+        try:
+            store.seed_from(output_path)
+        except Exception as e:
+            print(f"Warning: Could not load existing results for checkpointing: {e}")
+    existing = len(store)
+    if existing:
+        print(f"Loaded {existing} existing analysis results.")
+
+    # Identify which chats are already processed. The index is only trusted while it
+    # agrees with the results journal (e.g. a crash between the two writes forces a rebuild).
+    index = ResumeIndex.for_output(output_path)
+    if index.count(DONE) + index.count(INTENT_ONLY) != existing:
+        index.rebuild(store, lambda record: INTENT_ONLY if is_intent_only(record) else DONE)
+    return store, index
+
+def report_run(args, provider, judge: Optional[LLMJudge] = None) -> None:
+    if provider.response_cache is not None:
+        print(f"Response cache: {provider.response_cache.stats()}")
+    # The judge has its own provider in cascades and in pipeline.py with --judge-provider/--judge-model
+    if judge is not None and judge.provider is not provider and judge.provider.response_cache is not None:
+        label = "Cheap tier" if isinstance(judge, CascadeJudge) else "Judge"
+        print(f"{label} response cache: {judge.provider.response_cache.stats()}")
+    if isinstance(judge, CascadeJudge):
+        print(f"Judge cascade: {json.dumps(judge.stats(), indent=2)}")
+    print(f"LLM telemetry: {json.dumps(telemetry.registry.summary(), indent=2)}")
+    print(f"Retry budget and circuit breakers: {json.dumps(resilience_summary(), indent=2)}")
+    if args.metrics_output:
+        telemetry.write_metrics(args.metrics_output)
 
 def main():
     parser = argparse.ArgumentParser(description="Analyze support chat dataset")
-    parser.add_argument("--provider", type=str, default="groq", help="LLM provider (gemini, groq, ollama)")
+    parser.add_argument("--provider", type=str, default="groq", help="LLM provider (gemini, groq, ollama, fake)")
     parser.add_argument("--model", type=str, help="Specific model name to use")
     parser.add_argument("--input", type=str, default="data/generated_chats.json", help="Input JSON file")
-    parser.add_argument("--output", type=str, default="data/analysis_results.json", help="Output JSON file")
+    parser.add_argument("--output", type=str, help=f"Output JSON file (a .jsonl path skips compaction to a JSON array; default: {DEFAULT_OUTPUT}, or {DEFAULT_INTENT_OUTPUT} with --intent-only)")
+    parser.add_argument("--concurrency", type=int, default=1, help="Number of judgements kept in flight (1 = sequential)")
+    parser.add_argument("--cache-dir", type=str, default=DEFAULT_CACHE_DIR, help="Directory of the persistent LLM response cache")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the LLM response cache")
+    parser.add_argument("--metrics-output", type=str, help="Write LLM call telemetry here at the end of the run (Prometheus text for *.prom, JSON otherwise)")
+    parser.add_argument("--metrics-port", type=int, help="Serve live LLM call telemetry on http://localhost:PORT/metrics (Prometheus) and /metrics.json")
+    parser.add_argument("--batch", action="store_true", help="Pack several dialogues into each judge request, sized from the model's token budget")
+    parser.add_argument("--batch-size", type=int, help="Upper bound on dialogues per batched request (default: derived from the token budget)")
+    parser.add_argument("--retry", nargs="+", choices=[FAILED, SKIPPED], default=[], help="Re-process chats recorded as failed and/or skipped in the resume index")
+    parser.add_argument("--queue", type=str, help="Shared SQLite work queue (e.g. data/analysis_queue.sqlite on a volume mounted by every worker). Workers lease chats from it instead of walking the whole input")
+    parser.add_argument("--worker-id", type=str, help="Name of this worker in the queue (default: hostname-pid)")
+    parser.add_argument("--lease-seconds", type=float, default=DEFAULT_LEASE_SECONDS, help="How long a leased chat stays reserved before another worker may take it over")
+    parser.add_argument("--merge", action="store_true", help="Only write the queue's finished results to --output, without analyzing")
+    parser.add_argument("--dialogue-budget", type=int, default=DIALOGUE_TOKEN_BUDGET, help="Token budget of one dialogue sent to the judge; longer chats are compressed (default 0: always send verbatim, e.g. 1500 to cap long chats)")
+    parser.add_argument("--cascade", type=str, metavar="PROVIDER[:MODEL]", help="Judge with this cheap model first (e.g. groq, ollama:llama3.2:1b) and escalate to --provider/--model only when a consistency or agreement gate fires")
+    parser.add_argument("--cascade-samples", type=int, choices=[1, 2], default=2, help="Cheap answers per chat; with 2, disagreement between them also escalates")
+    parser.add_argument("--intent-only", action="store_true", help="Only label intents: chats the local classifier is confident about skip the LLM, the rest get a full judgement")
+    parser.add_argument("--intent-model", type=str, default=DEFAULT_MODEL_PATH, help="Intent classifier trained with python -m judge_agent.intent_classifier")
+    parser.add_argument("--intent-threshold", type=float, default=DEFAULT_THRESHOLD, help="Minimum classifier probability for an intent to be accepted without the LLM")
     
     args = parser.parse_args()
+    if args.output is None:
+        # Intent labels stay out of the full results unless asked for
+        args.output = DEFAULT_INTENT_OUTPUT if args.intent_only else DEFAULT_OUTPUT
+    if args.metrics_port:
+        telemetry.start_metrics_server(args.metrics_port)
     
+    if args.merge:
+        if not args.queue:
+            print("Error: --merge needs --queue.")
+            return
+        queue = WorkQueue(args.queue)
+        print(f"Queue status: {queue.counts()}")
+        print(f"Merged {queue.merge(args.output)} analysis results into {args.output}")
+        return
+
     if not os.path.exists(args.input):
         print(f"Error: Input file {args.input} not found.")
         return
 
-    with open(args.input, "r", encoding="utf-8") as f:
-        dataset = json.load(f)
+    # The input is streamed; only its size is needed up front for progress output
+    total = count_records(args.input)
         
-    provider = get_llm_provider(args.provider, model_name=args.model)
+    cache_dir = None if args.no_cache else args.cache_dir
+    provider = get_llm_provider(args.provider, model_name=args.model, cache_dir=cache_dir)
     
+    intent_classifier = None
+    if args.intent_only:
+        intent_classifier = load_classifier(args.intent_model)
+        if intent_classifier is None:
+            print(f"Error: Intent classifier {args.intent_model} not found. Train it with: python -m judge_agent.intent_classifier")
+            return
+
+    cheap_provider = get_cascade_provider(args.cascade, cache_dir=cache_dir) if args.cascade else None
+    strong_model = (provider.name(), getattr(provider, "model_name", None))
+    if cheap_provider is not None and (cheap_provider.name(), getattr(cheap_provider, "model_name", None)) == strong_model:
+        print(f"Cascade disabled: its first tier {'/'.join(filter(None, strong_model))} is already the --provider model.")
+        cheap_provider = None
+
     # Initialize the Judge with metrics
-    judge = LLMJudge(provider=provider)
+    if cheap_provider is not None:
+        judge = CascadeJudge(
+            cheap_provider, provider, samples=args.cascade_samples,
+            intent_classifier=intent_classifier, intent_threshold=args.intent_threshold,
+            dialogue_budget=args.dialogue_budget
+        )
+    else:
+        judge = LLMJudge(
+            provider=provider, intent_classifier=intent_classifier, intent_threshold=args.intent_threshold,
+            dialogue_budget=args.dialogue_budget
+        )
     
     # Ensure output directory exists
     output_path = args.output
@@ -48,49 +401,34 @@ def main():
     if output_dir:
         os.makedirs(output_dir, exist_ok=True)
 
-    results = []
-    if os.path.exists(output_path):
-        try:
-            with open(output_path, "r", encoding="utf-8") as f:
-                results = json.load(f)
-            print(f"Loaded {len(results)} existing analysis results.")
-        except Exception as e:
-            print(f"Warning: Could not load existing results for checkpointing: {e}")
-            results = []
+    if args.queue:
+        run_queue_worker(args, judge, total)
+        report_run(args, provider, judge)
+        return
 
-    # Identify which chats are already analyzed
-    analyzed_chats_content = [item.get("original_chat") for item in results]
+    store, index = open_results(output_path)
     
-    print(f"Analyzing {len(dataset)} chats using {args.provider}...")
-    
-    for i, chat in enumerate(dataset):
-        if not chat or "error" in chat:
-            print(f"[{i+1}/{len(dataset)}] Skipping invalid chat.")
-            continue
-            
-        # Check if already analyzed
-        if chat in analyzed_chats_content:
-            continue
-
-        print(f"[{i+1}/{len(dataset)}] Analyzing chat...")
-        try:
-            analysis = analyze_chat(judge, chat)
-            
-            # Combine original chat with its analysis for the final report
-            results.append({
-                "chat_id": i + 1,
-                "original_chat": chat,
-                "analysis": analysis
-            })
-            
-            # Intermediate save
-            with open(output_path, "w", encoding="utf-8") as f:
-                json.dump(results, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"Error analyzing chat {i+1}: {e}")
-            continue
+    print(f"Analyzing {total} chats using {args.provider}...")
+
+    results = ResultCommitter(store, index, args.retry, total, intent_only=args.intent_only)
+
+    units = iter_units(judge, results.pending(enumerate(iter_records(args.input))), args.batch, args.batch_size)
+    try:
+        process_units(judge, units, args.concurrency, total, results.commit)
+    finally:
+        # Compact even when interrupted so the JSON output reflects every checkpoint
+        store.close()
+        results.drop_superseded()
+        if store.path != Path(output_path):
+            store.compact(output_path)
         
     print(f"Successfully saved analysis results to {output_path}")
+    for status, count in results.held_back.items():
+        if count:
+            print(f"Held back {count} chats previously recorded as {status} (use --retry {status} to re-process).")
+    if intent_classifier is not None:
+        print(f"Intent classifier labeled {judge.intents_classified} chats without an LLM call.")
+    report_run(args, provider, judge)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,112 @@
+"""Benchmark SupportChatAggregator.create_dataframe against the previous row-by-row build.
+
+The 130-row example results are cycled up to each requested size in memory,
+so the numbers cover DataFrame construction only, not JSON parsing. Both
+implementations must produce identical frames once the reference's boolean
+mistake_* columns are folded into the current mistake_mask bitmask:
+
+    python benchmarks/create_dataframe.py --sizes 130,10000,100000,1000000
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "analytics"))
+from data_aggregator import SupportChatAggregator
+from mistakes import MISTAKE_TYPES as MISTAKES, flags_to_mask
+
+EXAMPLE_RESULTS = REPO_ROOT / "data" / "examples" / "groq_analysis_130.json"
+
+def legacy_create_dataframe(results) -> pd.DataFrame:
+    """The original one-dict-per-row implementation, kept as the reference."""
+    records = []
+    for i, result_item in enumerate(results):
+        analysis = result_item.get('analysis', {}).get('result', {})
+        original_chat = result_item.get('original_chat', {})
+        record = {
+            'chat_id': result_item.get('chat_id', i),
+            'scenario': original_chat.get('scenario', 'unknown'),
+            'scenario_type': original_chat.get('type', 'unknown'),
+            'message_count': len(original_chat.get('messages', [])),
+            'intent': analysis.get('intent', 'unknown'),
+            'satisfaction': analysis.get('satisfaction', 'unknown'),
+            'quality_score': analysis.get('quality_score', 0),
+            'rationale': analysis.get('thought_process', ''),
+            'has_mistakes': False,
+            'mistake_count': 0,
+        }
+        mistakes = analysis.get('agent_mistakes', ['none'])
+        if mistakes and mistakes != ['none']:
+            record['has_mistakes'] = True
+            record['mistake_count'] = len(mistakes)
+            for mistake in MISTAKES:
+                record[f'mistake_{mistake}'] = mistake in mistakes
+        else:
+            for mistake in MISTAKES:
+                record[f'mistake_{mistake}'] = False
+        records.append(record)
+    return pd.DataFrame(records)
+
+def scaled_results(size: int) -> list:
+    with open(EXAMPLE_RESULTS, "r", encoding="utf-8") as f:
+        base = json.load(f)
+    return [dict(base[i % len(base)], chat_id=i + 1) for i in range(size)]
+
+def best_of(fn, repeat: int):
+    timings, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark columnar vs row-by-row DataFrame construction")
+    parser.add_argument("--sizes", type=str, default="130,10000,100000,1000000", help="Comma-separated row counts")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per size; the fastest is reported")
+    parser.add_argument("--output", type=str, help="Write the JSON report to this path")
+    args = parser.parse_args()
+
+    report = {
+        "benchmark": "create_dataframe",
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": [],
+    }
+    for size in [int(float(s)) for s in args.sizes.split(",") if s.strip()]:
+        results = scaled_results(size)
+        aggregator = SupportChatAggregator(chats_path="", results_path="")
+        aggregator.results_data = results
+
+        legacy_s, legacy_df = best_of(lambda: legacy_create_dataframe(results), args.repeat)
+        columnar_s, columnar_df = best_of(aggregator.create_dataframe, args.repeat)
+        flag_columns = [f'mistake_{mistake}' for mistake in MISTAKES]
+        expected_df = legacy_df.drop(columns=flag_columns).assign(mistake_mask=flags_to_mask(legacy_df))
+        pd.testing.assert_frame_equal(columnar_df, expected_df)
+
+        report["results"].append({
+            "rows": size,
+            "legacy_s": round(legacy_s, 4),
+            "columnar_s": round(columnar_s, 4),
+            "legacy_rows_per_sec": round(size / legacy_s),
+            "columnar_rows_per_sec": round(size / columnar_s),
+            "speedup": round(legacy_s / columnar_s, 2),
+        })
+        print(f"{size} rows: {legacy_s:.3f}s -> {columnar_s:.3f}s", file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        Path(args.output).write_text(text, encoding="utf-8")
+    print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Accuracy and throughput of the local intent classifier against the judge's labels.
+
+Accuracy is measured with k-fold cross-validation over analysis results (by
+default the bundled 130 judged chats), so every dialogue is scored by a model
+that never saw it. For each confidence threshold the report gives the share
+of chats the classifier would label on its own (LLM calls avoided) and how
+often those labels agree with the judge. Throughput is prediction speed on
+the example dataset cycled up to `--throughput-size` dialogues:
+
+    python benchmarks/intent_classifier.py
+    python benchmarks/intent_classifier.py --results data/analysis_results.json --folds 10
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+from judge_agent.dialogue import format_dialogue
+from judge_agent.intent_classifier import IntentClassifier, load_labeled_dialogues, INTENTS
+from storage.jsonl_store import iter_records
+
+EXAMPLE_RESULTS = REPO_ROOT / "data" / "examples" / "groq_analysis_130.json"
+EXAMPLE_CHATS = REPO_ROOT / "data" / "examples" / "groq_dataset_260.json"
+THRESHOLDS = [0.5, 0.6, 0.7, 0.8, 0.9, 0.95]
+
+def cross_validate(texts: list, labels: list, folds: int, seed: int, epochs: int) -> tuple:
+    """Out-of-fold (predicted intent, probability) for every dialogue, plus mean training time."""
+    order = np.random.default_rng(seed).permutation(len(texts))
+    predicted = [None] * len(texts)
+    confidence = np.zeros(len(texts))
+    train_seconds = []
+    for fold in np.array_split(order, folds):
+        held_out = set(fold.tolist())
+        train = [i for i in order if i not in held_out]
+        start = time.perf_counter()
+        model = IntentClassifier.fit([texts[i] for i in train], [labels[i] for i in train], epochs=epochs)
+        train_seconds.append(time.perf_counter() - start)
+        for i, (intent, probability) in zip(fold, model.predict([texts[i] for i in fold])):
+            predicted[i], confidence[i] = intent, probability
+    return np.array(predicted), confidence, float(np.mean(train_seconds))
+
+def threshold_table(predicted: np.ndarray, confidence: np.ndarray, labels: np.ndarray) -> list:
+    rows = []
+    for threshold in THRESHOLDS:
+        confident = confidence >= threshold
+        rows.append({
+            "threshold": threshold,
+            "coverage": round(float(confident.mean()), 4),
+            "accuracy_on_covered": round(float((predicted[confident] == labels[confident]).mean()), 4) if confident.any() else None,
+            # Intent accuracy of a --intent-only run: confident chats from the classifier, the rest from the judge
+            "combined_accuracy": round(float(np.where(confident, predicted == labels, True).mean()), 4),
+        })
+    return rows
+
+def measure_throughput(model: IntentClassifier, size: int) -> dict:
+    dialogues = [format_dialogue(chat) for chat in iter_records(str(EXAMPLE_CHATS)) if chat.get("messages")]
+    dialogues = [dialogues[i % len(dialogues)] for i in range(size)]
+    start = time.perf_counter()
+    model.predict(dialogues)
+    seconds = time.perf_counter() - start
+    return {"dialogues": size, "seconds": round(seconds, 3), "dialogues_per_sec": round(size / seconds, 1)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the local intent classifier against the LLM judge's labels")
+    parser.add_argument("--results", nargs="+", default=[str(EXAMPLE_RESULTS)], help="Judged analysis results used as ground truth")
+    parser.add_argument("--folds", type=int, default=5, help="Cross-validation folds")
+    parser.add_argument("--epochs", type=int, default=300, help="Training iterations per fold")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the fold split")
+    parser.add_argument("--throughput-size", type=int, default=10_000, help="Dialogues classified for the throughput measurement")
+    parser.add_argument("--output", type=str, help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    texts, labels = load_labeled_dialogues(args.results)
+    predicted, confidence, train_seconds = cross_validate(texts, labels, args.folds, args.seed, args.epochs)
+    labels = np.array(labels)
+    model = IntentClassifier.fit(texts, list(labels), epochs=args.epochs)
+
+    report = {
+        "python": platform.python_version(),
+        "labeled_dialogues": len(texts),
+        "folds": args.folds,
+        "accuracy": round(float((predicted == labels).mean()), 4),
+        "per_intent_recall": {
+            intent: round(float((predicted[labels == intent] == intent).mean()), 4)
+            for intent in INTENTS if (labels == intent).any()
+        },
+        "thresholds": threshold_table(predicted, confidence, labels),
+        "train_seconds": round(train_seconds, 3),
+        "throughput": measure_throughput(model, args.throughput_size),
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""End-to-end pipeline benchmark.
+
+Times each stage separately against the offline fake provider:
+
+- generate: `generate.py` chats/sec and per-call latency;
+- analyze: `analyze.py` chats/sec and p50/p95/p99 per-call latency;
+- aggregate: `SupportChatAggregator.run_complete_analysis` rows/sec.
+
+Every run happens in a fresh interpreter so peak RSS belongs to that stage alone.
+Datasets are the bundled `data/examples` files plus synthetic copies scaled up
+to the requested sizes (up to 1M rows). The report is JSON; pass `--baseline`
+with an earlier report to fail on throughput regressions:
+
+    python benchmarks/pipeline.py --output benchmarks/results/pipeline.json
+    python benchmarks/pipeline.py --scales 10000,100000,1000000 --stages aggregate
+    python benchmarks/pipeline.py --baseline benchmarks/results/pipeline.json
+"""
+import argparse
+import contextlib
+import importlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+EXAMPLE_CHATS = REPO_ROOT / "data" / "examples" / "groq_dataset_260.json"
+EXAMPLE_RESULTS = REPO_ROOT / "data" / "examples" / "groq_analysis_130.json"
+STAGES = ["generate", "analyze", "aggregate"]
+
+def parse_sizes(value: str) -> list:
+    return [int(float(v)) for v in value.split(",") if v.strip()]
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        # Not available on Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(peak / divisor, 1)
+
+def latency_summary(latencies: list):
+    if len(latencies) < 2:
+        return None
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "calls": len(latencies),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2),
+        "p50_ms": round(cuts[49] * 1000, 2),
+        "p95_ms": round(cuts[94] * 1000, 2),
+        "p99_ms": round(cuts[98] * 1000, 2),
+    }
+
+# --- Datasets ---
+
+def write_scaled(source: Path, size: int, path: Path, kind: str) -> Path:
+    """Write `size` records cycled from `source` as JSONL.
+
+    Copies of chats get a `benchmark_copy` field so their content hash differs
+    and analyze.py's resume index does not treat them as already processed.
+    """
+    if path.exists():
+        return path
+    from storage.jsonl_store import iter_records
+
+    records = list(iter_records(str(source)))
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for i in range(size):
+            copy, record = divmod(i, len(records))
+            record = dict(records[record])
+            if kind == "results":
+                record["chat_id"] = i + 1
+                if copy:
+                    record["original_chat"] = dict(record["original_chat"], benchmark_copy=copy)
+            elif copy:
+                record["benchmark_copy"] = copy
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, path)
+    return path
+
+def plan_runs(args, work_dir: Path) -> list:
+    runs = []
+    if "generate" in args.stages:
+        for count in args.generate_counts:
+            runs.append({"stage": "generate", "dataset": f"synthetic-{count}", "count": count})
+    if "analyze" in args.stages:
+        runs.append({"stage": "analyze", "dataset": EXAMPLE_CHATS.name, "input": str(EXAMPLE_CHATS)})
+        for size in args.analyze_scales:
+            path = write_scaled(EXAMPLE_CHATS, size, work_dir / f"chats_{size}.jsonl", "chats")
+            runs.append({"stage": "analyze", "dataset": f"synthetic-{size}", "input": str(path)})
+    if "aggregate" in args.stages:
+        runs.append({
+            "stage": "aggregate", "dataset": EXAMPLE_RESULTS.name,
+            "chats": str(EXAMPLE_CHATS), "results": str(EXAMPLE_RESULTS),
+        })
+        for size in args.scales:
+            path = write_scaled(EXAMPLE_RESULTS, size, work_dir / f"results_{size}.jsonl", "results")
+            runs.append({"stage": "aggregate", "dataset": f"synthetic-{size}", "chats": str(path), "results": str(path)})
+    for run in runs:
+        run.update(
+            work_dir=str(work_dir), workers=args.workers, concurrency=args.concurrency,
+            batch=args.batch, latency=args.latency, replay=args.replay, fake_host=args.fake_host,
+        )
+    return runs
+
+# --- Stage runners (executed inside the worker interpreter) ---
+
+def instrument_provider_calls(latencies: list) -> None:
+    """Record the wall time of every LLMProvider.generate/agenerate call, retries included."""
+    from providers.base import LLMProvider
+
+    generate, agenerate = LLMProvider.generate, LLMProvider.agenerate
+
+    def timed_generate(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return generate(self, *args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    async def timed_agenerate(self, *args, **kwargs):
+        if self.async_client is None:
+            # Falls back to generate() in a thread, which is timed already
+            return await agenerate(self, *args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return await agenerate(self, *args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    LLMProvider.generate = timed_generate
+    LLMProvider.agenerate = timed_agenerate
+
+def run_cli(module, argv: list) -> None:
+    sys.argv = [f"{module.__name__}.py", *argv]
+    module.main()
+
+def run_generate(spec: dict, latencies: list) -> int:
+    import generate
+    from storage.jsonl_store import count_records
+
+    output = Path(spec["work_dir"]) / f"generated_{spec['count']}_{os.getpid()}.json"
+    instrument_provider_calls(latencies)
+    run_cli(generate, [
+        "--provider", "fake", "--count", str(spec["count"]), "--workers", str(spec["workers"]),
+        "--output", str(output), "--no-cache",
+        # Replayed chats repeat the 260 recorded ones; measure raw generation throughput
+        "--dedupe-threshold", "0",
+    ])
+    return count_records(str(output))
+
+def run_analyze(spec: dict, latencies: list) -> int:
+    import analyze
+    from storage.jsonl_store import count_records
+
+    output = Path(spec["work_dir"]) / f"analysis_{spec['dataset']}_{os.getpid()}.json"
+    argv = [
+        "--provider", "fake", "--input", spec["input"], "--output", str(output),
+        "--concurrency", str(spec["concurrency"]), "--no-cache",
+    ]
+    if spec["batch"]:
+        argv.append("--batch")
+    instrument_provider_calls(latencies)
+    run_cli(analyze, argv)
+    return count_records(str(output))
+
+def run_aggregate(spec: dict, latencies: list) -> int:
+    from data_aggregator import SupportChatAggregator
+
+    df, _ = SupportChatAggregator(spec["chats"], spec["results"]).run_complete_analysis()
+    return len(df)
+
+STAGE_RUNNERS = {"generate": run_generate, "analyze": run_analyze, "aggregate": run_aggregate}
+STAGE_MODULES = {
+    "generate": ["generate", "providers.fake"],
+    "analyze": ["analyze", "providers.fake"],
+    "aggregate": ["data_aggregator"],
+}
+
+def run_worker(spec: dict) -> dict:
+    os.environ["FAKE_LLM_LATENCY"] = spec["latency"]
+    if spec["replay"]:
+        os.environ["FAKE_LLM_REPLAY"] = str(EXAMPLE_RESULTS)
+    if spec["fake_host"]:
+        os.environ["FAKE_LLM_HOST"] = spec["fake_host"]
+    sys.path[:0] = [str(REPO_ROOT), str(REPO_ROOT / "analytics")]
+    os.chdir(REPO_ROOT)
+    # Import cost is measured by startup_time.py; keep it out of stage throughput
+    for module in STAGE_MODULES[spec["stage"]]:
+        importlib.import_module(module)
+
+    latencies = []
+    start = time.perf_counter()
+    # The stages report progress on stdout; keep it out of the JSON result
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        rows = STAGE_RUNNERS[spec["stage"]](spec, latencies)
+    seconds = time.perf_counter() - start
+
+    return {
+        "stage": spec["stage"],
+        "dataset": spec["dataset"],
+        "rows": rows,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(rows / seconds, 1) if seconds else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "latency": latency_summary(latencies),
+    }
+
+# --- Driver ---
+
+def run_in_subprocess(spec: dict) -> dict:
+    completed = subprocess.run(
+        [sys.executable, __file__, "--worker", json.dumps(spec)],
+        cwd=REPO_ROOT, capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        return {"stage": spec["stage"], "dataset": spec["dataset"], "error": completed.stderr.strip().splitlines()[-1:]}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare_to_baseline(report: dict, baseline_path: str, tolerance: float) -> list:
+    """Return the runs whose throughput dropped by more than `tolerance` versus the baseline."""
+    baseline = json.loads(Path(baseline_path).read_text(encoding="utf-8"))
+    previous = {(r["stage"], r["dataset"]): r for r in baseline.get("results", []) if r.get("rows_per_sec")}
+    regressions = []
+    for result in report["results"]:
+        before = previous.get((result["stage"], result["dataset"]))
+        if not before or not result.get("rows_per_sec"):
+            continue
+        ratio = result["rows_per_sec"] / before["rows_per_sec"]
+        result["vs_baseline"] = round(ratio, 3)
+        if ratio < 1 - tolerance:
+            regressions.append(f"{result['stage']}/{result['dataset']}: {before['rows_per_sec']} -> {result['rows_per_sec']} rows/sec")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the generate, analyze and aggregate stages")
+    parser.add_argument("--stages", type=lambda v: v.split(","), default=STAGES, help="Comma-separated stages to run (generate,analyze,aggregate)")
+    parser.add_argument("--scales", type=parse_sizes, default=[10_000, 100_000], help="Synthetic dataset sizes for the aggregate stage, e.g. 10000,100000,1000000")
+    parser.add_argument("--analyze-scales", type=parse_sizes, default=[1_000], help="Synthetic dataset sizes for the analyze stage")
+    parser.add_argument("--generate-counts", type=parse_sizes, default=[200], help="Chats to generate in the generate stage")
+    parser.add_argument("--workers", type=int, default=8, help="generate.py --workers")
+    parser.add_argument("--concurrency", type=int, default=8, help="analyze.py --concurrency")
+    parser.add_argument("--batch", action="store_true", help="Run analyze.py with --batch")
+    parser.add_argument("--latency", type=str, default="fixed:0", help="Fake server latency distribution (see providers/fake_server.py)")
+    parser.add_argument("--replay", action="store_true", help="Replay recorded answers from data/examples/groq_analysis_130.json")
+    parser.add_argument("--fake-host", type=str, help="Use a standalone fake server instead of an in-process one")
+    parser.add_argument("--work-dir", type=str, help="Keep synthetic datasets here and reuse them between runs (default: a temporary directory)")
+    parser.add_argument("--output", type=str, help="Write the JSON report to this path")
+    parser.add_argument("--baseline", type=str, help="Earlier report to compare throughput against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative throughput drop versus --baseline")
+    parser.add_argument("--worker", type=str, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(json.loads(args.worker))))
+        return
+
+    sys.path.insert(0, str(REPO_ROOT))
+    with contextlib.ExitStack() as stack:
+        if args.work_dir:
+            work_dir = Path(args.work_dir)
+            work_dir.mkdir(parents=True, exist_ok=True)
+        else:
+            work_dir = Path(stack.enter_context(tempfile.TemporaryDirectory(prefix="pipeline-bench-")))
+
+        report = {
+            "benchmark": "pipeline",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "git_revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "config": {
+                "workers": args.workers, "concurrency": args.concurrency, "batch": args.batch,
+                "latency": args.latency, "replay": args.replay,
+            },
+            "results": [],
+        }
+        for spec in plan_runs(args, work_dir):
+            print(f"Running {spec['stage']} on {spec['dataset']}...", file=sys.stderr)
+            report["results"].append(run_in_subprocess(spec))
+
+    regressions = compare_to_baseline(report, args.baseline, args.tolerance) if args.baseline else []
+    report["regressions"] = regressions
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        Path(args.output).write_text(text, encoding="utf-8")
+    print(text)
+    if regressions:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Cold-start benchmark for the CLI entry points.
+
+Measures how long a fresh interpreter takes to import analyze.py and
+generate.py, which provider SDKs get pulled in, and the heaviest imports
+(from `python -X importtime`). Results are written as JSON so they can be
+compared between releases:
+
+    python benchmarks/startup_time.py --runs 10 --output benchmarks/results/startup.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+ENTRY_POINTS = ["analyze", "generate"]
+SDK_MODULES = ["google.genai", "groq", "instructor", "ollama", "openai"]
+
+def run_python(code: str, *flags: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True
+    )
+
+def time_import(module: str, runs: int) -> list:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        run_python(f"import {module}")
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def loaded_sdks(module: str) -> list:
+    code = (
+        f"import sys, json, {module}; "
+        f"print(json.dumps([m for m in {SDK_MODULES!r} if m in sys.modules]))"
+    )
+    return json.loads(run_python(code).stdout)
+
+def heaviest_imports(module: str, top: int = 10) -> list:
+    """Parse `-X importtime` output into the direct imports of `module` with the largest cumulative cost."""
+    stderr = run_python(f"import {module}", "-X", "importtime").stderr
+    children, entries = [], []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        # Each nesting level adds two spaces and children are listed before their parent
+        depth = len(name) - len(name.lstrip())
+        if depth == 3:
+            children.append({"module": name.strip(), "cumulative_ms": int(cumulative_us) / 1000})
+        elif depth == 1:
+            if name.strip() == module:
+                entries = children
+            children = []
+    entries.sort(key=lambda e: e["cumulative_ms"], reverse=True)
+    return entries[:top]
+
+def summarize(timings: list) -> dict:
+    return {
+        "median_ms": round(statistics.median(timings) * 1000, 1),
+        "min_ms": round(min(timings) * 1000, 1),
+        "max_ms": round(max(timings) * 1000, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cold import time of the CLI entry points")
+    parser.add_argument("--runs", type=int, default=10, help="Fresh interpreters per entry point")
+    parser.add_argument("--output", type=str, help="Write the JSON report to this path")
+    args = parser.parse_args()
+
+    baseline = summarize(time_import("sys", args.runs))
+    report = {
+        "benchmark": "startup_time",
+        "python": platform.python_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "runs": args.runs,
+        "interpreter_baseline": baseline,
+        "entry_points": {},
+    }
+    for module in ENTRY_POINTS:
+        stats = summarize(time_import(module, args.runs))
+        stats["import_overhead_ms"] = round(stats["median_ms"] - baseline["median_ms"], 1)
+        stats["sdks_loaded"] = loaded_sdks(module)
+        stats["heaviest_imports"] = heaviest_imports(module)
+        report["entry_points"][module] = stats
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        Path(args.output).write_text(text, encoding="utf-8")
+    print(text)
+
+if __name__ == "__main__":
+    main()
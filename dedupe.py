@@ -0,0 +1,92 @@
+"""Find near-duplicate chats in existing datasets and optionally write a deduplicated copy.
+
+Reads generated chats or analysis results (JSON array or JSONL) as a stream
+and checks every transcript against a MinHash LSH index of the ones before
+it, so the scan costs about the same per chat however large the dataset is.
+The first occurrence of a chat is kept:
+
+    python dedupe.py --input data/generated_chats.json
+    python dedupe.py --input data/generated_chats.json --output data/generated_chats.dedup.json
+"""
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from judge_agent.dialogue import format_dialogue
+from storage.jsonl_store import JsonlStore, journal_path, iter_records
+from storage.near_duplicates import MinHashIndex, DEFAULT_THRESHOLD
+
+def chat_of(record: Dict) -> Optional[Dict]:
+    # Analysis results wrap the chat in original_chat
+    chat = record.get("original_chat", record) if isinstance(record, dict) else None
+    return chat if chat and chat.get("messages") else None
+
+def main():
+    parser = argparse.ArgumentParser(description="Find near-duplicate chats in a dataset or analysis results file")
+    parser.add_argument("--input", type=str, nargs="+", required=True, help="Chats or analysis results files, scanned in order as one dataset")
+    parser.add_argument("--output", type=str, help="Write the records without near-duplicates here (a .jsonl path skips compaction to a JSON array)")
+    parser.add_argument("--report", type=str, help="Write the duplicate pairs as JSON to this file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Estimated Jaccard similarity at which two chats count as near-duplicates")
+    args = parser.parse_args()
+
+    for path in args.input:
+        if not os.path.exists(path):
+            print(f"Error: Input file {path} not found.")
+            return
+
+    store = None
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        store = JsonlStore(journal_path(args.output))
+        if store.exists():
+            print(f"Error: {store.path} already exists; remove it first.")
+            return
+
+    index = MinHashIndex(args.threshold)
+    pairs = []
+    scanned = kept = 0
+    start = time.perf_counter()
+    try:
+        for path in args.input:
+            for position, record in enumerate(iter_records(path)):
+                scanned += 1
+                chat = chat_of(record)
+                match = index.add_if_new((path, position), format_dialogue(chat)) if chat else None
+                if match is not None:
+                    (first_path, first_position), score = match
+                    pairs.append({
+                        "file": path, "record": position + 1,
+                        "duplicate_of": {"file": first_path, "record": first_position + 1},
+                        "similarity": round(score, 3),
+                    })
+                    continue
+                kept += 1
+                if store is not None:
+                    store.append(record)
+    finally:
+        if store is not None:
+            store.close()
+    # A failed scan leaves its journal behind instead of a truncated output
+    if store is not None and store.path != Path(args.output):
+        store.compact(args.output)
+        store.path.unlink(missing_ok=True)
+    seconds = time.perf_counter() - start
+
+    for pair in pairs[:20]:
+        print(f"{pair['file']} #{pair['record']} ~ {pair['duplicate_of']['file']} #{pair['duplicate_of']['record']} (similarity {pair['similarity']})")
+    if len(pairs) > 20:
+        print(f"... and {len(pairs) - 20} more")
+    print(f"Scanned {scanned} records in {seconds:.2f}s: {len(pairs)} near-duplicates, {kept} kept.")
+    if args.report:
+        Path(args.report).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"threshold": args.threshold, "scanned": scanned, "duplicates": pairs}, f, indent=2, ensure_ascii=False)
+        print(f"Saved duplicate report to {args.report}")
+    if store is not None:
+        print(f"Saved {kept} records to {args.output}")
+
+if __name__ == "__main__":
+    main()
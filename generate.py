@@ -1,8 +1,15 @@
 import argparse
 import json
 import os
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Dict, Any, Optional, Tuple
 from llm_factory import get_llm_provider
+from providers.cache import DEFAULT_CACHE_DIR
+from providers import telemetry
+from providers.base import resilience_summary
+from storage.jsonl_store import JsonlStore, journal_path
+from storage.near_duplicates import MinHashIndex, DEFAULT_THRESHOLD as DEFAULT_DUPLICATE_THRESHOLD
+from judge_agent.dialogue import format_dialogue
 from judge_agent.models import SupportChat
 from judge_agent.config import (
     INTENTS, CASE_TYPES, AGENT_PERSONAS, 
@@ -22,20 +29,29 @@ logging.basicConfig(
 DEFAULT_OUTPUT_PATH = "data/generated_chats.json"
 SYSTEM_PROMPT_PATH = "prompts/generation_system.md"
 
-def generate_chat(provider, scenario: str, case_type: str, system_prompt: str) -> Dict[str, Any]:
-    agent_p = random.choice(AGENT_PERSONAS)
-    customer_p = random.choice(CUSTOMER_PERSONAS)
+def task_rng(seed: int, index: int, scenario: str, case_type: str, attempt: int = 0) -> random.Random:
+    """Return an RNG that depends only on the task, not on the order tasks are scheduled in."""
+    if attempt:
+        # Regenerations draw other personas and mistakes than the original attempt
+        return random.Random(f"{seed}:{index}:{scenario}:{case_type}:{attempt}")
+    return random.Random(f"{seed}:{index}:{scenario}:{case_type}")
+
+def generate_chat(provider, scenario: str, case_type: str, system_prompt: str, rng: Optional[random.Random] = None, sample: int = 0) -> Dict[str, Any]:
+    # Fall back to the module-level RNG when no per-task RNG is given
+    rng = rng or random
+    agent_p = rng.choice(AGENT_PERSONAS)
+    customer_p = rng.choice(CUSTOMER_PERSONAS)
     
     is_hidden_dissatisfaction = False
     if case_type == "problematic":
         # 70% chance to be hidden dissatisfaction in problematic cases
-        is_hidden_dissatisfaction = random.random() < 0.7
+        is_hidden_dissatisfaction = rng.random() < 0.7
 
     chosen_mistakes = []
     mistake_description = ""
     if case_type == "agent_mistake":
         # Pick 1-2 random mistakes
-        mistakes_objs = random.sample(MISTAKE_TYPES, k=random.randint(1, 2))
+        mistakes_objs = rng.sample(MISTAKE_TYPES, k=rng.randint(1, 2))
         chosen_mistakes = [m["name"] for m in mistakes_objs]
         mistake_description = "The agent MUST make these specific mistakes:\n" + \
                              "\n".join([f"- {m['name']}: {m['description']}" for m in mistakes_objs])
@@ -69,7 +85,8 @@ def generate_chat(provider, scenario: str, case_type: str, system_prompt: str) -
     validated_chat = provider.generate(
         prompt, 
         system_prompt=system_prompt,
-        response_model=SupportChat
+        response_model=SupportChat,
+        sample=sample
     )
     
     if not validated_chat:
@@ -79,88 +96,184 @@ def generate_chat(provider, scenario: str, case_type: str, system_prompt: str) -
     chat_dict["metadata"] = metadata
     return chat_dict
 
-def main():
-    logging.warning("Logging system active. If you see retries, they will appear below.")
-    parser = argparse.ArgumentParser(description="Generate support chat dataset")
-    parser.add_argument("--provider", type=str, default="groq", help="LLM provider (gemini, groq, ollama)")
-    parser.add_argument("--model", type=str, help="Specific model name to use")
-    parser.add_argument("--count", type=int, default=5, help="Number of chats to generate")
-    parser.add_argument("--output", type=str, default=DEFAULT_OUTPUT_PATH, help="Output file")
-    parser.add_argument("--matrix", action="store_true", help="Generate matrix (one for each intent/case_type combination)")
-    
-    args = parser.parse_args()
-    
-    provider = get_llm_provider(args.provider, model_name=args.model)
-
-    # Load generation system prompt
+def load_system_prompt() -> Optional[str]:
     try:
-        system_prompt = Path(SYSTEM_PROMPT_PATH).read_text(encoding="utf-8")
+        return Path(SYSTEM_PROMPT_PATH).read_text(encoding="utf-8")
     except FileNotFoundError:
         print(f"Error: System prompt file {SYSTEM_PROMPT_PATH} not found.")
-        return
-    
-    dataset = []
-    if os.path.exists(args.output):
+        return None
+
+def open_chat_store(output_path: str) -> JsonlStore:
+    """Chats are appended to a JSONL journal and compacted into the JSON array at the end"""
+    store = JsonlStore(journal_path(output_path))
+    if not store.exists() and os.path.exists(output_path):
         try:
-            with open(args.output, "r", encoding="utf-8") as f:
-                dataset = json.load(f)
+            store.seed_from(output_path)
         except Exception as e:
             print(f"Warning: Could not load existing dataset for checkpointing: {e}")
-            dataset = []
+    return store
 
+def plan_generation(store: JsonlStore, matrix: bool, count: int) -> Tuple[int, List[Tuple[int, str, str]]]:
+    """Return the planned number of chats and the (plan index, intent, case type) tasks still missing from the store"""
     # Checkpointing: count existing (intent, case_type) pairs
     existing_counts = {}
-    for entry in dataset:
-        key = (entry.get("intent"), entry.get("type"))
+    for entry in store:
+        key = (entry.get("scenario"), entry.get("type"))
         existing_counts[key] = existing_counts.get(key, 0) + 1
 
     pairs_to_generate = []
-    if args.matrix:
+    if matrix:
         # For matrix, we generate all combinations once
         for intent in INTENTS:
             for case_type in CASE_TYPES:
                 pairs_to_generate.append((intent, case_type))
     else:
         # Generate exactly --count samples
-        for i in range(args.count):
+        for i in range(count):
             intent = INTENTS[i % len(INTENTS)]
             case_type = CASE_TYPES[i % len(CASE_TYPES)]
             pairs_to_generate.append((intent, case_type))
 
-    # Filter out already generated pairs
+    # Filter out already generated pairs. The plan index is kept so that every
+    # task gets the same RNG seed whether or not earlier tasks were resumed.
     final_pairs = []
-    for intent, case_type in pairs_to_generate:
+    for plan_index, (intent, case_type) in enumerate(pairs_to_generate):
         key = (intent, case_type)
         if existing_counts.get(key, 0) > 0:
             existing_counts[key] -= 1
             continue
-        final_pairs.append((intent, case_type))
+        final_pairs.append((plan_index, intent, case_type))
+    return len(pairs_to_generate), final_pairs
+
+def generate_task(provider, system_prompt: str, seed: int, plan_index: int, intent: str, case_type: str, attempt: int = 0) -> Dict[str, Any]:
+    rng = task_rng(seed, plan_index, intent, case_type, attempt)
+    try:
+        return generate_chat(provider, intent, case_type, system_prompt, rng=rng, sample=attempt)
+    except Exception as e:
+        return {"error": str(e)}
+
+def open_duplicate_index(store: JsonlStore, threshold: float) -> Optional[MinHashIndex]:
+    """Near-duplicate index seeded with the chats already in the store (None when disabled)."""
+    if not threshold:
+        return None
+    index = MinHashIndex(threshold)
+    for position, chat in enumerate(store):
+        if chat.get("messages"):
+            index.add(position, format_dialogue(chat))
+    return index
+
+def admit_chat(index: Optional[MinHashIndex], position: int, chat: Dict[str, Any], retries: int, regenerate: Callable[[int], Dict[str, Any]]) -> Dict[str, Any]:
+    """Return the chat, a regenerated replacement, or an error once it stays a near-duplicate.
+
+    A replacement is drawn with other personas and a sampled (non-zero
+    temperature) answer, so it does not come back from the response cache.
+    """
+    if index is None:
+        return chat
+    for attempt in range(retries + 1):
+        if "error" in chat:
+            return chat
+        match = index.add_if_new(position, format_dialogue(chat))
+        if match is None:
+            return chat
+        duplicate_of, score = match
+        if attempt < retries:
+            print(f"Chat {position + 1} is a near-duplicate of chat {duplicate_of + 1} (similarity {score:.2f}); regenerating...")
+            chat = regenerate(attempt + 1)
+    return {"error": f"near-duplicate of chat {duplicate_of + 1} (similarity {score:.2f})", "duplicate": True}
+
+def add_dedupe_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--dedupe-threshold", type=float, default=DEFAULT_DUPLICATE_THRESHOLD, help="Estimated Jaccard similarity at which a new chat counts as a near-duplicate of the dataset (0 = keep everything)")
+    parser.add_argument("--dedupe-retries", type=int, default=2, help="Regenerations of a near-duplicate chat before it is rejected (0 = reject right away)")
+
+def main():
+    logging.warning("Logging system active. If you see retries, they will appear below.")
+    parser = argparse.ArgumentParser(description="Generate support chat dataset")
+    parser.add_argument("--provider", type=str, default="groq", help="LLM provider (gemini, groq, ollama, fake)")
+    parser.add_argument("--model", type=str, help="Specific model name to use")
+    parser.add_argument("--count", type=int, default=5, help="Number of chats to generate")
+    parser.add_argument("--output", type=str, default=DEFAULT_OUTPUT_PATH, help="Output file")
+    parser.add_argument("--matrix", action="store_true", help="Generate matrix (one for each intent/case_type combination)")
+    parser.add_argument("--workers", type=int, default=1, help="Number of chats generated in parallel (1 = sequential)")
+    parser.add_argument("--seed", type=int, default=42, help="Base seed for persona and mistake sampling")
+    parser.add_argument("--cache-dir", type=str, default=DEFAULT_CACHE_DIR, help="Directory of the persistent LLM response cache")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the LLM response cache")
+    parser.add_argument("--metrics-output", type=str, help="Write LLM call telemetry here at the end of the run (Prometheus text for *.prom, JSON otherwise)")
+    parser.add_argument("--metrics-port", type=int, help="Serve live LLM call telemetry on http://localhost:PORT/metrics (Prometheus) and /metrics.json")
+    add_dedupe_arguments(parser)
+    
+    args = parser.parse_args()
+    if args.metrics_port:
+        telemetry.start_metrics_server(args.metrics_port)
+    
+    provider = get_llm_provider(
+        args.provider,
+        model_name=args.model,
+        cache_dir=None if args.no_cache else args.cache_dir
+    )
+
+    # Load generation system prompt
+    system_prompt = load_system_prompt()
+    if system_prompt is None:
+        return
+    
+    store = open_chat_store(args.output)
+    dataset_size = len(store)
+    planned, final_pairs = plan_generation(store, args.matrix, args.count)
 
     if not final_pairs:
         print("All requested chats already exist in the output file. Nothing to generate.")
         return
 
-    # Ensure output directory exists
-    output_path = args.output
-    output_dir = os.path.dirname(output_path)
-    if output_dir:
-        os.makedirs(output_dir, exist_ok=True)
-
-    print(f"Plan to generate {len(final_pairs)} NEW chats using {args.provider} (Skipped {len(pairs_to_generate) - len(final_pairs)} existing matches)...")
+    print(f"Plan to generate {len(final_pairs)} NEW chats using {args.provider} (Skipped {planned - len(final_pairs)} existing matches)...")
+    duplicates = open_duplicate_index(store, args.dedupe_threshold)
+    rejected = 0
 
-    for i, (intent, case_type) in enumerate(final_pairs):
-        print(f"[{i+1}/{len(pairs_to_generate)}] Generating {case_type} for {intent}...")
-        chat = generate_chat(provider, intent, case_type, system_prompt)
-        
+    def commit_chat(plan_index: int, intent: str, case_type: str, chat: Dict[str, Any]) -> None:
+        nonlocal dataset_size, rejected
+        chat = admit_chat(
+            duplicates, dataset_size, chat, args.dedupe_retries,
+            lambda attempt: generate_task(provider, system_prompt, args.seed, plan_index, intent, case_type, attempt)
+        )
+        rejected += bool(chat.get("duplicate"))
         if "error" not in chat:
-            dataset.append(chat)
             # Intermediate save
-            with open(output_path, "w", encoding="utf-8") as f:
-                json.dump(dataset, f, ensure_ascii=False, indent=2)
+            store.append(chat)
+            dataset_size += 1
         else:
             print(f"Error generating chat for {intent}: {chat['error']}")
+
+    def run_task(i: int, plan_index: int, intent: str, case_type: str) -> Dict[str, Any]:
+        print(f"[{i+1}/{planned}] Generating {case_type} for {intent}...")
+        return generate_task(provider, system_prompt, args.seed, plan_index, intent, case_type)
+
+    try:
+        if args.workers > 1:
+            with ThreadPoolExecutor(max_workers=args.workers) as executor:
+                futures = [
+                    ((plan_index, intent, case_type), executor.submit(run_task, i, plan_index, intent, case_type))
+                    for i, (plan_index, intent, case_type) in enumerate(final_pairs)
+                ]
+                # Only the main thread writes the checkpoint and checks for duplicates, in plan order
+                for task, future in futures:
+                    commit_chat(*task, future.result())
+        else:
+            for i, (plan_index, intent, case_type) in enumerate(final_pairs):
+                commit_chat(plan_index, intent, case_type, run_task(i, plan_index, intent, case_type))
+    finally:
+        store.close()
+        if store.path != Path(args.output):
+            store.compact(args.output)
         
-    print(f"Successfully finished. Dataset size: {len(dataset)} records in {args.output}")
+    print(f"Successfully finished. Dataset size: {dataset_size} records in {args.output}")
+    if rejected:
+        print(f"Rejected {rejected} near-duplicate chats (raise --dedupe-threshold or --dedupe-retries to keep more of them).")
+    if provider.response_cache is not None:
+        print(f"Response cache: {provider.response_cache.stats()}")
+    print(f"LLM telemetry: {json.dumps(telemetry.registry.summary(), indent=2)}")
+    print(f"Retry budget and circuit breakers: {json.dumps(resilience_summary(), indent=2)}")
+    if args.metrics_output:
+        telemetry.write_metrics(args.metrics_output)
 
 if __name__ == "__main__":
     main()
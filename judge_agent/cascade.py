@@ -0,0 +1,183 @@
+"""Two-tier judge: a cheap model answers first, the strong model only when a gate fires.
+
+Gates are checks that need no ground truth:
+- consistency: the fields of one answer contradict each other (e.g. a perfect
+  quality_score next to agent mistakes, or a solved problem flagged no_resolution);
+- disagreement: a second, independently sampled cheap answer disagrees on
+  intent, satisfaction, is_problem_solved or the score (judge_agent.config);
+- cheap_error: the cheap model failed or returned an invalid answer.
+
+Every result records the tier that produced it and, when escalated, the gates
+that fired, and stats() gives the escalation rate.
+"""
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from providers.base import LLMProvider
+from judge_agent.config import CASCADE_AGREEMENT_FIELDS, CASCADE_SCORE_TOLERANCE, NO_MISTAKES
+from judge_agent.evaluation_agent import LLMJudge
+
+CHEAP_TIER = "cheap"
+STRONG_TIER = "strong"
+CHEAP_ERROR = "cheap_error"
+
+def _mistakes(result: Dict[str, Any]) -> set:
+    return set(result.get("agent_mistakes") or []) - {NO_MISTAKES}
+
+# name -> predicate over one evaluation result; True means the answer contradicts itself
+CONSISTENCY_GATES: Dict[str, Callable[[Dict[str, Any]], bool]] = {
+    "none_with_mistakes": lambda r: NO_MISTAKES in (r.get("agent_mistakes") or []) and bool(_mistakes(r)),
+    "top_score_with_mistakes": lambda r: r["quality_score"] == 5 and bool(_mistakes(r)),
+    "low_score_without_mistakes": lambda r: r["quality_score"] <= 2 and not _mistakes(r),
+    "solved_with_no_resolution": lambda r: r["is_problem_solved"] and "no_resolution" in _mistakes(r),
+    "top_score_unsolved": lambda r: r["quality_score"] == 5 and not r["is_problem_solved"],
+}
+
+def consistency_issues(result: Dict[str, Any]) -> List[str]:
+    if "error" in result:
+        return [CHEAP_ERROR]
+    return [name for name, gate in CONSISTENCY_GATES.items() if gate(result)]
+
+def disagreements(first: Dict[str, Any], second: Dict[str, Any]) -> List[str]:
+    """Fields on which two samples of the same dialogue disagree."""
+    if "error" in second:
+        return [CHEAP_ERROR]
+    issues = [f"disagree_{field}" for field in CASCADE_AGREEMENT_FIELDS if first.get(field) != second.get(field)]
+    if abs(first["quality_score"] - second["quality_score"]) > CASCADE_SCORE_TOLERANCE:
+        issues.append("disagree_quality_score")
+    return issues
+
+class CascadeJudge(LLMJudge):
+    """LLMJudge on the cheap provider that escalates gated dialogues to a strong judge.
+
+    With samples=2 (the default) each dialogue that passes the consistency
+    gates is sampled a second time, so a confident cheap answer costs two cheap
+    calls; samples=1 relies on the consistency gates alone.
+    """
+
+    def __init__(self, provider: LLMProvider, strong_provider: LLMProvider, samples: int = 2, **kwargs):
+        super().__init__(provider, **kwargs)
+        # Plain judges for each tier; this class only adds the gating around them
+        self.cheap = LLMJudge(provider)
+        self.strong = LLMJudge(strong_provider)
+        self.samples = samples
+        self.judged = 0
+        self.escalations = Counter()
+        self._stats_lock = threading.Lock()
+
+    def _record(self, outcome: Dict[str, Any], reasons: List[str]) -> Dict[str, Any]:
+        outcome["result"]["judge_tier"] = STRONG_TIER if reasons else CHEAP_TIER
+        if reasons:
+            outcome["result"]["escalation_reasons"] = reasons
+        with self._stats_lock:
+            self.judged += 1
+            self.escalations.update(reasons)
+            self.escalations["total"] += bool(reasons)
+        return outcome
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            escalated = self.escalations["total"]
+            return {
+                "cheap_model": getattr(self.provider, "model_name", None),
+                "strong_model": getattr(self.strong.provider, "model_name", None),
+                "judged": self.judged,
+                "escalated": escalated,
+                "escalation_rate": round(escalated / self.judged * 100, 1) if self.judged else 0.0,
+                "gates": {name: count for name, count in self.escalations.most_common() if name != "total"},
+            }
+
+    # --- Single dialogues ---
+
+    def _cheap_answer(self, dialogue: str) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+        try:
+            first = self.cheap.evaluate_dialogue(dialogue)
+            reasons = consistency_issues(first["result"])
+            if not reasons and self.samples > 1:
+                reasons = disagreements(first["result"], self.cheap.evaluate_dialogue(dialogue, sample=1)["result"])
+        except Exception:
+            return None, [CHEAP_ERROR]
+        return first, reasons
+
+    def evaluate_dialogue(self, dialogue: str, sample: int = 0) -> Dict[str, Any]:
+        first, reasons = self._cheap_answer(dialogue)
+        if reasons:
+            return self._record(self.strong.evaluate_dialogue(dialogue, sample), reasons)
+        return self._record(first, reasons)
+
+    async def _acheap_answer(self, dialogue: str) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+        try:
+            first = await self.cheap.aevaluate_dialogue(dialogue)
+            reasons = consistency_issues(first["result"])
+            if not reasons and self.samples > 1:
+                second = await self.cheap.aevaluate_dialogue(dialogue, sample=1)
+                reasons = disagreements(first["result"], second["result"])
+        except Exception:
+            return None, [CHEAP_ERROR]
+        return first, reasons
+
+    async def aevaluate_dialogue(self, dialogue: str, sample: int = 0) -> Dict[str, Any]:
+        first, reasons = await self._acheap_answer(dialogue)
+        if reasons:
+            return self._record(await self.strong.aevaluate_dialogue(dialogue, sample), reasons)
+        return self._record(first, reasons)
+
+    # --- Batches ---
+
+    def _gate_batch(self, dialogues, first, errors, second=None, second_errors=None) -> Dict[str, List[str]]:
+        """chat_id -> gates that fired, for every dialogue of the batch that must be escalated."""
+        reasons = {}
+        for chat_id, _ in dialogues:
+            if chat_id in errors or chat_id not in first:
+                reasons[chat_id] = [CHEAP_ERROR]
+                continue
+            issues = consistency_issues(first[chat_id]["result"])
+            if not issues and second is not None:
+                if chat_id in second_errors or chat_id not in second:
+                    issues = [CHEAP_ERROR]
+                else:
+                    issues = disagreements(first[chat_id]["result"], second[chat_id]["result"])
+            if issues:
+                reasons[chat_id] = issues
+        return reasons
+
+    def _finish_batch(self, first, reasons, strong, strong_errors) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Exception]]:
+        results, errors = {}, {}
+        for chat_id, outcome in first.items():
+            if chat_id not in reasons:
+                results[chat_id] = self._record(outcome, [])
+        for chat_id, issues in reasons.items():
+            if chat_id in strong:
+                results[chat_id] = self._record(strong[chat_id], issues)
+            else:
+                errors[chat_id] = strong_errors.get(chat_id, ValueError("No evaluation returned"))
+        return results, errors
+
+    def _needs_second_sample(self, dialogues, first, errors) -> List[Tuple[str, str]]:
+        if self.samples < 2:
+            return []
+        gated = self._gate_batch(dialogues, first, errors)
+        return [(chat_id, dialogue) for chat_id, dialogue in dialogues if chat_id not in gated]
+
+    def evaluate_batch(self, dialogues: List[Tuple[str, str]], sample: int = 0) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Exception]]:
+        first, errors = self.cheap.evaluate_batch(dialogues)
+        second, second_errors = None, None
+        recheck = self._needs_second_sample(dialogues, first, errors)
+        if recheck:
+            second, second_errors = self.cheap.evaluate_batch(recheck, sample=1)
+        reasons = self._gate_batch(dialogues, first, errors, second, second_errors)
+        escalated = [(chat_id, dialogue) for chat_id, dialogue in dialogues if chat_id in reasons]
+        strong, strong_errors = self.strong.evaluate_batch(escalated, sample) if escalated else ({}, {})
+        return self._finish_batch(first, reasons, strong, strong_errors)
+
+    async def aevaluate_batch(self, dialogues: List[Tuple[str, str]], sample: int = 0) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Exception]]:
+        first, errors = await self.cheap.aevaluate_batch(dialogues)
+        second, second_errors = None, None
+        recheck = self._needs_second_sample(dialogues, first, errors)
+        if recheck:
+            second, second_errors = await self.cheap.aevaluate_batch(recheck, sample=1)
+        reasons = self._gate_batch(dialogues, first, errors, second, second_errors)
+        escalated = [(chat_id, dialogue) for chat_id, dialogue in dialogues if chat_id in reasons]
+        strong, strong_errors = await self.strong.aevaluate_batch(escalated, sample) if escalated else ({}, {})
+        return self._finish_batch(first, reasons, strong, strong_errors)
@@ -55,25 +55,63 @@ CUSTOMER_PERSONAS = [
     }
 ]
 
+# Single registry of agent mistake types. "bit" is the type's position in the
+# analytics bitmask: append new types with the next free bit, never renumber
 MISTAKE_TYPES = [
     {
         "name": "ignored_question",
+        "bit": 0,
         "description": "The agent completely ignores one or more specific questions or concerns raised by the customer."
     },
     {
         "name": "incorrect_info",
+        "bit": 1,
         "description": "The agent provides factually wrong information about the product, technical steps, or company policy."
     },
     {
         "name": "rude_tone",
+        "bit": 2,
         "description": "The agent's tone is dismissive, passive-aggressive, or overtly rude to the customer."
     },
     {
         "name": "no_resolution",
+        "bit": 3,
         "description": "The agent ends the interaction without actually solving the customer's primary problem despite saying they are finished."
     },
     {
         "name": "unnecessary_escalation",
+        "bit": 4,
         "description": "The agent transfers the customer to another department for a basic issue they should have been able to handle themselves."
     }
 ]
+
+MISTAKE_BITS = {m["name"]: m["bit"] for m in MISTAKE_TYPES}
+NO_MISTAKES = "none"
+
+# Token budgets used to size batched judge requests. "input" bounds the packed
+# dialogues per request, "output" the structured answer (~EVALUATION_OUTPUT_TOKENS
+# per dialogue). Models not listed fall back to "default".
+BATCH_TOKEN_BUDGETS = {
+    "default": {"input": 4000, "output": 4096},
+    "llama-3.3-70b-versatile": {"input": 6000, "output": 2048},
+    "llama-3.1-8b-instant": {"input": 3000, "output": 2048},
+    "meta-llama/llama-4-scout-17b-16e-instruct": {"input": 12000, "output": 2048},
+    "gemini-2.5-flash-lite": {"input": 30000, "output": 8192},
+    "gemma-3-27b-it": {"input": 6000, "output": 8192},
+}
+
+EVALUATION_OUTPUT_TOKENS = 350
+
+# Judge cascade (analyze.py --cascade): the cheap model's answer is kept unless
+# a gate fires. Two cheap samples must agree on these fields, and on
+# quality_score within CASCADE_SCORE_TOLERANCE points. Mistake lists are left
+# out on purpose: samples often differ on minor mistakes without changing the verdict
+CASCADE_AGREEMENT_FIELDS = ["intent", "satisfaction", "is_problem_solved"]
+CASCADE_SCORE_TOLERANCE = 1
+
+# Token budget of one serialized dialogue (analyze.py --dialogue-budget). 0 sends
+# every chat verbatim; with a budget, longer chats are compressed by
+# judge_agent/dialogue.py and the opening request and the last
+# DIALOGUE_KEEP_FINAL_CUSTOMER_TURNS customer turns are always sent verbatim
+DIALOGUE_TOKEN_BUDGET = 0
+DIALOGUE_KEEP_FINAL_CUSTOMER_TURNS = 2
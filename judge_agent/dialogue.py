@@ -0,0 +1,140 @@
+"""Serialization of a chat into the transcript the judge reads.
+
+serialize_dialogue() keeps a transcript within a token budget. Nothing
+changes while the chat fits. Otherwise it compresses in stages and stops as
+soon as the transcript fits:
+1. drop courtesy sentences (greetings, thanks, stock apologies). _COURTESY
+   only knows English phrasings, so chats in other languages skip this
+   stage and go straight to truncation;
+2. cut the middle out of long turns, keeping their beginning and end;
+3. replace whole middle turns by an omission marker.
+The opening customer request and the final customer turns are never touched,
+since intent and satisfaction are read from them.
+"""
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+from judge_agent.config import DIALOGUE_KEEP_FINAL_CUSTOMER_TURNS
+
+# Per-turn token caps tried in order when truncating long turns
+TRUNCATION_CAPS = (256, 128, 64, 32)
+MIN_KEPT_WORDS = 8
+COURTESY_PLACEHOLDER = "[pleasantries]"
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+_COURTESY = re.compile(
+    r"^(?:"
+    r"(?:hi|hello|hey|greetings|good (?:morning|afternoon|evening))\b[^.!?]{0,40}"
+    r"|thanks?(?: you)?(?: so much| very much| again)?(?: for [^.!?]{0,60})?"
+    r"|(?:you're|you are) (?:very |most )?welcome\b[^.!?]{0,40}"
+    r"|(?:i'm|i am) (?:here|happy|glad) to (?:help|assist)\b[^.!?]{0,60}"
+    r"|(?:i'm |i am )?glad (?:i|we) could (?:help|assist)\b[^.!?]{0,40}"
+    r"|(?:i )?(?:sincerely )?apologi[sz]e for (?:any|the) inconvenience\b[^.!?]{0,40}"
+    r"|(?:have|enjoy) a (?:great|nice|good|wonderful|lovely) (?:day|evening|weekend)\b[^.!?]{0,20}"
+    r"|is there anything else (?:i can|we can) (?:help|assist) (?:you )?with(?: today)?"
+    r")[.!?]*$",
+    re.IGNORECASE,
+)
+
+def _line(role: str, content: str) -> str:
+    return f"{'Customer' if role == 'user' else 'Agent'}: {content}\n"
+
+def format_dialogue(chat_data: Dict) -> str:
+    # Convert chat messages to a readable string for the judge
+    return "".join(_line(msg["role"], msg["content"]) for msg in chat_data.get("messages", []))
+
+def _omission(count: int) -> str:
+    return f"[{count} turn{'s' if count > 1 else ''} omitted]\n"
+
+def _protected_turns(messages: List[Dict]) -> set:
+    customer = [i for i, msg in enumerate(messages) if msg["role"] == "user"]
+    keep = set(customer[:1])
+    if DIALOGUE_KEEP_FINAL_CUSTOMER_TURNS:
+        keep.update(customer[-DIALOGUE_KEEP_FINAL_CUSTOMER_TURNS:])
+    return keep
+
+def _strip_courtesy(content: str) -> Tuple[str, int]:
+    sentences = _SENTENCE_SPLIT.split(content.strip())
+    kept = [s for s in sentences if not _COURTESY.match(s.strip())]
+    return " ".join(kept), len(sentences) - len(kept)
+
+def _truncate_middle(content: str, cap: int, count_tokens: Callable[[str], int]) -> str:
+    tokens = count_tokens(content)
+    if tokens <= cap:
+        return content
+    words = content.split()
+    keep = max(MIN_KEPT_WORDS, len(words) * cap // tokens)
+    if keep >= len(words):
+        return content
+    head, tail = words[:keep - keep // 2], words[len(words) - keep // 2:]
+    return f"{' '.join(head)} [... {len(words) - len(head) - len(tail)} words omitted ...] {' '.join(tail)}"
+
+def serialize_dialogue(chat_data: Dict, count_tokens: Callable[[str], int], budget: Optional[int] = None) -> Tuple[str, Optional[Dict]]:
+    """Transcript of the chat within `budget` tokens, plus compression stats (None if sent verbatim)."""
+    messages = chat_data.get("messages", [])
+    text = format_dialogue(chat_data)
+    if not budget:
+        return text, None
+    original_tokens = count_tokens(text)
+    if original_tokens <= budget:
+        return text, None
+
+    stats = {"original_tokens": original_tokens, "budget": budget,
+             "courtesy_sentences": 0, "truncated_turns": 0, "omitted_turns": 0}
+    protected = _protected_turns(messages)
+    # None marks a turn that was dropped entirely (stage 3)
+    turns: List[Optional[Tuple[str, str]]] = [(msg["role"], msg["content"]) for msg in messages]
+
+    def render() -> str:
+        lines, omitted = [], 0
+        for turn in turns:
+            if turn is None:
+                omitted += 1
+                continue
+            if omitted:
+                lines.append(_omission(omitted))
+                omitted = 0
+            lines.append(_line(*turn))
+        if omitted:
+            lines.append(_omission(omitted))
+        return "".join(lines)
+
+    def done() -> Tuple[str, Dict]:
+        stats["tokens"] = count_tokens(text)
+        stats["saved_pct"] = round((1 - stats["tokens"] / original_tokens) * 100, 1)
+        return text, stats
+
+    for i, turn in enumerate(turns):
+        if i in protected:
+            continue
+        content, removed = _strip_courtesy(turn[1])
+        stats["courtesy_sentences"] += removed
+        turns[i] = (turn[0], content or COURTESY_PLACEHOLDER)
+    text = render()
+    if count_tokens(text) <= budget:
+        return done()
+
+    truncated = set()
+    for cap in TRUNCATION_CAPS:
+        for i, turn in enumerate(turns):
+            if turn is None or i in protected:
+                continue
+            content = _truncate_middle(turn[1], cap, count_tokens)
+            if content != turn[1]:
+                turns[i] = (turn[0], content)
+                truncated.add(i)
+        stats["truncated_turns"] = len(truncated)
+        text = render()
+        if count_tokens(text) <= budget:
+            return done()
+
+    # Last resort: drop the oldest unprotected turns after the opening request
+    for i, turn in enumerate(turns):
+        if turn is None or i in protected:
+            continue
+        turns[i] = None
+        stats["omitted_turns"] += 1
+        text = render()
+        if count_tokens(text) <= budget:
+            break
+    return done()
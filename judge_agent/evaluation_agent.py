@@ -1,23 +1,46 @@
 import json
-from typing import Dict, Any
+import asyncio
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
 from providers.base import LLMProvider
-from providers.gemini import GeminiProvider
-from pathlib import Path
-from judge_agent.models import SupportEvaluationResult
+from judge_agent.config import BATCH_TOKEN_BUDGETS, EVALUATION_OUTPUT_TOKENS
+from judge_agent.dialogue import serialize_dialogue
+from judge_agent.models import SupportEvaluationResult, SupportEvaluationBatch
+from judge_agent.prompt_templates import load_prompt_template
+from judge_agent.intent_classifier import IntentClassifier, DEFAULT_THRESHOLD, CLASSIFIER_SOURCE
 from pydantic import ValidationError
 
 class LLMJudge:
 
+    system_prompt = "You are an AI assistant tasked with evaluating dialogues strictly following the schema."
+    batch_system_prompt = (
+        "You are an AI assistant tasked with evaluating several independent dialogues strictly following the schema. "
+        "Return exactly one evaluation per dialogue and copy each dialogue's id into chat_id."
+    )
+
     @property
     def prompt_filename(self) -> str:
         return "support_quality_metric_prompt.md"
     
-    def __init__(self, provider: LLMProvider):
+    def __init__(self, provider: LLMProvider, intent_classifier: Optional[IntentClassifier] = None,
+                 intent_threshold: float = DEFAULT_THRESHOLD, dialogue_budget: Optional[int] = None):
         self.provider = provider
+        # Token budget of one serialized dialogue; None sends every chat verbatim
+        self.dialogue_budget = dialogue_budget
+        # Set only for intent-only runs: confident predictions skip the LLM call
+        self.intent_classifier = intent_classifier
+        self.intent_threshold = intent_threshold
+        self.intents_classified = 0
+        self.template = load_prompt_template(self.prompt_filename, SupportEvaluationResult)
+        # Let the provider cache the static part of every judge request up front
+        self.provider.register_prompt_prefix(self.system_prompt, self.template.prefix)
+        self._batch_prefix_registered = False
+
+    def serialize(self, chat_data: Dict[str, Any]) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """Transcript of a chat within the dialogue budget, counted with this judge's tokenizer."""
+        return serialize_dialogue(chat_data, self.provider.count_tokens, self.dialogue_budget)
 
     def get_analysis_prompt(self, dialogue: str):
-        prompt = Path(f"prompts/{self.prompt_filename}").read_text(encoding="utf-8")
-        return prompt.replace("{dialogue}", dialogue)
+        return self.template.render(dialogue)
     
     def parse_response(self, response: Any) -> Dict[str, Any]:
         try:
@@ -35,17 +58,162 @@ class LLMJudge:
                 "details": str(e)
             }
 
-    def evaluate_dialogue(self, dialogue: str) -> Dict[str, Any]:
+    def evaluate_dialogue(self, dialogue: str, sample: int = 0) -> Dict[str, Any]:
         evaluation_results = {}
         prompt = self.get_analysis_prompt(dialogue)
             
         raw_response = self.provider.generate(
             prompt=prompt,
-            system_prompt="You are an AI assistant tasked with evaluating dialogues strictly following the schema.",
-            response_model=SupportEvaluationResult
+            system_prompt=self.system_prompt,
+            response_model=SupportEvaluationResult,
+            sample=sample
         )
 
         result = self.parse_response(raw_response)
         evaluation_results["result"] = result
             
-        return evaluation_results
\ No newline at end of file
+        return evaluation_results
+
+    async def aevaluate_dialogue(self, dialogue: str, sample: int = 0) -> Dict[str, Any]:
+        evaluation_results = {}
+        prompt = self.get_analysis_prompt(dialogue)
+
+        raw_response = await self.provider.agenerate(
+            prompt=prompt,
+            system_prompt=self.system_prompt,
+            response_model=SupportEvaluationResult,
+            sample=sample
+        )
+
+        result = self.parse_response(raw_response)
+        evaluation_results["result"] = result
+
+        return evaluation_results
+
+    def classify_intents(self, dialogues: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """Intent-only results from the local classifier; None where it is not confident enough."""
+        if self.intent_classifier is None or not dialogues:
+            return [None] * len(dialogues)
+        labels = []
+        for intent, confidence in self.intent_classifier.predict(dialogues):
+            if confidence < self.intent_threshold:
+                labels.append(None)
+                continue
+            self.intents_classified += 1
+            labels.append({"result": {
+                "intent": intent,
+                "intent_confidence": round(confidence, 4),
+                "intent_source": CLASSIFIER_SOURCE,
+            }})
+        return labels
+
+    # --- Batched evaluation ---
+
+    def estimate_tokens(self, text: str) -> int:
+        return self.provider.count_tokens(text)
+
+    def batch_limits(self) -> Tuple[int, int]:
+        """Return (input token budget, max dialogues) for one batched request to this model."""
+        model_name = getattr(self.provider, "model_name", None)
+        budget = BATCH_TOKEN_BUDGETS.get(model_name, BATCH_TOKEN_BUDGETS["default"])
+        output_budget = budget["output"]
+        max_tokens = self.provider._get_generation_kwargs().get("max_tokens")
+        if max_tokens:
+            output_budget = min(output_budget, max_tokens)
+        return budget["input"], max(1, output_budget // EVALUATION_OUTPUT_TOKENS)
+
+    def iter_batches(self, items: Iterable[Tuple[str, str, Any]], max_batch_size: Optional[int] = None) -> Iterator[List[Tuple[str, str, Any]]]:
+        """Greedily pack (chat_id, dialogue, payload) items into batches that fit the model's token budget."""
+        input_budget, max_items = self.batch_limits()
+        if max_batch_size:
+            max_items = min(max_items, max_batch_size)
+
+        batch, batch_tokens = [], 0
+        for item in items:
+            tokens = self.estimate_tokens(item[1])
+            if batch and (len(batch) >= max_items or batch_tokens + tokens > input_budget):
+                yield batch
+                batch, batch_tokens = [], 0
+            batch.append(item)
+            batch_tokens += tokens
+        if batch:
+            yield batch
+
+    def get_batch_prompt(self, dialogues: List[Tuple[str, str]]) -> str:
+        if not self._batch_prefix_registered:
+            self.provider.register_prompt_prefix(self.batch_system_prompt, self.template.prefix)
+            self._batch_prefix_registered = True
+        blocks = "\n".join(
+            f'<dialogue id="{chat_id}">\n{dialogue.strip()}\n</dialogue>' for chat_id, dialogue in dialogues
+        )
+        return self.get_analysis_prompt(blocks)
+
+    def _split_batch_response(self, response: Any, dialogues: List[Tuple[str, str]]) -> Dict[str, Dict[str, Any]]:
+        """Map a batch response to {chat_id: evaluation_results}, keeping only ids that were asked for once."""
+        if not isinstance(response, SupportEvaluationBatch):
+            return {}
+        expected = {chat_id for chat_id, _ in dialogues}
+        seen = {}
+        for evaluation in response.evaluations:
+            if evaluation.chat_id in expected:
+                seen.setdefault(evaluation.chat_id, []).append(evaluation)
+
+        results = {}
+        for chat_id, evaluations in seen.items():
+            if len(evaluations) == 1:
+                result = evaluations[0].model_dump(exclude={"chat_id"})
+                results[chat_id] = {"result": result}
+        return results
+
+    def evaluate_batch(self, dialogues: List[Tuple[str, str]], sample: int = 0) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Exception]]:
+        """Judge several dialogues in one request.
+
+        Returns (results, errors) keyed by chat_id. Dialogues the batch answer does
+        not cover cleanly (validation failure, missing or duplicated ids) are
+        re-judged one by one.
+        """
+        try:
+            response = self.provider.generate(
+                prompt=self.get_batch_prompt(dialogues),
+                system_prompt=self.batch_system_prompt,
+                response_model=SupportEvaluationBatch,
+                sample=sample
+            )
+            results = self._split_batch_response(response, dialogues)
+        except Exception:
+            results = {}
+
+        errors = {}
+        for chat_id, dialogue in dialogues:
+            if chat_id in results:
+                continue
+            try:
+                results[chat_id] = self.evaluate_dialogue(dialogue, sample)
+            except Exception as e:
+                errors[chat_id] = e
+        return results, errors
+
+    async def aevaluate_batch(self, dialogues: List[Tuple[str, str]], sample: int = 0) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Exception]]:
+        try:
+            response = await self.provider.agenerate(
+                prompt=self.get_batch_prompt(dialogues),
+                system_prompt=self.batch_system_prompt,
+                response_model=SupportEvaluationBatch,
+                sample=sample
+            )
+            results = self._split_batch_response(response, dialogues)
+        except Exception:
+            results = {}
+
+        errors = {}
+        missing = [(chat_id, dialogue) for chat_id, dialogue in dialogues if chat_id not in results]
+        fallbacks = await asyncio.gather(
+            *(self.aevaluate_dialogue(dialogue, sample) for _, dialogue in missing),
+            return_exceptions=True
+        )
+        for (chat_id, _), outcome in zip(missing, fallbacks):
+            if isinstance(outcome, Exception):
+                errors[chat_id] = outcome
+            else:
+                results[chat_id] = outcome
+        return results, errors
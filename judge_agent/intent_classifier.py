@@ -0,0 +1,211 @@
+"""Local intent classifier that labels the easy chats without an LLM call.
+
+Dialogues are turned into hashed word uni/bigram features (a fixed-size sparse
+vector, so there is no vocabulary to keep) and scored by a multinomial
+logistic regression written in NumPy. It is trained on the intents the LLM
+judge assigned in earlier analysis results:
+
+    python -m judge_agent.intent_classifier --results data/examples/groq_analysis_130.json
+
+`analyze.py --intent-only` then keeps every prediction whose probability
+reaches the threshold and sends only the remaining chats to the judge.
+"""
+import argparse
+import json
+import os
+import re
+import time
+import zlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, get_args
+
+import numpy as np
+
+from judge_agent.dialogue import format_dialogue
+from judge_agent.models import request_intent
+from storage.jsonl_store import iter_records
+
+INTENTS = list(get_args(request_intent))
+DEFAULT_MODEL_PATH = "data/intent_classifier.npz"
+DEFAULT_THRESHOLD = 0.8
+N_FEATURES = 2 ** 18
+CLASSIFIER_SOURCE = "classifier"
+DEFAULT_INTENT_OUTPUT = "data/intent_labels.json"
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+# Role prefixes are the same in every dialogue and carry no signal
+_ROLE_RE = re.compile(r"^(Customer|Agent): ", re.MULTILINE)
+
+@lru_cache(maxsize=1 << 17)
+def _hash(gram: str) -> int:
+    # crc32 is stable across processes, unlike hash()
+    return zlib.crc32(gram.encode("utf-8"))
+
+def featurize(texts: Iterable[str], n_features: int = N_FEATURES) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Sparse CSR rows (indptr, indices, values) of L2-normalised, log-scaled n-gram counts.
+
+    The hash picks the column and, through its top bit, the sign, so
+    colliding n-grams tend to cancel out instead of adding up.
+    """
+    indptr, indices, values = [0], [], []
+    for text in texts:
+        tokens = _TOKEN_RE.findall(_ROLE_RE.sub("", text).lower())
+        counts = {}
+        for gram in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+            h = _hash(gram)
+            column = h % n_features
+            counts[column] = counts.get(column, 0.0) + (1.0 if h & 0x80000000 else -1.0)
+        row = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        row = np.sign(row) * np.log1p(np.abs(row))
+        norm = np.linalg.norm(row)
+        indices.extend(counts)
+        values.append(row / norm if norm else row)
+        indptr.append(len(indices))
+    return (
+        np.asarray(indptr, dtype=np.int64),
+        np.asarray(indices, dtype=np.int64),
+        np.concatenate(values) if values else np.zeros(0),
+    )
+
+def _softmax(scores: np.ndarray) -> np.ndarray:
+    scores = scores - scores.max(axis=1, keepdims=True)
+    exp = np.exp(scores)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+class IntentClassifier:
+    """Hashed n-gram logistic regression over the request_intent labels"""
+
+    def __init__(self, weights: np.ndarray, bias: np.ndarray, classes: Sequence[str], trained_on: int = 0):
+        self.weights = weights
+        self.bias = bias
+        self.classes = list(classes)
+        self.trained_on = trained_on
+
+    @property
+    def n_features(self) -> int:
+        return self.weights.shape[0]
+
+    def _scores(self, features: Tuple[np.ndarray, np.ndarray, np.ndarray], weights: np.ndarray, bias: np.ndarray) -> np.ndarray:
+        indptr, indices, values = features
+        rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+        contributions = weights[indices] * values[:, None]
+        scores = np.empty((len(indptr) - 1, len(self.classes)))
+        for c in range(len(self.classes)):
+            scores[:, c] = np.bincount(rows, weights=contributions[:, c], minlength=len(scores))
+        return scores + bias
+
+    @classmethod
+    def fit(cls, texts: Sequence[str], labels: Sequence[str], n_features: int = N_FEATURES,
+            epochs: int = 300, learning_rate: float = 0.5, l2: float = 1e-4) -> "IntentClassifier":
+        """Full-batch gradient descent with momentum on the L2-regularised cross-entropy"""
+        model = cls(np.zeros((n_features, len(INTENTS))), np.zeros(len(INTENTS)), INTENTS, trained_on=len(texts))
+        if not texts:
+            return model
+        features = featurize(texts, n_features)
+        indptr, indices, values = features
+        rows = np.repeat(np.arange(len(texts)), np.diff(indptr))
+        targets = np.zeros((len(texts), len(INTENTS)))
+        targets[np.arange(len(texts)), [INTENTS.index(label) for label in labels]] = 1.0
+
+        # Only columns that occur in the training set ever get a gradient
+        active = np.unique(indices)
+        local = np.searchsorted(active, indices)
+        weights = np.zeros((len(active), len(INTENTS)))
+        velocity_w, velocity_b = np.zeros_like(weights), np.zeros(len(INTENTS))
+        bias = model.bias
+        for _ in range(epochs):
+            errors = (_softmax(model._scores((indptr, local, values), weights, bias)) - targets) / len(texts)
+            grad_w = np.empty_like(weights)
+            for c in range(len(INTENTS)):
+                grad_w[:, c] = np.bincount(local, weights=values * errors[rows, c], minlength=len(active))
+            grad_w += l2 * weights
+            velocity_w = 0.9 * velocity_w - learning_rate * grad_w
+            velocity_b = 0.9 * velocity_b - learning_rate * errors.sum(axis=0)
+            weights += velocity_w
+            bias = bias + velocity_b
+
+        model.weights[active] = weights
+        model.bias = bias
+        model.weights = model.weights.astype(np.float32)
+        return model
+
+    def predict_proba(self, texts: Iterable[str]) -> np.ndarray:
+        return _softmax(self._scores(featurize(texts, self.n_features), self.weights, self.bias))
+
+    def predict(self, texts: Iterable[str]) -> List[Tuple[str, float]]:
+        """(intent, probability) of the most likely label for each text"""
+        probabilities = self.predict_proba(texts)
+        best = probabilities.argmax(axis=1)
+        return [(self.classes[c], float(p)) for c, p in zip(best, probabilities[np.arange(len(best)), best])]
+
+    # --- Persistence ---
+
+    def save(self, path: str) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez_compressed(
+            tmp_path, weights=self.weights, bias=self.bias,
+            classes=np.array(self.classes), trained_on=self.trained_on,
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "IntentClassifier":
+        with np.load(path) as data:
+            return cls(data["weights"], data["bias"], [str(c) for c in data["classes"]], int(data["trained_on"]))
+
+def load_labeled_dialogues(paths: Iterable[str]) -> Tuple[List[str], List[str]]:
+    """(dialogue, intent) pairs judged by the LLM in analysis results files"""
+    texts, labels = [], []
+    for path in paths:
+        for record in iter_records(path):
+            result = (record.get("analysis") or {}).get("result") or {}
+            # The classifier's own labels would only reinforce its mistakes
+            if result.get("intent") not in INTENTS or result.get("intent_source") == CLASSIFIER_SOURCE:
+                continue
+            if not (record.get("original_chat") or {}).get("messages"):
+                continue
+            texts.append(format_dialogue(record["original_chat"]))
+            labels.append(result["intent"])
+    return texts, labels
+
+def is_intent_only(record: Dict) -> bool:
+    """True for an analysis record that holds only the classifier's intent, not a judgement."""
+    analysis = record.get("analysis") if isinstance(record, dict) else None
+    result = analysis.get("result") if isinstance(analysis, dict) else None
+    return isinstance(result, dict) and result.get("intent_source") == CLASSIFIER_SOURCE
+
+def load_classifier(path: str) -> Optional[IntentClassifier]:
+    if not os.path.exists(path):
+        return None
+    return IntentClassifier.load(path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the local intent classifier on the judge's labels")
+    parser.add_argument("--results", nargs="+", default=["data/analysis_results.json"], help="Analysis results files (JSON array or JSONL)")
+    parser.add_argument("--output", type=str, default=DEFAULT_MODEL_PATH, help="Where to save the model (.npz)")
+    parser.add_argument("--epochs", type=int, default=300, help="Gradient descent iterations")
+    parser.add_argument("--l2", type=float, default=1e-4, help="L2 regularisation strength")
+    args = parser.parse_args()
+
+    texts, labels = load_labeled_dialogues(args.results)
+    if not texts:
+        print(f"Error: No labeled dialogues found in {', '.join(args.results)}.")
+        return
+    start = time.perf_counter()
+    model = IntentClassifier.fit(texts, labels, epochs=args.epochs, l2=args.l2)
+    seconds = time.perf_counter() - start
+    model.save(args.output)
+
+    predicted = [intent for intent, _ in model.predict(texts)]
+    print(json.dumps({
+        "trained_on": len(texts),
+        "labels": {intent: labels.count(intent) for intent in INTENTS if intent in labels},
+        "training_accuracy": round(float(np.mean(np.array(predicted) == np.array(labels))), 4),
+        "train_seconds": round(seconds, 2),
+    }, indent=2))
+    print(f"Saved intent classifier to {args.output}")
+
+if __name__ == "__main__":
+    main()
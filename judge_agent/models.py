@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field, field_validator, computed_field
 from typing import List, Literal, Any, Optional
+from judge_agent.config import MISTAKE_TYPES, NO_MISTAKES
 
 request_intent = Literal[
     "payment_troubles",
@@ -10,6 +11,9 @@ request_intent = Literal[
     "other"
 ]
 
+# Built from the shared registry so a new mistake type only needs a config entry
+agent_mistake = Literal[tuple(m["name"] for m in MISTAKE_TYPES) + (NO_MISTAKES,)]
+
 # --- Base Models ---
 
 class Message(BaseModel):
@@ -53,14 +57,7 @@ class SupportEvaluationResult(BaseModel):
         ge=1, le=5, 
         description="Support's quality rate on the scale from 1 to 5 where 1 is terrible response and 5 is perfect response."
     )
-    agent_mistakes: List[Literal[
-        "ignored_question", 
-        "incorrect_info", 
-        "rude_tone", 
-        "no_resolution", 
-        "unnecessary_escalation",
-        "none"
-    ]] = Field(
+    agent_mistakes: List[agent_mistake] = Field(
         description="List of support's mistakes. If there are none, return ['none']."
     )
     is_problem_solved: bool = Field(
@@ -69,4 +66,20 @@ class SupportEvaluationResult(BaseModel):
 
     @computed_field
     def hidden_unsatisfaction(self) -> bool:
-        return not self.is_problem_solved and self.satisfaction != "unsatisfied"
\ No newline at end of file
+        return not self.is_problem_solved and self.satisfaction != "unsatisfied"
+
+# --- Batched Analysis Models ---
+
+class DialogueReference(BaseModel):
+    chat_id: str = Field(
+        description="Identifier of the evaluated dialogue, copied exactly from its <dialogue id=\"...\"> tag."
+    )
+
+class BatchedEvaluationResult(SupportEvaluationResult, DialogueReference):
+    # Inheriting DialogueReference last puts chat_id before thought_process in the schema
+    pass
+
+class SupportEvaluationBatch(BaseModel):
+    evaluations: List[BatchedEvaluationResult] = Field(
+        description="Exactly one evaluation per dialogue, in the order the dialogues were given."
+    )
@@ -0,0 +1,49 @@
+from functools import lru_cache
+from pathlib import Path
+from typing import Type
+from pydantic import BaseModel
+
+PROMPTS_DIR = Path("prompts")
+
+def describe_schema(model: Type[BaseModel]) -> str:
+    """Render a model's fields as plain-text output instructions (name, allowed values, description)."""
+    lines = []
+    for name, spec in model.model_json_schema()["properties"].items():
+        allowed = spec.get("enum") or spec.get("items", {}).get("enum")
+        if allowed:
+            kind = "list of " if spec.get("type") == "array" else "one of "
+            constraint = kind + ", ".join(allowed)
+        elif "minimum" in spec and "maximum" in spec:
+            constraint = f"{spec['type']} from {spec['minimum']} to {spec['maximum']}"
+        else:
+            constraint = spec.get("type", "value")
+        lines.append(f"- {name} ({constraint}): {spec.get('description', '')}")
+    return "\n".join(lines)
+
+class PromptTemplate:
+    """A prompt file compiled once into a static prefix and a per-call variable tail.
+
+    The variable placeholder must be the last thing in the template, so every
+    rendered prompt starts with the same bytes and providers can reuse the
+    prefix (Gemini context caches, Ollama KV cache).
+    """
+
+    def __init__(self, text: str, placeholder: str = "{dialogue}", **static_fields: str):
+        for field, value in static_fields.items():
+            text = text.replace("{" + field + "}", value)
+
+        prefix, found, suffix = text.partition(placeholder)
+        if not found:
+            raise ValueError(f"Prompt template has no {placeholder} placeholder")
+        if suffix.strip():
+            raise ValueError(f"Prompt template must end with {placeholder} to keep a stable prefix")
+        self.prefix = prefix
+
+    def render(self, value: str) -> str:
+        return self.prefix + value
+
+@lru_cache(maxsize=None)
+def load_prompt_template(filename: str, response_model: Type[BaseModel]) -> PromptTemplate:
+    """Read and compile a prompt file once per process."""
+    text = (PROMPTS_DIR / filename).read_text(encoding="utf-8")
+    return PromptTemplate(text, schema_instructions=describe_schema(response_model))
@@ -1,21 +1,72 @@
 import os
-from typing import Optional
+import importlib
+from importlib.metadata import entry_points
+from typing import Optional, List, Tuple, Type
 from providers.base import LLMProvider
-from providers.gemini import GeminiProvider
-from providers.groq import GroqProvider
-from providers.ollama import OllamaProvider
+from providers.cache import ResponseCache
 from dotenv import load_dotenv
 
 load_dotenv()
 
-def get_llm_provider(provider_type: str, model_name: Optional[str] = None) -> LLMProvider:
+# Built-in providers: name -> (module, class, model env variable, default model).
+# Modules are imported only when requested, so e.g. `--provider ollama` never
+# pays for importing the Gemini or Groq SDKs.
+PROVIDERS = {
+    "gemini": ("providers.gemini", "GeminiProvider", "GEMINI_MODEL", "gemini-2.5-flash-lite"),
+    "groq": ("providers.groq", "GroqProvider", "GROQ_MODEL", "llama-3.3-70b-versatile"),
+    "ollama": ("providers.ollama", "OllamaProvider", "OLLAMA_MODEL", "llama3.2"),
+    "fake": ("providers.fake", "FakeProvider", "FAKE_MODEL", "fake-support-model"),
+}
+
+# First-tier model of the judge cascade (analyze.py --cascade PROVIDER) when no
+# model is given; the regular --provider/--model is the tier it escalates to
+CHEAP_MODELS = {
+    "groq": "llama-3.1-8b-instant",
+    "gemini": "gemma-3-27b-it",
+    "ollama": "llama3.2:1b",
+    "fake": "fake-support-model-small",
+}
+
+# Third-party packages can register LLMProvider subclasses under this group, e.g.
+# [project.entry-points."ai_support_analyzer.providers"] mistral = "pkg.module:MistralProvider"
+ENTRY_POINT_GROUP = "ai_support_analyzer.providers"
+
+def available_providers() -> List[str]:
+    return sorted(set(PROVIDERS) | {ep.name for ep in entry_points(group=ENTRY_POINT_GROUP)})
+
+def _load_provider_class(provider_type: str) -> Type[LLMProvider]:
+    if provider_type in PROVIDERS:
+        module_name, class_name, _, _ = PROVIDERS[provider_type]
+        return getattr(importlib.import_module(module_name), class_name)
+
+    for ep in entry_points(group=ENTRY_POINT_GROUP):
+        if ep.name == provider_type:
+            return ep.load()
+
+    raise ValueError(f"Unknown provider type: {provider_type}")
+
+def get_llm_provider(provider_type: str, model_name: Optional[str] = None, cache_dir: Optional[str] = None) -> LLMProvider:
     provider_type = provider_type.lower()
-        
-    if provider_type == "gemini":
-        return GeminiProvider(model_name=model_name or os.getenv("GEMINI_MODEL", "gemini-2.5-flash-lite"))
-    elif provider_type == "groq":
-        return GroqProvider(model_name=model_name or os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile"))
-    elif provider_type == "ollama":
-        return OllamaProvider(model_name=model_name or os.getenv("OLLAMA_MODEL", "llama3.2"))
+    provider_class = _load_provider_class(provider_type)
+
+    if provider_type in PROVIDERS:
+        _, _, model_env, default_model = PROVIDERS[provider_type]
+        provider = provider_class(model_name=model_name or os.getenv(model_env, default_model))
+    elif model_name:
+        provider = provider_class(model_name=model_name)
     else:
-        raise ValueError(f"Unknown provider type: {provider_type}")
+        provider = provider_class()
+
+    if cache_dir:
+        provider.response_cache = ResponseCache(cache_dir)
+    return provider
+
+def parse_provider_spec(spec: str) -> Tuple[str, Optional[str]]:
+    """Split "provider" or "provider:model" (Ollama tags like llama3.2:1b keep their colon)."""
+    provider_type, _, model_name = spec.partition(":")
+    return provider_type.lower(), model_name or None
+
+def get_cascade_provider(spec: str, cache_dir: Optional[str] = None) -> LLMProvider:
+    """Cheap first tier of the judge cascade from a "provider[:model]" spec."""
+    provider_type, model_name = parse_provider_spec(spec)
+    return get_llm_provider(provider_type, model_name=model_name or CHEAP_MODELS.get(provider_type), cache_dir=cache_dir)
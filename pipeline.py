@@ -0,0 +1,181 @@
+"""Fused generate -> analyze run: each chat is judged as soon as it is generated.
+
+Generation and judging run in their own thread pools and are connected by a
+bounded queue, so the two stages overlap their network waits and a slow judge
+throttles generation instead of letting chats pile up in memory. Both stages
+checkpoint exactly like generate.py and analyze.py (JSONL journals plus the
+resume index), so re-running the same command after a crash first judges the
+chats that were generated but never scored, then generates what is missing.
+"""
+import argparse
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, Tuple
+
+from llm_factory import get_llm_provider
+from providers.cache import DEFAULT_CACHE_DIR
+from providers import telemetry
+from judge_agent.evaluation_agent import LLMJudge
+from judge_agent.config import DIALOGUE_TOKEN_BUDGET
+from storage.resume_index import FAILED, SKIPPED
+from generate import load_system_prompt, open_chat_store, plan_generation, generate_task, open_duplicate_index, admit_chat, add_dedupe_arguments
+from analyze import ResultCommitter, open_results, iter_units, describe_unit, analyze_unit, report_run
+
+_END = object()
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate support chats and analyze them in one streaming run")
+    parser.add_argument("--provider", type=str, default="groq", help="LLM provider for generation (gemini, groq, ollama, fake)")
+    parser.add_argument("--model", type=str, help="Specific generation model")
+    parser.add_argument("--judge-provider", type=str, help="LLM provider for analysis (default: --provider)")
+    parser.add_argument("--judge-model", type=str, help="Specific analysis model (default: the judge provider's default; without --judge-provider/--judge-model the generation model judges too)")
+    parser.add_argument("--count", type=int, default=5, help="Number of chats to generate")
+    parser.add_argument("--matrix", action="store_true", help="Generate matrix (one for each intent/case_type combination)")
+    parser.add_argument("--seed", type=int, default=42, help="Base seed for persona and mistake sampling")
+    parser.add_argument("--chats-output", type=str, default="data/generated_chats.json", help="Generated chats file")
+    parser.add_argument("--output", type=str, default="data/analysis_results.json", help="Analysis results file")
+    parser.add_argument("--generate-workers", type=int, default=4, help="Chats generated in parallel")
+    parser.add_argument("--analyze-concurrency", type=int, default=4, help="Judge requests kept in flight")
+    parser.add_argument("--queue-size", type=int, default=16, help="Generated chats buffered for the judge before generation pauses")
+    parser.add_argument("--batch", action="store_true", help="Pack several dialogues into each judge request, sized from the model's token budget")
+    parser.add_argument("--batch-size", type=int, help="Upper bound on dialogues per batched request (default: derived from the token budget)")
+    parser.add_argument("--dialogue-budget", type=int, default=DIALOGUE_TOKEN_BUDGET, help="Token budget of one dialogue sent to the judge; longer chats are compressed (default 0: always send verbatim, e.g. 1500 to cap long chats)")
+    parser.add_argument("--retry", nargs="+", choices=[FAILED, SKIPPED], default=[], help="Re-judge chats recorded as failed and/or skipped in the resume index")
+    parser.add_argument("--cache-dir", type=str, default=DEFAULT_CACHE_DIR, help="Directory of the persistent LLM response cache")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the LLM response cache")
+    parser.add_argument("--metrics-output", type=str, help="Write LLM call telemetry here at the end of the run (Prometheus text for *.prom, JSON otherwise)")
+    parser.add_argument("--metrics-port", type=int, help="Serve live LLM call telemetry on http://localhost:PORT/metrics (Prometheus) and /metrics.json")
+    add_dedupe_arguments(parser)
+
+    args = parser.parse_args()
+    if args.metrics_port:
+        telemetry.start_metrics_server(args.metrics_port)
+
+    system_prompt = load_system_prompt()
+    if system_prompt is None:
+        return
+
+    cache_dir = None if args.no_cache else args.cache_dir
+    provider = get_llm_provider(args.provider, model_name=args.model, cache_dir=cache_dir)
+    judge_provider = provider
+    if args.judge_provider or args.judge_model:
+        judge_provider = get_llm_provider(args.judge_provider or args.provider, model_name=args.judge_model, cache_dir=cache_dir)
+    judge = LLMJudge(provider=judge_provider, dialogue_budget=args.dialogue_budget)
+
+    for path in (args.chats_output, args.output):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+    chat_store = open_chat_store(args.chats_output)
+    existing_chats = len(chat_store)
+    planned, final_pairs = plan_generation(chat_store, args.matrix, args.count)
+    duplicates = open_duplicate_index(chat_store, args.dedupe_threshold)
+    total = existing_chats + len(final_pairs)
+    store, index = open_results(args.output)
+    results = ResultCommitter(store, index, args.retry, total)
+
+    print(f"Pipeline: {existing_chats} existing chats, {len(final_pairs)} to generate with {args.provider}, "
+          f"judged by {args.judge_provider or args.provider} as they arrive...")
+
+    # Bounded hand-off: put() blocks while the judge is behind, which stops the
+    # generation window from advancing (backpressure)
+    handoff = queue.Queue(maxsize=args.queue_size)
+    stop = threading.Event()
+    producer_error = []
+
+    def hand_off(item) -> None:
+        while not stop.is_set():
+            try:
+                handoff.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def produce() -> None:
+        try:
+            # Chats generated by an interrupted run are judged first
+            for position, chat in enumerate(chat_store):
+                if stop.is_set():
+                    return
+                hand_off((position, chat))
+
+            dataset_size = existing_chats
+            with ThreadPoolExecutor(max_workers=args.generate_workers) as executor:
+                window = deque()
+
+                def commit_chat() -> None:
+                    nonlocal dataset_size
+                    (plan_index, intent, case_type), future = window.popleft()
+                    chat = admit_chat(
+                        duplicates, dataset_size, future.result(), args.dedupe_retries,
+                        lambda attempt: generate_task(provider, system_prompt, args.seed, plan_index, intent, case_type, attempt)
+                    )
+                    if "error" in chat:
+                        print(f"Error generating chat for {intent}: {chat['error']}")
+                        return
+                    chat_store.append(chat)
+                    hand_off((dataset_size, chat))
+                    dataset_size += 1
+
+                for i, (plan_index, intent, case_type) in enumerate(final_pairs):
+                    if stop.is_set():
+                        break
+                    print(f"[{i+1}/{len(final_pairs)}] Generating {case_type} for {intent}...")
+                    window.append(((plan_index, intent, case_type), executor.submit(
+                        generate_task, provider, system_prompt, args.seed, plan_index, intent, case_type
+                    )))
+                    # Chats are committed in plan order, like generate.py
+                    if len(window) >= args.generate_workers:
+                        commit_chat()
+                while window and not stop.is_set():
+                    commit_chat()
+        except BaseException as e:
+            producer_error.append(e)
+        finally:
+            hand_off(_END)
+
+    def generated_chats() -> Iterator[Tuple[int, Dict]]:
+        while True:
+            item = handoff.get()
+            if item is _END:
+                return
+            yield item
+
+    producer = threading.Thread(target=produce, name="pipeline-generate", daemon=True)
+    producer.start()
+    try:
+        units = iter_units(judge, results.pending(generated_chats()), args.batch, args.batch_size)
+        with ThreadPoolExecutor(max_workers=args.analyze_concurrency) as executor:
+            window = deque()
+            for unit in units:
+                print(describe_unit(unit, total))
+                window.append(executor.submit(analyze_unit, judge, unit))
+                # Results are committed in dataset order as soon as the oldest request is done
+                while window and (len(window) >= args.analyze_concurrency or window[0].done()):
+                    for outcome in window.popleft().result():
+                        results.commit(*outcome)
+            while window:
+                for outcome in window.popleft().result():
+                    results.commit(*outcome)
+    finally:
+        stop.set()
+        producer.join()
+        # Compact even when interrupted so the JSON outputs reflect every checkpoint
+        for journal, output_path in ((chat_store, args.chats_output), (store, args.output)):
+            journal.close()
+            if journal.path != Path(output_path):
+                journal.compact(output_path)
+    if producer_error:
+        raise producer_error[0]
+
+    print(f"Successfully finished. {len(chat_store)} chats in {args.chats_output}, {len(store)} analysis results in {args.output}")
+    for status, count in results.held_back.items():
+        if count:
+            print(f"Held back {count} chats previously recorded as {status} (use --retry {status} to re-process).")
+    report_run(args, provider, judge)
+    if judge_provider is not provider and judge_provider.response_cache is not None:
+        print(f"Judge response cache: {judge_provider.response_cache.stats()}")
+
+if __name__ == "__main__":
+    main()
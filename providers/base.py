@@ -1,32 +1,527 @@
+import os
+import re
+import math
 import time
+import asyncio
 import logging
+import threading
 from abc import ABC, abstractmethod
-from typing import Optional, Any, Type
+from typing import Optional, Any, Type, List, Dict, Tuple
 from pydantic import BaseModel
+from providers import telemetry
 from tenacity import (
     retry,
-    stop_after_attempt,
     wait_exponential,
-    retry_if_exception_type,
+    wait_random_exponential,
+    retry_if_exception,
     before_sleep_log
 )
 
 # Configure locking to avoid overwhelming logs
 logger = logging.getLogger(__name__)
 
+# Published quotas per provider, refined per model where they differ. "rpm" and
+# "tpm" are requests and tokens per minute (None = unlimited); "max_concurrency"
+# caps the adaptive in-flight window. Every value can be overridden with
+# <PROVIDER>_RPM, <PROVIDER>_TPM and <PROVIDER>_MAX_CONCURRENCY env variables.
+RATE_LIMITS = {
+    "groq": {
+        "default": {"rpm": 30, "tpm": 6000, "max_concurrency": 8},
+        "llama-3.3-70b-versatile": {"rpm": 30, "tpm": 12000},
+        "llama-3.1-8b-instant": {"rpm": 30, "tpm": 6000},
+        "meta-llama/llama-4-scout-17b-16e-instruct": {"rpm": 30, "tpm": 30000},
+    },
+    "gemini": {
+        "default": {"rpm": 15, "tpm": 250000, "max_concurrency": 8},
+        "gemini-2.5-flash-lite": {"rpm": 15, "tpm": 250000},
+        "gemma-3-27b-it": {"rpm": 30, "tpm": 15000},
+    },
+    "ollama": {
+        "default": {"rpm": None, "tpm": None, "max_concurrency": 2},
+    },
+    # Local fake server; set FAKE_RPM/FAKE_TPM to emulate a real quota in load tests
+    "fake": {
+        "default": {"rpm": None, "tpm": None, "max_concurrency": 32},
+    },
+}
+
+# Circuit breaker per provider/model: opens after `failure_threshold` consecutive
+# calls fail with rate limits or transient errors (at once on an auth error) and
+# rejects calls until `cooldown` seconds have passed; one probe call then decides
+# whether it closes again, each failed probe doubling the cooldown up to
+# `max_cooldown`. Override with <PROVIDER>_BREAKER_FAILURES and <PROVIDER>_BREAKER_COOLDOWN.
+CIRCUIT_BREAKER = {"failure_threshold": 5, "cooldown": 30.0, "max_cooldown": 300.0}
+
+# Run-wide retry budget shared by all providers: retries may not exceed `ratio`
+# of the calls made so far plus `min_retries`, so an outage cannot multiply the
+# load on a provider. Override with LLM_RETRY_BUDGET_RATIO and LLM_RETRY_BUDGET_MIN.
+RETRY_BUDGET = {"ratio": 0.2, "min_retries": 10}
+
+# Rough size of a structured answer, used when reserving TPM budget up front
+COMPLETION_TOKEN_ESTIMATE = 512
+
+# Temperature of the extra samples drawn with generate(..., sample=n), n > 0
+SAMPLE_TEMPERATURE = 0.7
+
+# Average characters per token of each provider's tokenizer on English support
+# chats, refined per model where it differs. Used to budget prompts locally
+# without a tokenizer round trip; providers with an exact counter override count_tokens()
+CHARS_PER_TOKEN = {
+    "groq": {"default": 3.8},
+    "gemini": {"default": 4.0, "gemma-3-27b-it": 3.6},
+    "ollama": {"default": 3.8},
+    "fake": {"default": 4.0},
+}
+
+def chars_per_token(provider: str, model: Optional[str] = None) -> float:
+    ratios = CHARS_PER_TOKEN.get(provider, {})
+    return ratios.get(model, ratios.get("default", 4.0))
+
+def resolve_rate_limits(provider: str, model: Optional[str] = None) -> Dict[str, Any]:
+    """Merge provider defaults, model-specific limits and env overrides."""
+    provider_limits = RATE_LIMITS.get(provider, {})
+    limits = {"rpm": None, "tpm": None, "max_concurrency": 4}
+    limits.update(provider_limits.get("default", {}))
+    if model:
+        limits.update(provider_limits.get(model, {}))
+
+    for key in ("rpm", "tpm", "max_concurrency"):
+        env_value = os.getenv(f"{provider.upper()}_{key.upper()}")
+        if env_value:
+            limits[key] = int(env_value)
+    return limits
+
+def estimate_tokens(messages: List[Dict[str, str]], ratio: float = 4.0) -> int:
+    """Cheap prompt token estimate (`ratio` characters per token) plus the expected completion."""
+    prompt_chars = sum(len(m["content"]) for m in messages)
+    return int(prompt_chars / ratio) + COMPLETION_TOKEN_ESTIMATE
+
+def _iter_exception_chain(exc: Optional[BaseException]):
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        yield exc
+        exc = exc.__cause__ or exc.__context__
+
+def is_rate_limit_error(exc: Optional[BaseException]) -> bool:
+    """Detect HTTP 429 across the Groq/OpenAI, GenAI and Ollama SDK exception types."""
+    for e in _iter_exception_chain(exc):
+        if getattr(e, "status_code", None) == 429 or getattr(e, "code", None) == 429:
+            return True
+        if type(e).__name__ == "RateLimitError":
+            return True
+    return False
+
+def retry_after_seconds(exc: Optional[BaseException]) -> Optional[float]:
+    """Return the server-requested delay from a Retry-After header or GenAI retryDelay, if any."""
+    for e in _iter_exception_chain(exc):
+        response = getattr(e, "response", None)
+        headers = getattr(response, "headers", None)
+        if headers is not None:
+            value = headers.get("retry-after")
+            if value:
+                try:
+                    return max(float(value), 0.0)
+                except ValueError:
+                    pass
+        match = re.search(r"retryDelay['\"]?\s*:\s*['\"](\d+(?:\.\d+)?)s", str(e))
+        if match:
+            return float(match.group(1))
+    return None
+
+# Error classes of a failed call; only RATE_LIMIT and TRANSIENT are retried (see RETRY_POLICY)
+RATE_LIMIT = "rate_limit"      # HTTP 429
+TRANSIENT = "transient"        # 5xx, timeouts, dropped connections
+AUTH = "auth"                  # 401/403: no retry can fix it, opens the circuit breaker at once
+BAD_REQUEST = "bad_request"    # other 4xx: the same request fails the same way
+VALIDATION = "validation"      # no valid answer after instructor's re-asks
+CIRCUIT_OPEN = "circuit_open"  # rejected by an open circuit breaker without calling the provider
+FATAL = "fatal"                # anything else, e.g. a bug in the calling code
+
+_TRANSIENT_TYPES = {"APIConnectionError", "APITimeoutError", "TransportError"}
+_VALIDATION_TYPES = {"ValidationError", "JSONDecodeError", "IncompleteOutputException", "ResponseParsingError"}
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a provider whose circuit breaker is open."""
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    for attr in ("status_code", "code"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int) and 100 <= value < 600:
+            return value
+    return None
+
+def classify_error(exc: Optional[BaseException]) -> str:
+    """Sort a failed call into one of the error classes above across the SDK exception types."""
+    for e in _iter_exception_chain(exc):
+        if isinstance(e, CircuitOpenError):
+            return CIRCUIT_OPEN
+        status = _status_code(e)
+        names = {cls.__name__ for cls in type(e).__mro__}
+        if status == 429 or "RateLimitError" in names:
+            return RATE_LIMIT
+        if status in (401, 403) or names & {"AuthenticationError", "PermissionDeniedError"}:
+            return AUTH
+        if status is not None and (status >= 500 or status == 408):
+            return TRANSIENT
+        if status is not None and status >= 400:
+            return BAD_REQUEST
+        if names & _TRANSIENT_TYPES or isinstance(e, (ConnectionError, TimeoutError)):
+            return TRANSIENT
+        if names & _VALIDATION_TYPES:
+            return VALIDATION
+    # instructor gives up with a bare InstructorRetryException once its re-asks are used up
+    if exc is not None and type(exc).__name__ == "InstructorRetryException":
+        return VALIDATION
+    return FATAL
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at a per-minute rate.
+
+    reserve() always succeeds and returns how long the caller must wait; going
+    into debt makes later callers queue behind earlier ones instead of racing.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= min(amount, self.capacity)
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+class AdaptiveConcurrency:
+    """AIMD in-flight window: grows by ~1 per window of successes, halves on throttling."""
+
+    def __init__(self, max_limit: int):
+        self.max_limit = max(1, max_limit)
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+        self._cond = threading.Condition()
+        # (loop, future) of coroutines parked in aacquire(); release() wakes them from any thread
+        self._async_waiters = []
+
+    def try_acquire(self) -> bool:
+        with self._cond:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    async def aacquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                if self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            await waiter
+
+    def release(self, throttled: bool = False) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(1.0, self.limit / 2)
+            else:
+                self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+            waiters, self._async_waiters = self._async_waiters, []
+        for loop, waiter in waiters:
+            # Cancelled waiters are skipped; their loop may already be closed
+            if not waiter.done():
+                loop.call_soon_threadsafe(_wake, waiter)
+
+def _wake(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+class RateLimiter:
+    """Per provider/model limiter combining RPM and TPM buckets with an AIMD window."""
+
+    def __init__(self, rpm: Optional[int] = None, tpm: Optional[int] = None, max_concurrency: int = 4):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+        self.blocked_until = 0.0
+
+    def _reserve(self, tokens: int) -> float:
+        delay = max(0.0, self.blocked_until - time.monotonic())
+        if self.requests:
+            delay = max(delay, self.requests.reserve(1))
+        if self.tokens:
+            delay = max(delay, self.tokens.reserve(tokens))
+        return delay
+
+    def acquire(self, tokens: int) -> None:
+        self.concurrency.acquire()
+        delay = self._reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def aacquire(self, tokens: int) -> None:
+        await self.concurrency.aacquire()
+        delay = self._reserve(tokens)
+        if delay > 0:
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                self.concurrency.release()
+                raise
+
+    def release(self, error: Optional[BaseException] = None) -> None:
+        throttled = is_rate_limit_error(error)
+        if throttled:
+            # Pause every caller sharing this quota, not just the one that was throttled
+            retry_after = retry_after_seconds(error)
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+        self.concurrency.release(throttled=throttled)
+
+_rate_limiters: Dict[Tuple[str, Optional[str]], RateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+def get_rate_limiter(provider: str, model: Optional[str] = None) -> RateLimiter:
+    """Return the limiter shared by every provider instance using the same quota."""
+    with _rate_limiters_lock:
+        key = (provider, model)
+        if key not in _rate_limiters:
+            _rate_limiters[key] = RateLimiter(**resolve_rate_limits(provider, model))
+        return _rate_limiters[key]
+
+def wait_for_retry_after(fallback):
+    """tenacity wait strategy: honor the server's Retry-After, else use `fallback`."""
+    def _wait(retry_state) -> float:
+        retry_after = retry_after_seconds(retry_state.outcome.exception())
+        if retry_after is not None:
+            return retry_after
+        return fallback(retry_state)
+    return _wait
+
+# error class -> (max attempts, tenacity wait strategy); other classes are never retried
+RETRY_POLICY = {
+    RATE_LIMIT: (5, wait_for_retry_after(wait_exponential(multiplier=1, min=4, max=60))),
+    TRANSIENT: (3, wait_random_exponential(multiplier=1, max=10)),
+}
+
+class CircuitBreaker:
+    """Consecutive-failure breaker of one provider/model: closed -> open -> half-open -> closed."""
+
+    def __init__(self, name: str, failure_threshold: int = 5, cooldown: float = 30.0, max_cooldown: float = 300.0):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.base_cooldown = cooldown
+        self.max_cooldown = max(cooldown, max_cooldown)
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened_until = 0.0
+        self.reason: Optional[str] = None
+        self.trips = 0
+        self.rejected = 0
+        self._probe_started: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """Let the call through, or raise CircuitOpenError while the breaker is open."""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == "open" and now >= self.opened_until:
+                self.state = "half_open"
+            if self.state == "closed":
+                return
+            # Half-open lets one probe through; a probe that never reported back is replaced after a cooldown
+            if self.state == "half_open" and (self._probe_started is None or now - self._probe_started > self.cooldown):
+                self._probe_started = now
+                return
+            self.rejected += 1
+            if self.state == "half_open":
+                wait = "while a probe call is in flight"
+            elif self.opened_until == math.inf:
+                wait = "until restarted"
+            else:
+                wait = f"for another {self.opened_until - now:.0f}s"
+            raise CircuitOpenError(f"{self.name} circuit breaker is open ({self.reason}); failing fast {wait}")
+
+    def allows_retry(self) -> bool:
+        return self.state == "closed"
+
+    def _open(self, cooldown: float, reason: str) -> None:
+        self.state = "open"
+        self.opened_until = time.monotonic() + cooldown
+        self.reason = reason
+        self.trips += 1
+        wait = "for the rest of the run" if cooldown == math.inf else f"for {cooldown:.0f}s"
+        logger.error(f"Circuit breaker for {self.name} opened ({reason}); failing calls fast {wait}")
+
+    def record(self, error_class: Optional[str]) -> None:
+        """Report the outcome of a call let through by before_call() (None = success)."""
+        with self._lock:
+            self._probe_started = None
+            if error_class == AUTH:
+                self._open(math.inf, "authentication failed")
+            elif error_class in (RATE_LIMIT, TRANSIENT):
+                self.failures += 1
+                if self.state == "half_open":
+                    self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+                    self._open(self.cooldown, f"probe failed: {error_class}")
+                elif self.state == "closed" and self.failures >= self.failure_threshold:
+                    self._open(self.cooldown, f"{self.failures} consecutive {error_class} failures")
+            else:
+                # The provider answered, even if the answer was unusable
+                if self.state != "closed":
+                    logger.warning(f"Circuit breaker for {self.name} closed again")
+                self.state = "closed"
+                self.failures = 0
+                self.cooldown = self.base_cooldown
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"state": self.state, "trips": self.trips, "rejected_calls": self.rejected, "reason": self.reason}
+
+def resolve_breaker_settings(provider: str) -> Dict[str, Any]:
+    settings = dict(CIRCUIT_BREAKER)
+    failures = os.getenv(f"{provider.upper()}_BREAKER_FAILURES")
+    cooldown = os.getenv(f"{provider.upper()}_BREAKER_COOLDOWN")
+    if failures:
+        settings["failure_threshold"] = int(failures)
+    if cooldown:
+        settings["cooldown"] = float(cooldown)
+    return settings
+
+_circuit_breakers: Dict[Tuple[str, Optional[str]], CircuitBreaker] = {}
+_circuit_breakers_lock = threading.Lock()
+
+def get_circuit_breaker(provider: str, model: Optional[str] = None) -> CircuitBreaker:
+    """Return the breaker shared by every provider instance calling the same model."""
+    with _circuit_breakers_lock:
+        key = (provider, model)
+        if key not in _circuit_breakers:
+            _circuit_breakers[key] = CircuitBreaker(f"{provider}/{model}", **resolve_breaker_settings(provider))
+        return _circuit_breakers[key]
+
+class RetryBudget:
+    """Run-wide cap on retries: at most `ratio` of the calls made so far plus `min_retries`."""
+
+    def __init__(self, ratio: float = 0.2, min_retries: int = 10):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.calls = 0
+        self.retries = 0
+        self.denied = 0
+        self._lock = threading.Lock()
+
+    def record_call(self) -> None:
+        with self._lock:
+            self.calls += 1
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self.retries < self.min_retries + self.ratio * self.calls:
+                self.retries += 1
+                return True
+            self.denied += 1
+            if self.denied == 1:
+                logger.error(f"Retry budget exhausted ({self.retries} retries for {self.calls} calls); failed calls are no longer retried")
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"calls": self.calls, "retries": self.retries, "denied": self.denied,
+                    "limit": int(self.min_retries + self.ratio * self.calls)}
+
+_retry_budget: Optional[RetryBudget] = None
+
+def get_retry_budget() -> RetryBudget:
+    """Return the process-wide retry budget, created from RETRY_BUDGET and env overrides on first use."""
+    global _retry_budget
+    with _circuit_breakers_lock:
+        if _retry_budget is None:
+            settings = dict(RETRY_BUDGET)
+            if os.getenv("LLM_RETRY_BUDGET_RATIO"):
+                settings["ratio"] = float(os.getenv("LLM_RETRY_BUDGET_RATIO"))
+            if os.getenv("LLM_RETRY_BUDGET_MIN"):
+                settings["min_retries"] = int(os.getenv("LLM_RETRY_BUDGET_MIN"))
+            _retry_budget = RetryBudget(**settings)
+        return _retry_budget
+
+def resilience_summary() -> Dict[str, Any]:
+    """Retry budget use and circuit breaker states of the run, for end-of-run reports."""
+    with _circuit_breakers_lock:
+        breakers = dict(_circuit_breakers)
+    return {
+        "retry_budget": get_retry_budget().stats(),
+        "circuit_breakers": {breaker.name: breaker.stats() for breaker in breakers.values()},
+    }
+
 class LLMProvider(ABC):
     """Base class for LLM providers."""
-    
-    # Subclasses must initialize self.client and optionally self.model_name
-    
+
+    # Subclasses must initialize self.client and optionally self.model_name.
+    # Providers with a native async SDK also set self.async_client; otherwise
+    # agenerate() falls back to running the sync client in a worker thread.
+    async_client = None
+    # Optional providers.cache.ResponseCache attached by llm_factory
+    response_cache = None
+
+    @property
+    def rate_limiter(self) -> RateLimiter:
+        return get_rate_limiter(self.name(), getattr(self, "model_name", None))
+
+    @property
+    def circuit_breaker(self) -> CircuitBreaker:
+        return get_circuit_breaker(self.name(), getattr(self, "model_name", None))
+
     def _get_generation_kwargs(self) -> dict:
         """Override to provide provider-specific parameters like temperature."""
         return {}
 
-    def generate(self, prompt: str, system_prompt: Optional[str] = None, response_model: Optional[Type[BaseModel]] = None) -> Any:
-        """Generate a response from the LLM, optionally returning a validated structured model."""
-        
-        # Prepare messages once to avoid duplication during retries
+    def _get_sampling_kwargs(self, sample: int) -> dict:
+        """Generation parameters for independent sample number `sample` (0 = the deterministic default)."""
+        kwargs = self._get_generation_kwargs()
+        if sample:
+            kwargs["temperature"] = SAMPLE_TEMPERATURE
+            kwargs["seed"] = kwargs.get("seed", 0) + sample
+        return kwargs
+
+    def count_tokens(self, text: str) -> int:
+        """Approximate number of prompt tokens `text` costs with this provider and model."""
+        return math.ceil(len(text) / chars_per_token(self.name(), getattr(self, "model_name", None)))
+
+    def register_prompt_prefix(self, system_prompt: Optional[str], prefix: str) -> None:
+        """Declare a static prompt prefix that many requests will start with.
+
+        Providers that support prefix/context caching override this; the default
+        relies on the prefix simply being byte-identical across requests.
+        """
+        pass
+
+    def _apply_prompt_cache(self, prompt: str, system_prompt: Optional[str], kwargs: dict) -> Tuple[str, Optional[str], dict]:
+        """Override to swap a registered prefix for a provider-side cache reference."""
+        return prompt, system_prompt, kwargs
+
+    async def _aapply_prompt_cache(self, prompt: str, system_prompt: Optional[str], kwargs: dict) -> Tuple[str, Optional[str], dict]:
+        """Async counterpart of _apply_prompt_cache(); override when setting up the cache needs a request."""
+        return self._apply_prompt_cache(prompt, system_prompt, kwargs)
+
+    def _build_messages(self, prompt: str, system_prompt: Optional[str]) -> Tuple[List[Dict[str, str]], str]:
+        """Build the chat messages once so they are not duplicated during retries."""
         messages = []
         is_gemma = hasattr(self, "model_name") and "gemma" in self.model_name.lower()
 
@@ -36,25 +531,119 @@ class LLMProvider(ABC):
                 current_prompt = f"{system_prompt}\n\n{prompt}"
             else:
                 messages.append({"role": "system", "content": system_prompt})
-        
+
         messages.append({"role": "user", "content": current_prompt})
-        kwargs = self._get_generation_kwargs()
+        return messages, current_prompt
+
+    def _before_retry_log(self, retry_state):
+        stats = telemetry.current_call()
+        if stats is not None:
+            stats.backoff_time += retry_state.next_action.sleep
+        logger.warning(
+            f"Retry attempt {retry_state.attempt_number} for {self.name()}... "
+            f"Waiting {retry_state.next_action.sleep:.2f}s before next try. "
+            f"Triggered by: {retry_state.outcome.exception()}"
+        )
 
-        def before_retry_log(retry_state):
-            logger.warning(
-                f"Retry attempt {retry_state.attempt_number} for {self.name()}... "
-                f"Waiting {retry_state.next_action.sleep:.2f}s before next try. "
-                f"Triggered by: {retry_state.outcome.exception()}"
-            )
+    def _retrying(self, breaker: CircuitBreaker, stats: telemetry.CallStats):
+        """Retry rate limits and transient errors per RETRY_POLICY while the breaker and the run's retry budget allow."""
+        def _stop(retry_state) -> bool:
+            max_attempts, _ = RETRY_POLICY[classify_error(retry_state.outcome.exception())]
+            if retry_state.attempt_number >= max_attempts:
+                return True
+            if not breaker.allows_retry():
+                stats.retry_denied = "circuit_breaker"
+                return True
+            if not get_retry_budget().try_spend():
+                stats.retry_denied = "retry_budget"
+                return True
+            return False
 
-        # Inner function to be wrapped by tenacity
-        @retry(
-            stop=stop_after_attempt(5),
-            wait=wait_exponential(multiplier=1, min=4, max=60),
-            before_sleep=before_retry_log,
+        def _wait(retry_state) -> float:
+            _, wait = RETRY_POLICY[classify_error(retry_state.outcome.exception())]
+            return wait(retry_state)
+
+        return retry(
+            retry=retry_if_exception(lambda e: classify_error(e) in RETRY_POLICY),
+            stop=_stop,
+            wait=_wait,
+            before_sleep=self._before_retry_log,
             reraise=True
         )
+
+    def _cache_key(self, prompt: str, system_prompt: Optional[str], response_model: Optional[Type[BaseModel]], kwargs: dict) -> Optional[str]:
+        if self.response_cache is None:
+            return None
+        return self.response_cache.make_key(
+            self.name(), getattr(self, "model_name", None), system_prompt, prompt, response_model, kwargs
+        )
+
+    def _handle_failure(self, e: Exception, response_model: Optional[Type[BaseModel]]) -> Any:
+        error_msg = str(e)
+        # Log failure after all retries
+        logger.error(f"Final generation failure for {self.name()}: {error_msg}")
+
+        if response_model:
+            raise e
+        return f"Error connecting to {self.name()} after retries: {error_msg}"
+
+    def _acquire_limiter(self, limiter: RateLimiter, token_estimate: int, stats: Optional[telemetry.CallStats]) -> None:
+        start = time.perf_counter()
+        limiter.acquire(token_estimate)
+        if stats is not None:
+            stats.attempts += 1
+            stats.rate_limit_wait += time.perf_counter() - start
+
+    async def _aacquire_limiter(self, limiter: RateLimiter, token_estimate: int, stats: Optional[telemetry.CallStats]) -> None:
+        start = time.perf_counter()
+        await limiter.aacquire(token_estimate)
+        if stats is not None:
+            stats.attempts += 1
+            stats.rate_limit_wait += time.perf_counter() - start
+
+    def generate(self, prompt: str, system_prompt: Optional[str] = None, response_model: Optional[Type[BaseModel]] = None, sample: int = 0) -> Any:
+        """Generate a response from the LLM, optionally returning a validated structured model.
+
+        `sample` > 0 draws an independent answer (higher temperature, other seed)
+        that is cached separately from the deterministic default.
+        """
+        stats, token = telemetry.start_call(self.name(), getattr(self, "model_name", None))
+        try:
+            return self._generate(prompt, system_prompt, response_model, stats, sample)
+        finally:
+            telemetry.end_call(stats, token)
+
+    def _generate(self, prompt: str, system_prompt: Optional[str], response_model: Optional[Type[BaseModel]], stats: telemetry.CallStats, sample: int = 0) -> Any:
+        kwargs = self._get_sampling_kwargs(sample)
+
+        cache_key = self._cache_key(prompt, system_prompt, response_model, kwargs)
+        if cache_key:
+            cached = self.response_cache.get(cache_key, response_model)
+            if cached is not None:
+                stats.cache_hit = True
+                return cached
+
+        telemetry.attach_instructor_hooks(self.client)
+
+        prompt, system_prompt, kwargs = self._apply_prompt_cache(prompt, system_prompt, kwargs)
+        messages, current_prompt = self._build_messages(prompt, system_prompt)
+        limiter = self.rate_limiter
+        breaker = self.circuit_breaker
+        token_estimate = estimate_tokens(messages, chars_per_token(self.name(), getattr(self, "model_name", None)))
+
+        # Inner function to be wrapped by tenacity
+        @self._retrying(breaker, stats)
         def _execute_generation():
+            self._acquire_limiter(limiter, token_estimate, stats)
+            try:
+                result = _call_provider()
+            except Exception as e:
+                limiter.release(e)
+                raise
+            limiter.release()
+            return result
+
+        def _call_provider():
             if response_model:
                 return self.client.chat.completions.create(
                     messages=messages,
@@ -65,9 +654,9 @@ class LLMProvider(ABC):
             else:
                 if "model" not in kwargs and hasattr(self, "model_name"):
                     kwargs["model"] = self.model_name
-                
+
                 client_to_use = getattr(self.client, "client", self.client)
-                
+
                 if self.name() == "gemini":
                     # Specific handling for GenAi Client text generation
                     response = client_to_use.models.generate_content(
@@ -75,25 +664,126 @@ class LLMProvider(ABC):
                         contents=current_prompt,
                         config=kwargs.get("config")
                     )
+                    stats.add_usage(response)
                     return response.text
-                
+
                 response = client_to_use.chat.completions.create(
                     messages=messages,
                     max_retries=3,
                     **kwargs
                 )
+                stats.add_usage(response)
                 return response.choices[0].message.content
 
         try:
-            return _execute_generation()
+            breaker.before_call()
+        except CircuitOpenError as e:
+            stats.error, stats.error_class = str(e), CIRCUIT_OPEN
+            return self._handle_failure(e, response_model)
+        get_retry_budget().record_call()
+        try:
+            result = _execute_generation()
         except Exception as e:
-            error_msg = str(e)
-            # Log failure after all retries
-            logger.error(f"Final generation failure for {self.name()}: {error_msg}")
-            
+            stats.error, stats.error_class = str(e), classify_error(e)
+            breaker.record(stats.error_class)
+            return self._handle_failure(e, response_model)
+        breaker.record(None)
+
+        if cache_key:
+            self.response_cache.put(cache_key, result)
+        return result
+
+    async def agenerate(self, prompt: str, system_prompt: Optional[str] = None, response_model: Optional[Type[BaseModel]] = None, sample: int = 0) -> Any:
+        """Async counterpart of generate(), used to keep several requests in flight."""
+
+        if self.async_client is None:
+            return await asyncio.to_thread(self.generate, prompt, system_prompt, response_model, sample)
+
+        stats, token = telemetry.start_call(self.name(), getattr(self, "model_name", None))
+        try:
+            return await self._agenerate(prompt, system_prompt, response_model, stats, sample)
+        finally:
+            telemetry.end_call(stats, token)
+
+    async def _agenerate(self, prompt: str, system_prompt: Optional[str], response_model: Optional[Type[BaseModel]], stats: telemetry.CallStats, sample: int = 0) -> Any:
+        kwargs = self._get_sampling_kwargs(sample)
+
+        cache_key = self._cache_key(prompt, system_prompt, response_model, kwargs)
+        if cache_key:
+            cached = self.response_cache.get(cache_key, response_model)
+            if cached is not None:
+                stats.cache_hit = True
+                return cached
+
+        telemetry.attach_instructor_hooks(self.async_client)
+
+        prompt, system_prompt, kwargs = await self._aapply_prompt_cache(prompt, system_prompt, kwargs)
+        messages, current_prompt = self._build_messages(prompt, system_prompt)
+        limiter = self.rate_limiter
+        breaker = self.circuit_breaker
+        token_estimate = estimate_tokens(messages, chars_per_token(self.name(), getattr(self, "model_name", None)))
+
+        # tenacity awaits coroutines and sleeps with asyncio.sleep between attempts
+        @self._retrying(breaker, stats)
+        async def _execute_generation():
+            await self._aacquire_limiter(limiter, token_estimate, stats)
+            try:
+                result = await _call_provider()
+            except Exception as e:
+                limiter.release(e)
+                raise
+            limiter.release()
+            return result
+
+        async def _call_provider():
             if response_model:
-                raise e
-            return f"Error connecting to {self.name()} after retries: {error_msg}"
+                return await self.async_client.chat.completions.create(
+                    messages=messages,
+                    response_model=response_model,
+                    max_retries=3,
+                    **kwargs
+                )
+            else:
+                if "model" not in kwargs and hasattr(self, "model_name"):
+                    kwargs["model"] = self.model_name
+
+                client_to_use = getattr(self.async_client, "client", self.async_client)
+
+                if self.name() == "gemini":
+                    # The GenAI client exposes its async surface under .aio
+                    response = await client_to_use.aio.models.generate_content(
+                        model=kwargs["model"],
+                        contents=current_prompt,
+                        config=kwargs.get("config")
+                    )
+                    stats.add_usage(response)
+                    return response.text
+
+                response = await client_to_use.chat.completions.create(
+                    messages=messages,
+                    max_retries=3,
+                    **kwargs
+                )
+                stats.add_usage(response)
+                return response.choices[0].message.content
+
+        try:
+            breaker.before_call()
+        except CircuitOpenError as e:
+            stats.error, stats.error_class = str(e), CIRCUIT_OPEN
+            return self._handle_failure(e, response_model)
+        get_retry_budget().record_call()
+        try:
+            result = await _execute_generation()
+        except Exception as e:
+            stats.error, stats.error_class = str(e), classify_error(e)
+            breaker.record(stats.error_class)
+            return self._handle_failure(e, response_model)
+        breaker.record(None)
+
+        if cache_key:
+            self.response_cache.put(cache_key, result)
+        return result
 
     @abstractmethod
     def name(self) -> str:
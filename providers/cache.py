@@ -0,0 +1,128 @@
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+import logging
+from pathlib import Path
+from typing import Optional, Any, Type
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = ".cache/llm"
+DEFAULT_MAX_SIZE_MB = 512
+
+class ResponseCache:
+    """Persistent content-addressed cache for LLMProvider.generate responses.
+
+    Keys are SHA-256 digests of everything that determines a deterministic
+    response; entries are evicted least-recently-used once the stored payloads
+    exceed max_size_mb.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_size_mb: int = DEFAULT_MAX_SIZE_MB):
+        self.path = Path(cache_dir) / "responses.sqlite"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_size_bytes = max_size_mb * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON responses(last_access)")
+        self._conn.commit()
+        self._total_size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def make_key(
+        provider: str,
+        model: Optional[str],
+        system_prompt: Optional[str],
+        prompt: str,
+        response_model: Optional[Type[BaseModel]],
+        generation_kwargs: dict,
+    ) -> str:
+        payload = {
+            "provider": provider,
+            "model": model,
+            "system_prompt": system_prompt,
+            "prompt": prompt,
+            "schema": response_model.model_json_schema() if response_model else None,
+            "kwargs": generation_kwargs,
+        }
+        canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key: str, response_model: Optional[Type[BaseModel]] = None) -> Optional[Any]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+
+        try:
+            value = json.loads(row[0])
+            if response_model:
+                result = response_model.model_validate(value)
+            else:
+                result = value
+        except Exception as e:
+            # A schema change can make old entries unreadable; treat them as misses
+            logger.warning(f"Ignoring unreadable cache entry {key[:12]}: {e}")
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return result
+
+    def put(self, key: str, value: Any) -> None:
+        if isinstance(value, BaseModel):
+            value = value.model_dump(mode="json")
+        serialized = json.dumps(value, ensure_ascii=False)
+        size = len(serialized.encode("utf-8"))
+
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, serialized, size, time.time())
+            )
+            self._total_size += size - (old[0] if old else 0)
+            if self._total_size > self.max_size_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """Drop least-recently-used entries until the cache is back under 90% of its budget."""
+        target = int(self.max_size_bytes * 0.9)
+        rows = self._conn.execute("SELECT key, size FROM responses ORDER BY last_access ASC")
+        evicted = []
+        for key, size in rows:
+            if self._total_size <= target:
+                break
+            evicted.append((key,))
+            self._total_size -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "size_bytes": self._total_size,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,37 @@
+import os
+import instructor
+from openai import OpenAI, AsyncOpenAI
+from providers.base import LLMProvider
+from providers.fake_server import get_local_server
+from dotenv import load_dotenv
+
+load_dotenv()
+# Point at a standalone `python -m providers.fake_server`; unset starts one in-process
+FAKE_LLM_HOST = os.getenv("FAKE_LLM_HOST")
+
+class FakeProvider(LLMProvider):
+    """Offline provider backed by the local fake LLM server, for load and resume testing."""
+
+    def __init__(self, model_name: str = "fake-support-model", host: str = FAKE_LLM_HOST):
+        self.model_name = model_name
+        self.host = host or get_local_server().base_url
+
+        # SDK-level retries are disabled so injected 429/500s reach our own retry and rate limiting
+        self.client = instructor.from_openai(
+            OpenAI(base_url=f"{self.host}/v1", api_key="fake", max_retries=0),
+            mode=instructor.Mode.JSON_SCHEMA,
+        )
+        self.async_client = instructor.from_openai(
+            AsyncOpenAI(base_url=f"{self.host}/v1", api_key="fake", max_retries=0),
+            mode=instructor.Mode.JSON_SCHEMA,
+        )
+
+    def _get_generation_kwargs(self) -> dict:
+        return {
+            "model": self.model_name,
+            "temperature": 0,
+            "seed": 42,
+        }
+
+    def name(self) -> str:
+        return "fake"
@@ -0,0 +1,416 @@
+"""Local stand-in for an LLM API, used for offline load testing.
+
+Speaks enough of the OpenAI (/v1/chat/completions) and Ollama (/api/chat)
+chat protocols for the instructor clients used by the providers, and answers
+structured requests with schema-valid JSON. Latency, server errors and 429
+throttling are injected according to the configuration.
+
+Run standalone:  python -m providers.fake_server --port 8089 --latency lognormal:-1.5,0.5
+"""
+import os
+import re
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+FILLER_TEXT = "This is a synthetic response produced by the fake LLM server."
+# Vocabulary of synthetic chat turns; random word order keeps generated chats
+# from looking like near-duplicates of each other
+FILLER_WORDS = (
+    "account payment refund card order invoice password login error app plan tariff charge "
+    "please check again today still help issue update email reset support team wait"
+).split()
+
+def filler_turn(rng: random.Random) -> str:
+    return " ".join(rng.choice(FILLER_WORDS) for _ in range(rng.randint(12, 30))).capitalize() + "."
+
+def parse_latency(spec: str):
+    """Parse a latency distribution ("fixed:0.2", "uniform:0.1,0.5",
+    "lognormal:mu,sigma" or "exponential:mean", in seconds) into a sampler."""
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v.strip()]
+    if kind == "fixed":
+        return lambda rng: values[0] if values else 0.0
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(values[0], values[1])
+    if kind == "exponential":
+        return lambda rng: rng.expovariate(1.0 / values[0])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+class FakeServerConfig:
+    def __init__(
+        self,
+        latency: str = "fixed:0",
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        retry_after: float = 1.0,
+        replay_path: Optional[str] = None,
+        seed: Optional[int] = None,
+    ):
+        self.latency = latency
+        self.sample_latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.replay_path = replay_path
+        self.seed = seed
+
+    @classmethod
+    def from_env(cls) -> "FakeServerConfig":
+        seed = os.getenv("FAKE_LLM_SEED")
+        return cls(
+            latency=os.getenv("FAKE_LLM_LATENCY", "fixed:0"),
+            error_rate=float(os.getenv("FAKE_LLM_ERROR_RATE", "0")),
+            rate_limit_rate=float(os.getenv("FAKE_LLM_RATE_LIMIT_RATE", "0")),
+            retry_after=float(os.getenv("FAKE_LLM_RETRY_AFTER", "1")),
+            replay_path=os.getenv("FAKE_LLM_REPLAY") or None,
+            seed=int(seed) if seed else None,
+        )
+
+def find_schema(body: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Locate the JSON schema a request expects, whichever instructor mode sent it."""
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        return response_format["json_schema"]["schema"]
+    if isinstance(body.get("format"), dict):
+        # Ollama structured outputs
+        return body["format"]
+    tools = body.get("tools")
+    if tools:
+        return tools[0]["function"]["parameters"]
+
+    # JSON modes embed the schema in the system message
+    decoder = json.JSONDecoder()
+    for message in body.get("messages", []):
+        content = message.get("content")
+        if message.get("role") != "system" or not isinstance(content, str):
+            continue
+        marker = content.find("json_schema:")
+        start = content.find("{", marker) if marker != -1 else -1
+        if start != -1:
+            try:
+                return decoder.raw_decode(content, start)[0]
+            except json.JSONDecodeError:
+                pass
+    return None
+
+class SchemaSampler:
+    """Builds a random instance of a JSON schema."""
+
+    def __init__(self, schema: Dict[str, Any], rng: random.Random):
+        self.defs = schema.get("$defs", {})
+        self.rng = rng
+
+    def _resolve(self, schema: Dict[str, Any]) -> Dict[str, Any]:
+        while "$ref" in schema:
+            schema = self.defs[schema["$ref"].split("/")[-1]]
+        return schema
+
+    def sample(self, schema: Dict[str, Any]) -> Any:
+        schema = self._resolve(schema)
+        if "const" in schema:
+            return schema["const"]
+        if "enum" in schema:
+            return self.rng.choice(schema["enum"])
+        for key in ("anyOf", "oneOf"):
+            if key in schema:
+                options = [s for s in schema[key] if self._resolve(s).get("type") != "null"]
+                return self.sample(options[0] if options else schema[key][0])
+        if "allOf" in schema:
+            return self.sample(schema["allOf"][0])
+
+        kind = schema.get("type", "string")
+        if kind == "object":
+            properties = schema.get("properties", {})
+            return {name: self.sample(spec) for name, spec in properties.items()}
+        if kind == "array":
+            low = schema.get("minItems", 1)
+            high = max(low, schema.get("maxItems", low + 2))
+            return [self.sample(schema.get("items", {})) for _ in range(self.rng.randint(low, high))]
+        if kind == "integer":
+            return self.rng.randint(schema.get("minimum", 0), schema.get("maximum", 100))
+        if kind == "number":
+            return self.rng.uniform(schema.get("minimum", 0.0), schema.get("maximum", 1.0))
+        if kind == "boolean":
+            return self.rng.random() < 0.5
+        if kind == "null":
+            return None
+        return FILLER_TEXT
+
+class ReplayStore:
+    """Answers from recorded analysis results (e.g. data/examples/groq_analysis_130.json)."""
+
+    def __init__(self, path: str):
+        with open(path, "r", encoding="utf-8") as f:
+            records = json.load(f)
+        self.evaluations = []
+        self.chats = []
+        for record in records:
+            chat = record.get("original_chat") or {}
+            result = (record.get("analysis") or {}).get("result")
+            if chat.get("messages"):
+                self.chats.append(chat)
+                if result:
+                    contents = [m["content"] for m in chat["messages"]]
+                    self.evaluations.append((contents, result))
+
+    def evaluation_for(self, dialogue: str, rng: random.Random) -> Optional[Dict[str, Any]]:
+        if not self.evaluations:
+            return None
+        for contents, result in self.evaluations:
+            # Several recorded chats share an opening message, so match every turn
+            if contents[0] in dialogue and all(c in dialogue for c in contents):
+                return dict(result)
+        return dict(rng.choice(self.evaluations)[1])
+
+    def chat_for(self, prompt: str, rng: random.Random) -> Optional[Dict[str, Any]]:
+        candidates = [
+            c for c in self.chats
+            if f"'{c.get('scenario')}'" in prompt and f"'{c.get('type')}'" in prompt
+        ]
+        if not candidates:
+            return None
+        return dict(rng.choice(candidates))
+
+DIALOGUE_TAG = re.compile(r'<dialogue id="([^"]*)">(.*?)</dialogue>', re.S)
+SCENARIO = re.compile(r"chat about '([^']+)'")
+CASE_TYPE = re.compile(r"Case Type: '([^']+)'")
+
+def build_payload(schema: Dict[str, Any], prompt: str, rng: random.Random, replay: Optional[ReplayStore]) -> Any:
+    """Answer a structured request, replaying recorded results where the schema matches."""
+    payload = SchemaSampler(schema, rng).sample(schema)
+    if not isinstance(payload, dict):
+        return payload
+
+    properties = schema.get("properties", {})
+    if "messages" in properties and "scenario" in properties:
+        # Make synthetic chats look like generate.py asked: requested case type, alternating turns
+        scenario = SCENARIO.search(prompt)
+        if scenario and scenario.group(1) in properties["scenario"].get("enum", []):
+            payload["scenario"] = scenario.group(1)
+        case_type = CASE_TYPE.search(prompt)
+        if case_type:
+            payload["type"] = case_type.group(1)
+        roles = ("user", "assistant")
+        payload["messages"] = [
+            {"role": roles[i % 2], "content": filler_turn(rng)} for i in range(2 * rng.randint(2, 4))
+        ]
+
+    if replay is None:
+        return payload
+    if "evaluations" in properties:
+        # Batched judging: one recorded evaluation per tagged dialogue, ids copied back
+        evaluations = []
+        for chat_id, dialogue in DIALOGUE_TAG.findall(prompt):
+            result = replay.evaluation_for(dialogue, rng) or {}
+            result.pop("hidden_unsatisfaction", None)
+            evaluations.append({"chat_id": chat_id, **result})
+        payload["evaluations"] = evaluations
+    elif "thought_process" in properties:
+        result = replay.evaluation_for(prompt, rng)
+        if result:
+            result.pop("hidden_unsatisfaction", None)
+            payload = result
+    elif "messages" in properties and "scenario" in properties:
+        chat = replay.chat_for(prompt, rng)
+        if chat:
+            payload = chat
+    return payload
+
+class FakeLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config: FakeServerConfig):
+        super().__init__(address, FakeLLMHandler)
+        self.config = config
+        self.replay = ReplayStore(config.replay_path) if config.replay_path else None
+        self.fault_rng = random.Random(config.seed)
+        self.fault_lock = threading.Lock()
+        self.stats = {"requests": 0, "errors": 0, "rate_limited": 0}
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def draw_fault(self):
+        """Return (latency, injected status code or None) for one request."""
+        with self.fault_lock:
+            self.stats["requests"] += 1
+            latency = max(0.0, self.config.sample_latency(self.fault_rng))
+            roll = self.fault_rng.random()
+            if roll < self.config.rate_limit_rate:
+                self.stats["rate_limited"] += 1
+                return latency, 429
+            if roll < self.config.rate_limit_rate + self.config.error_rate:
+                self.stats["errors"] += 1
+                return latency, 500
+            return latency, None
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    server: FakeLLMServer
+
+    def log_message(self, format, *args):
+        # Keep load tests quiet
+        pass
+
+    def _send_json(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path in ("/health", "/"):
+            self._send_json(200, {"status": "ok", **self.server.stats})
+        elif self.path == "/v1/models":
+            self._send_json(200, {"object": "list", "data": []})
+        elif self.path == "/api/tags":
+            self._send_json(200, {"models": []})
+        else:
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path not in ("/v1/chat/completions", "/api/chat"):
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": "Request body is not valid JSON"})
+            return
+
+        latency, fault = self.server.draw_fault()
+        if latency:
+            time.sleep(latency)
+        if fault == 429:
+            self._send_json(
+                429,
+                {"error": {"message": "Rate limit reached (injected by fake server)", "type": "rate_limit_error", "code": "rate_limit_exceeded"}},
+                headers={"Retry-After": f"{self.server.config.retry_after:g}"},
+            )
+            return
+        if fault == 500:
+            self._send_json(500, {"error": {"message": "Internal server error (injected by fake server)", "type": "server_error"}})
+            return
+
+        content, tool_name = self._answer(body)
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in body.get("messages", [])) // 4
+        completion_tokens = len(content) // 4
+        if self.path == "/api/chat":
+            self._send_json(200, {
+                "model": body.get("model", "fake"),
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "message": {"role": "assistant", "content": content},
+                "done": True,
+                "done_reason": "stop",
+                "prompt_eval_count": prompt_tokens,
+                "eval_count": completion_tokens,
+            })
+            return
+
+        message = {"role": "assistant", "content": content}
+        if tool_name:
+            message = {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [{"id": "call_fake", "type": "function", "function": {"name": tool_name, "arguments": content}}],
+            }
+        self._send_json(200, {
+            "id": f"chatcmpl-fake-{self.server.stats['requests']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if tool_name else "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+    def _answer(self, body: Dict[str, Any]):
+        """Return (content, tool name or None). Answers are deterministic per request."""
+        messages: List[Dict[str, Any]] = body.get("messages", [])
+        prompt = "\n".join(str(m.get("content", "")) for m in messages if m.get("role") != "system")
+        digest = hashlib.sha256(json.dumps(messages, sort_keys=True).encode("utf-8")).hexdigest()
+        rng = random.Random(digest)
+
+        schema = find_schema(body)
+        if schema is None:
+            if body.get("format") == "json" or (body.get("response_format") or {}).get("type") == "json_object":
+                return json.dumps({"response": FILLER_TEXT}), None
+            return FILLER_TEXT, None
+
+        payload = build_payload(schema, prompt, rng, self.server.replay)
+        tools = body.get("tools")
+        tool_name = tools[0]["function"]["name"] if tools else None
+        return json.dumps(payload, ensure_ascii=False), tool_name
+
+def start_fake_server(host: str = "127.0.0.1", port: int = 0, config: Optional[FakeServerConfig] = None) -> FakeLLMServer:
+    """Start a fake server on a background thread; port 0 picks a free port."""
+    server = FakeLLMServer((host, port), config or FakeServerConfig.from_env())
+    threading.Thread(target=server.serve_forever, name="fake-llm-server", daemon=True).start()
+    return server
+
+_local_server: Optional[FakeLLMServer] = None
+_local_server_lock = threading.Lock()
+
+def get_local_server() -> FakeLLMServer:
+    """Return the in-process server shared by every FakeProvider without FAKE_LLM_HOST."""
+    global _local_server
+    with _local_server_lock:
+        if _local_server is None:
+            _local_server = start_fake_server()
+        return _local_server
+
+def main():
+    env = FakeServerConfig.from_env()
+    parser = argparse.ArgumentParser(description="Run a local fake LLM server (OpenAI and Ollama chat protocols)")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Interface to bind")
+    parser.add_argument("--port", type=int, default=8089, help="Port to listen on")
+    parser.add_argument("--latency", type=str, default=env.latency, help="Latency distribution, e.g. fixed:0.2, uniform:0.1,0.5, lognormal:-1.5,0.5, exponential:0.3")
+    parser.add_argument("--error-rate", type=float, default=env.error_rate, help="Fraction of requests answered with HTTP 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=env.rate_limit_rate, help="Fraction of requests answered with HTTP 429")
+    parser.add_argument("--retry-after", type=float, default=env.retry_after, help="Retry-After seconds sent with 429 responses")
+    parser.add_argument("--replay", type=str, default=env.replay_path, help="Analysis results to replay, e.g. data/examples/groq_analysis_130.json")
+    parser.add_argument("--seed", type=int, default=env.seed, help="Seed for latency and fault injection")
+    args = parser.parse_args()
+
+    config = FakeServerConfig(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        replay_path=args.replay,
+        seed=args.seed,
+    )
+    server = FakeLLMServer((args.host, args.port), config)
+    print(f"Fake LLM server listening on {server.base_url} (latency={config.latency}, "
+          f"error_rate={config.error_rate}, rate_limit_rate={config.rate_limit_rate})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Served {server.stats['requests']} requests ({server.stats['rate_limited']} throttled, {server.stats['errors']} errors)")
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,46 @@
 import os
+import time
+import asyncio
+import logging
+import threading
 from google import genai
+from google.genai import types
 import instructor
-from providers.base import LLMProvider
+from providers.base import LLMProvider, SAMPLE_TEMPERATURE
 from dotenv import load_dotenv
 
 load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Lifetime of explicit context caches; they are recreated shortly before expiry
+CONTEXT_CACHE_TTL_SECONDS = 3600
 
 class GeminiProvider(LLMProvider):
     def __init__(self, model_name: str = "gemma-3-27b-it"):
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
             raise ValueError("GEMINI_API_KEY not found in environment variables")
-        
+
         self.model_name = model_name
+        # One attempt per request: retries belong to our own retry policy, circuit breaker and retry budget
+        self.genai_client = genai.Client(
+            api_key=api_key,
+            http_options=types.HttpOptions(retry_options=types.HttpRetryOptions(attempts=1)),
+        )
         self.client = instructor.from_genai(
-            genai.Client(api_key=api_key),
+            self.genai_client,
+            mode=instructor.Mode.GENAI_STRUCTURED_OUTPUTS,
+        )
+        self.async_client = instructor.from_genai(
+            self.genai_client,
             mode=instructor.Mode.GENAI_STRUCTURED_OUTPUTS,
+            use_async=True,
         )
+        # (system_prompt, prefix) -> (cache name, expiry) once created, False if caching is unavailable
+        self._context_caches = {}
+        self._context_cache_lock = threading.Lock()
+        # asyncio locks belong to one event loop: (loop, lock) for the current one
+        self._async_context_cache_lock = (None, None)
 
     def _get_generation_kwargs(self) -> dict:
         return {
@@ -24,6 +48,100 @@ class GeminiProvider(LLMProvider):
             "config": {"temperature": 0}
         }
 
+    def _get_sampling_kwargs(self, sample: int) -> dict:
+        kwargs = self._get_generation_kwargs()
+        if sample:
+            kwargs["config"] = {"temperature": SAMPLE_TEMPERATURE, "seed": sample}
+        return kwargs
+
+    def register_prompt_prefix(self, system_prompt, prefix):
+        # Gemma models take the system prompt inline and do not support context caching
+        if "gemma" in self.model_name.lower():
+            return
+        self._context_caches.setdefault((system_prompt, prefix), None)
+
+    def _live_context_cache(self, key):
+        """Name of a live cache for this prefix, False if caching is unavailable, None if it must be (re)created."""
+        entry = self._context_caches.get(key)
+        if entry is False:
+            return False
+        if entry and entry[1] > time.monotonic():
+            return entry[0]
+        return None
+
+    def _context_cache_config(self, system_prompt, prefix):
+        return types.CreateCachedContentConfig(
+            system_instruction=system_prompt,
+            contents=[types.Content(role="user", parts=[types.Part(text=prefix)])],
+            ttl=f"{CONTEXT_CACHE_TTL_SECONDS}s",
+        )
+
+    def _store_context_cache(self, key, cache=None, error=None):
+        if error is not None:
+            # Typically the prefix is below the model's minimum cacheable size
+            logger.warning(f"Gemini context caching unavailable for {self.model_name}: {error}")
+            self._context_caches[key] = False
+            return None
+        expiry = time.monotonic() + CONTEXT_CACHE_TTL_SECONDS - 60
+        self._context_caches[key] = (cache.name, expiry)
+        return cache.name
+
+    def _get_context_cache(self, system_prompt, prefix):
+        """Return the name of a live context cache for this prefix, creating it if needed."""
+        key = (system_prompt, prefix)
+        with self._context_cache_lock:
+            name = self._live_context_cache(key)
+            if name is not None:
+                return name or None
+            try:
+                cache = self.genai_client.caches.create(
+                    model=self.model_name, config=self._context_cache_config(system_prompt, prefix)
+                )
+            except Exception as e:
+                return self._store_context_cache(key, error=e)
+            return self._store_context_cache(key, cache)
+
+    async def _aget_context_cache(self, system_prompt, prefix):
+        """Async counterpart of _get_context_cache(); waiting requests yield to the event loop."""
+        key = (system_prompt, prefix)
+        loop = asyncio.get_running_loop()
+        if self._async_context_cache_lock[0] is not loop:
+            self._async_context_cache_lock = (loop, asyncio.Lock())
+        async with self._async_context_cache_lock[1]:
+            name = self._live_context_cache(key)
+            if name is not None:
+                return name or None
+            try:
+                cache = await self.genai_client.aio.caches.create(
+                    model=self.model_name, config=self._context_cache_config(system_prompt, prefix)
+                )
+            except Exception as e:
+                return self._store_context_cache(key, error=e)
+            return self._store_context_cache(key, cache)
+
+    def _cached_prefix(self, prompt, system_prompt):
+        for cached_system_prompt, prefix in list(self._context_caches):
+            if cached_system_prompt == system_prompt and prompt.startswith(prefix):
+                return prefix
+        return None
+
+    def _use_context_cache(self, prompt, system_prompt, kwargs, prefix, cache_name):
+        if cache_name is None:
+            return prompt, system_prompt, kwargs
+        # The cache already holds the system instruction and the prefix;
+        # only the variable tail of the prompt is sent and billed at full rate.
+        config = dict(kwargs.get("config") or {}, cached_content=cache_name)
+        return prompt[len(prefix):], None, dict(kwargs, config=config)
+
+    def _apply_prompt_cache(self, prompt, system_prompt, kwargs):
+        prefix = self._cached_prefix(prompt, system_prompt)
+        cache_name = self._get_context_cache(system_prompt, prefix) if prefix is not None else None
+        return self._use_context_cache(prompt, system_prompt, kwargs, prefix, cache_name)
+
+    async def _aapply_prompt_cache(self, prompt, system_prompt, kwargs):
+        prefix = self._cached_prefix(prompt, system_prompt)
+        cache_name = await self._aget_context_cache(system_prompt, prefix) if prefix is not None else None
+        return self._use_context_cache(prompt, system_prompt, kwargs, prefix, cache_name)
+
     def name(self) -> str:
         return "gemini"
-
@@ -1,5 +1,5 @@
 import os
-from groq import Groq
+from groq import Groq, AsyncGroq
 import instructor
 from providers.base import LLMProvider
 from dotenv import load_dotenv
@@ -11,7 +11,9 @@ class GroqProvider(LLMProvider):
         api_key = os.getenv("GROQ_API_KEY")
         if not api_key:
             raise ValueError("GROQ_API_KEY not found in environment variables")
-        self.client = instructor.from_groq(Groq(api_key=api_key), mode=instructor.Mode.JSON)
+        # Retries are owned by LLMProvider (error classes, breaker, retry budget), not the SDK
+        self.client = instructor.from_groq(Groq(api_key=api_key, max_retries=0), mode=instructor.Mode.JSON)
+        self.async_client = instructor.from_groq(AsyncGroq(api_key=api_key, max_retries=0), mode=instructor.Mode.JSON)
         self.model_name = model_name
 
     def _get_generation_kwargs(self) -> dict:
@@ -1,23 +1,76 @@
 import os
+import logging
+import threading
 import instructor
+import requests
+from openai import OpenAI, AsyncOpenAI
 from providers.base import LLMProvider
 from dotenv import load_dotenv
 
 load_dotenv()
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL")
 OLLAMA_HOST = os.getenv("OLLAMA_HOST",  "http://localhost:11434")
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+logger = logging.getLogger(__name__)
 
 class OllamaProvider(LLMProvider):
     def __init__(self, model_name: str = OLLAMA_MODEL, host: str = OLLAMA_HOST):
         self.model_name = model_name
         self.host = host
         
-        # Simple setup using instructor's auto client for Ollama
-        self.client = instructor.from_provider(
-            f"ollama/{self.model_name}",
+        # Ollama's OpenAI-compatible endpoint; SDK-level retries are disabled so
+        # failures reach our own retry policy, circuit breaker and retry budget
+        self.client = instructor.from_openai(
+            OpenAI(base_url=f"{self.host}/v1", api_key="ollama", max_retries=0),
+            mode=instructor.Mode.JSON,
+            model=self.model_name,
+        )
+        self.async_client = instructor.from_openai(
+            AsyncOpenAI(base_url=f"{self.host}/v1", api_key="ollama", max_retries=0),
             mode=instructor.Mode.JSON,
-            base_url=f"{self.host}/v1"
+            model=self.model_name,
         )
+        self._warmed_prefixes = set()
+        self._warmup_lock = threading.Lock()
+
+    def register_prompt_prefix(self, system_prompt, prefix):
+        """Prefill the model's KV cache with a static prefix and keep the model resident.
+
+        Ollama reuses the KV cache for the longest common token prefix of
+        consecutive requests, but only while the model stays loaded; the warm-up
+        also moves the model load out of the first judge call. It runs in a
+        background thread, once per prefix, so creating judges never waits for
+        the model to load.
+        """
+        key = (system_prompt, prefix)
+        with self._warmup_lock:
+            if key in self._warmed_prefixes:
+                return
+            self._warmed_prefixes.add(key)
+        threading.Thread(target=self._warm_up, args=key, name="ollama-warmup", daemon=True).start()
+
+    def _warm_up(self, system_prompt, prefix):
+        messages = [{"role": "user", "content": prefix}]
+        if system_prompt:
+            messages.insert(0, {"role": "system", "content": system_prompt})
+        try:
+            requests.post(
+                f"{self.host}/api/chat",
+                json={
+                    "model": self.model_name,
+                    "messages": messages,
+                    "stream": False,
+                    "keep_alive": OLLAMA_KEEP_ALIVE,
+                    "options": {"num_predict": 1, **self._get_generation_kwargs()},
+                },
+                timeout=300,
+            ).raise_for_status()
+        except Exception as e:
+            logger.warning(f"Ollama prefix warm-up failed for {self.model_name}: {e}")
+            # Let the next judge that registers this prefix try again
+            with self._warmup_lock:
+                self._warmed_prefixes.discard((system_prompt, prefix))
 
     def _get_generation_kwargs(self) -> dict:
         return {
@@ -0,0 +1,292 @@
+"""In-process telemetry for LLM calls: latency, retries, re-asks, tokens and cost.
+
+LLMProvider.generate/agenerate open a CallStats for every call and make it the
+current one through a context variable, so tenacity callbacks and instructor
+hooks running deeper in the stack can add to it. Finished calls are folded into
+the process-wide MetricsRegistry, which renders a JSON summary or Prometheus
+text exposition.
+"""
+import bisect
+import json
+import random
+import statistics
+import threading
+import time
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+# USD per 1M (prompt, completion) tokens; models missing here are costed at 0
+MODEL_PRICING = {
+    "groq": {
+        "llama-3.3-70b-versatile": (0.59, 0.79),
+        "llama-3.1-8b-instant": (0.05, 0.08),
+        "meta-llama/llama-4-scout-17b-16e-instruct": (0.11, 0.34),
+    },
+    "gemini": {
+        "gemini-2.5-flash-lite": (0.10, 0.40),
+        "gemini-2.5-flash": (0.30, 2.50),
+        "gemma-3-27b-it": (0.0, 0.0),
+    },
+}
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Latency percentiles are computed from a uniform sample of at most this many
+# calls per model, so memory and report time stay flat on long runs
+LATENCY_SAMPLE_SIZE = 2048
+
+def estimate_cost(provider: str, model: Optional[str], prompt_tokens: int, completion_tokens: int) -> float:
+    price_in, price_out = MODEL_PRICING.get(provider, {}).get(model, (0.0, 0.0))
+    return (prompt_tokens * price_in + completion_tokens * price_out) / 1_000_000
+
+def _field(obj: Any, name: str) -> Any:
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+def usage_from_response(response: Any) -> Tuple[int, int]:
+    """Return (prompt, completion) tokens from an OpenAI/Groq, GenAI or Ollama response."""
+    usage = _field(response, "usage")
+    if usage is not None:
+        return _field(usage, "prompt_tokens") or 0, _field(usage, "completion_tokens") or 0
+    usage = _field(response, "usage_metadata")
+    if usage is not None:
+        return _field(usage, "prompt_token_count") or 0, _field(usage, "candidates_token_count") or 0
+    return _field(response, "prompt_eval_count") or 0, _field(response, "eval_count") or 0
+
+class CallStats:
+    """Measurements for one generate()/agenerate() call, retries included."""
+
+    def __init__(self, provider: str, model: Optional[str]):
+        self.provider = provider
+        self.model = model
+        self.started = time.perf_counter()
+        self.wall_time = 0.0
+        self.backoff_time = 0.0
+        self.rate_limit_wait = 0.0
+        self.attempts = 0
+        self.reasks = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cache_hit = False
+        self.error: Optional[str] = None
+        # providers.base error class of a failed call, and why a retry was refused, if it was
+        self.error_class: Optional[str] = None
+        self.retry_denied: Optional[str] = None
+
+    def add_usage(self, response: Any) -> None:
+        prompt_tokens, completion_tokens = usage_from_response(response)
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+
+    def finish(self) -> "CallStats":
+        self.wall_time = time.perf_counter() - self.started
+        return self
+
+_current_call: ContextVar[Optional[CallStats]] = ContextVar("llm_call_stats", default=None)
+
+def current_call() -> Optional[CallStats]:
+    return _current_call.get()
+
+def start_call(provider: str, model: Optional[str]):
+    """Make a fresh CallStats current; returns it with the token needed by end_call()."""
+    stats = CallStats(provider, model)
+    return stats, _current_call.set(stats)
+
+def end_call(stats: CallStats, token) -> None:
+    _current_call.reset(token)
+    registry.record(stats.finish())
+
+def attach_instructor_hooks(client: Any) -> None:
+    """Count tokens of every completion (re-asks included) and validation re-asks on an instructor client."""
+    if client is None or not hasattr(client, "on") or getattr(client, "_telemetry_hooked", False):
+        return
+
+    def on_response(response, *args, **kwargs):
+        stats = current_call()
+        if stats is not None:
+            stats.add_usage(response)
+
+    def on_parse_error(error, *args, **kwargs):
+        stats = current_call()
+        if stats is not None:
+            stats.reasks += 1
+
+    client.on("completion:response", on_response)
+    client.on("parse:error", on_parse_error)
+    client._telemetry_hooked = True
+
+class ModelMetrics:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.attempts = 0
+        self.retries = 0
+        self.reasks = 0
+        self.errors_by_class: Dict[str, int] = {}
+        self.retries_denied = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost_usd = 0.0
+        self.wall_time = 0.0
+        self.backoff_time = 0.0
+        self.rate_limit_wait = 0.0
+        # Reservoir sample of call latencies (Algorithm R), exact until it fills up
+        self.latencies = []
+        self._sampler = random.Random(0)
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+
+class MetricsRegistry:
+    """Thread-safe per provider/model aggregation of finished calls."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models: Dict[Tuple[str, Optional[str]], ModelMetrics] = {}
+        self.started = time.time()
+
+    def record(self, stats: CallStats) -> None:
+        with self._lock:
+            m = self._models.setdefault((stats.provider, stats.model), ModelMetrics())
+            m.calls += 1
+            if stats.cache_hit:
+                m.cache_hits += 1
+            if stats.error:
+                m.errors += 1
+                error_class = stats.error_class or "unknown"
+                m.errors_by_class[error_class] = m.errors_by_class.get(error_class, 0) + 1
+            if stats.retry_denied:
+                m.retries_denied += 1
+            m.attempts += stats.attempts
+            m.retries += max(0, stats.attempts - 1)
+            m.reasks += stats.reasks
+            m.prompt_tokens += stats.prompt_tokens
+            m.completion_tokens += stats.completion_tokens
+            m.cost_usd += estimate_cost(stats.provider, stats.model, stats.prompt_tokens, stats.completion_tokens)
+            m.wall_time += stats.wall_time
+            m.backoff_time += stats.backoff_time
+            m.rate_limit_wait += stats.rate_limit_wait
+            if len(m.latencies) < LATENCY_SAMPLE_SIZE:
+                m.latencies.append(stats.wall_time)
+            else:
+                slot = m._sampler.randrange(m.calls)
+                if slot < LATENCY_SAMPLE_SIZE:
+                    m.latencies[slot] = stats.wall_time
+            m.bucket_counts[bisect.bisect_left(LATENCY_BUCKETS, stats.wall_time)] += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._models.clear()
+            self.started = time.time()
+
+    def summary(self) -> Dict[str, Any]:
+        """JSON-serialisable totals per "provider/model"."""
+        models = {}
+        with self._lock:
+            for (provider, model), m in sorted(self._models.items(), key=lambda item: str(item[0])):
+                latency = None
+                if len(m.latencies) >= 2:
+                    cuts = statistics.quantiles(m.latencies, n=100, method="inclusive")
+                    latency = {"p50": round(cuts[49], 3), "p95": round(cuts[94], 3), "p99": round(cuts[98], 3)}
+                models[f"{provider}/{model}"] = {
+                    "calls": m.calls,
+                    "errors": m.errors,
+                    "errors_by_class": dict(sorted(m.errors_by_class.items())),
+                    "retries_denied": m.retries_denied,
+                    "cache_hits": m.cache_hits,
+                    "attempts": m.attempts,
+                    "retries": m.retries,
+                    "reasks": m.reasks,
+                    "prompt_tokens": m.prompt_tokens,
+                    "completion_tokens": m.completion_tokens,
+                    "estimated_cost_usd": round(m.cost_usd, 6),
+                    "wall_time_s": round(m.wall_time, 3),
+                    "backoff_time_s": round(m.backoff_time, 3),
+                    "rate_limit_wait_s": round(m.rate_limit_wait, 3),
+                    "latency_s": latency,
+                }
+        return {"elapsed_s": round(time.time() - self.started, 3), "models": models}
+
+    def to_prometheus(self) -> str:
+        """Render the registry in the Prometheus text exposition format."""
+        counters = [
+            ("llm_calls_total", "Finished generate() calls, cache hits included", lambda m: m.calls),
+            ("llm_call_errors_total", "Calls that failed after all retries", lambda m: m.errors),
+            ("llm_cache_hits_total", "Calls answered from the response cache", lambda m: m.cache_hits),
+            ("llm_attempts_total", "Provider attempts made by the retry loop", lambda m: m.attempts),
+            ("llm_retries_denied_total", "Retries refused by the circuit breaker or the run's retry budget", lambda m: m.retries_denied),
+            ("llm_reasks_total", "Instructor re-asks after validation failures", lambda m: m.reasks),
+            ("llm_prompt_tokens_total", "Prompt tokens reported by the provider", lambda m: m.prompt_tokens),
+            ("llm_completion_tokens_total", "Completion tokens reported by the provider", lambda m: m.completion_tokens),
+            ("llm_cost_usd_total", "Estimated spend from MODEL_PRICING", lambda m: m.cost_usd),
+            ("llm_backoff_seconds_total", "Time spent sleeping between retries", lambda m: m.backoff_time),
+            ("llm_rate_limit_wait_seconds_total", "Time spent waiting for the rate limiter", lambda m: m.rate_limit_wait),
+        ]
+        with self._lock:
+            items = sorted(self._models.items(), key=lambda item: str(item[0]))
+            lines = []
+            for name, help_text, value in counters:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} counter")
+                for (provider, model), m in items:
+                    lines.append(f"{name}{{{_labels(provider, model)}}} {value(m):g}")
+
+            name = "llm_call_errors_by_class_total"
+            lines.append(f"# HELP {name} Failed calls by error class (rate_limit, transient, auth, ...)")
+            lines.append(f"# TYPE {name} counter")
+            for (provider, model), m in items:
+                for error_class, count in sorted(m.errors_by_class.items()):
+                    lines.append(f'{name}{{{_labels(provider, model)},class="{error_class}"}} {count}')
+
+            name = "llm_call_duration_seconds"
+            lines.append(f"# HELP {name} Wall time of generate() calls, retries included")
+            lines.append(f"# TYPE {name} histogram")
+            for (provider, model), m in items:
+                labels = _labels(provider, model)
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), m.bucket_counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+                lines.append(f"{name}_sum{{{labels}}} {m.wall_time:g}")
+                lines.append(f"{name}_count{{{labels}}} {m.calls}")
+        return "\n".join(lines) + "\n"
+
+def _labels(provider: str, model: Optional[str]) -> str:
+    model = (model or "").replace("\\", "\\\\").replace('"', '\\"')
+    return f'provider="{provider}",model="{model}"'
+
+# Shared by every provider in the process
+registry = MetricsRegistry()
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            body, content_type = registry.to_prometheus(), "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body, content_type = json.dumps(registry.summary()), "application/json"
+        else:
+            self.send_error(404)
+            return
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+def start_metrics_server(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serve /metrics (Prometheus) and /metrics.json from a background thread."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="llm-metrics", daemon=True).start()
+    return server
+
+def write_metrics(path: str) -> None:
+    """Write the registry to `path`: Prometheus text for *.prom, JSON otherwise."""
+    text = registry.to_prometheus() if path.endswith(".prom") else json.dumps(registry.summary(), indent=2)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
@@ -0,0 +1,242 @@
+import os
+import json
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, Tuple
+
+CHUNK_SIZE = 1 << 16
+
+def journal_path(output_path: str) -> str:
+    """Return the append-only JSONL journal that backs a legacy JSON output file."""
+    if output_path.endswith(".jsonl"):
+        return output_path
+    root, _ = os.path.splitext(output_path)
+    return f"{root}.jsonl"
+
+@contextmanager
+def atomic_write(path: str, binary: bool = False):
+    """Open a uniquely named temp file next to `path`; on success it is fsync'd and renamed over `path`.
+
+    Unique names let several processes rewrite the same file without renaming
+    each other's half-written temp files. The file is UTF-8 text unless `binary`.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with (os.fdopen(fd, "wb") if binary else os.fdopen(fd, "w", encoding="utf-8")) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+def write_records(path: str, records: Iterable[Any]) -> int:
+    """Atomically write records as JSONL (*.jsonl) or as the legacy indented JSON array."""
+    count = 0
+    with atomic_write(path) as f:
+        if str(path).endswith(".jsonl"):
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                count += 1
+            return count
+        f.write("[")
+        for record in records:
+            f.write(",\n  " if count else "\n  ")
+            # Matches json.dump(records, f, indent=2) byte for byte
+            f.write("\n  ".join(json.dumps(record, ensure_ascii=False, indent=2).split("\n")))
+            count += 1
+        f.write("\n]" if count else "]")
+    return count
+
+def iter_jsonl(path: str) -> Iterator[Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # Only the last line can be torn by a killed writer; stop there
+                return
+
+def iter_json_array(path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[Any]:
+    """Yield the elements of a top-level JSON array without loading the whole file."""
+    for value, _, _ in _scan_json_array(path, chunk_size, spans=False):
+        yield value
+
+def iter_record_spans(path: str) -> Iterator[Tuple[Any, int, int]]:
+    """Yield (record, byte offset, byte length) from a JSONL journal or a JSON array file."""
+    if not str(path).endswith(".jsonl"):
+        yield from _scan_json_array(path, CHUNK_SIZE, spans=True)
+        return
+    offset = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    return
+                yield record, offset, len(line.rstrip(b"\r\n"))
+            offset += len(line)
+
+def _scan_json_array(path: str, chunk_size: int, spans: bool) -> Iterator[Tuple[Any, int, int]]:
+    decoder = json.JSONDecoder()
+    # newline="" keeps CRLF as two characters, so encoded lengths match the bytes on disk
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        buffer = f.read(chunk_size)
+        pos = 0
+        # Byte offset of buffer[pos] in the file; only whitespace, commas and
+        # brackets are skipped between elements, so those count one byte each
+        pos_bytes = 0
+        eof = False
+
+        def skip(chars: str) -> None:
+            nonlocal pos, pos_bytes
+            while pos < len(buffer) and buffer[pos] in chars:
+                pos += 1
+                pos_bytes += 1
+
+        skip(" \t\r\n")
+        if pos >= len(buffer):
+            return
+        if buffer[pos] != "[":
+            raise ValueError(f"{path} is not a JSON array")
+        pos += 1
+        pos_bytes += 1
+
+        while True:
+            skip(" \t\r\n,")
+            if pos < len(buffer) and buffer[pos] == "]":
+                return
+            try:
+                if pos >= len(buffer):
+                    raise json.JSONDecodeError("Need more data", buffer, pos)
+                value, end = decoder.raw_decode(buffer, pos)
+                if not eof and (end == len(buffer) or buffer[end] not in " \t\r\n,]"):
+                    # A scalar cut at the chunk boundary ("2." of "2.5") may continue
+                    raise json.JSONDecodeError("Need more data", buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                continue
+            if spans:
+                length = len(buffer[pos:end].encode("utf-8"))
+                yield value, pos_bytes, length
+                pos_bytes += length
+            else:
+                yield value, 0, 0
+            pos = end
+            if pos > chunk_size:
+                buffer = buffer[pos:]
+                pos = 0
+
+def iter_records(path: str) -> Iterator[Any]:
+    """Stream records from either a JSONL journal or a legacy JSON array file."""
+    if str(path).endswith(".jsonl"):
+        return iter_jsonl(path)
+    return iter_json_array(path)
+
+def count_records(path: str) -> int:
+    if str(path).endswith(".jsonl"):
+        # Counting lines avoids decoding every record
+        with open(path, "rb") as f:
+            return sum(1 for line in f if line.strip())
+    return sum(1 for _ in iter_json_array(path))
+
+class RecordStream:
+    """Re-iterable view over a records file that reads lazily on every iteration."""
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        self._count = None
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter_records(self.path)
+
+    def __len__(self) -> int:
+        if self._count is None:
+            self._count = count_records(self.path)
+        return self._count
+
+class JsonlStore:
+    """Append-only JSONL record store with fsync'd appends and atomic compaction."""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._repair()
+        self._file = None
+
+    def _repair(self) -> None:
+        """Drop a torn trailing line left by a process killed mid-append."""
+        if not self.path.exists():
+            return
+        with open(self.path, "rb+") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            if size == 0:
+                return
+            f.seek(size - 1)
+            if f.read(1) == b"\n":
+                return
+            # Scan backwards for the last complete line
+            pos = size
+            while pos > 0:
+                step = min(CHUNK_SIZE, pos)
+                pos -= step
+                f.seek(pos)
+                newline = f.read(step).rfind(b"\n")
+                if newline != -1:
+                    f.truncate(pos + newline + 1)
+                    return
+            f.truncate(0)
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def __iter__(self) -> Iterator[Any]:
+        if not self.path.exists():
+            return iter(())
+        return iter_jsonl(str(self.path))
+
+    def __len__(self) -> int:
+        if not self.path.exists():
+            return 0
+        return count_records(str(self.path))
+
+    def append(self, record: Dict) -> None:
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def seed_from(self, legacy_path: str) -> int:
+        """Populate an empty journal from a legacy JSON array file (one-time migration)."""
+        return write_records(str(self.path), iter_json_array(legacy_path))
+
+    def retain(self, keep: Callable[[Any], bool]) -> int:
+        """Atomically drop the records for which keep() is False; returns the number kept."""
+        self.close()
+        if not self.path.exists():
+            return 0
+        return write_records(str(self.path), (record for record in self if keep(record)))
+
+    def compact(self, json_path: str) -> int:
+        """Atomically rewrite the journal as the legacy indented JSON array at json_path."""
+        return write_records(json_path, self)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,110 @@
+"""Streaming near-duplicate detection for chat transcripts (MinHash + LSH).
+
+Each transcript is reduced to the set of its word 3-shingles and summarized
+by a MinHash signature of NUM_PERM values; the share of equal values between
+two signatures estimates the Jaccard similarity of the shingle sets. The
+signature is cut into BANDS bands of rows, and chats sharing a whole band land
+in the same bucket, so a lookup only compares against those candidates
+instead of every chat seen so far. With 16 bands of 8 rows a pair becomes a
+candidate with probability 1 - (1 - s^8)^16: ~0.95 at Jaccard 0.8, ~0.9999 at
+0.9 and ~0.06 at 0.5. Pairs right at the default threshold are therefore
+missed about 1 time in 20; more bands raise that recall at the cost of more
+candidates to compare.
+"""
+import re
+import threading
+import zlib
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+NUM_PERM = 128
+BANDS = 16
+SHINGLE_SIZE = 3
+DEFAULT_THRESHOLD = 0.8
+# Mersenne prime for the universal hashes; shingle hashes are reduced below it first
+_PRIME = (1 << 31) - 1
+
+_rng = np.random.default_rng(20240601)
+_A = _rng.integers(1, _PRIME, size=NUM_PERM, dtype=np.int64)
+_B = _rng.integers(0, _PRIME, size=NUM_PERM, dtype=np.int64)
+_TOKEN_RE = re.compile(r"[^\W_]+")
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> np.ndarray:
+    """Hashes of the distinct word n-grams of a text."""
+    tokens = _TOKEN_RE.findall(text.lower())
+    if len(tokens) < size:
+        grams = {" ".join(tokens)}
+    else:
+        grams = {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.int64, count=len(grams)) % _PRIME
+
+def signature(text: str) -> np.ndarray:
+    hashes = shingles(text)
+    return ((np.outer(_A, hashes) + _B[:, None]) % _PRIME).min(axis=1)
+
+def similarity(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the two transcripts."""
+    return float(np.mean(sig_a == sig_b))
+
+class MinHashIndex:
+    """LSH index of transcript signatures; safe to share between threads."""
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, bands: int = BANDS):
+        if NUM_PERM % bands:
+            raise ValueError(f"bands must divide {NUM_PERM}")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = NUM_PERM // bands
+        self._buckets: List[Dict[bytes, List[Hashable]]] = [{} for _ in range(bands)]
+        self._signatures: Dict[Hashable, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def _band_keys(self, sig: np.ndarray) -> List[bytes]:
+        return [sig[b * self.rows:(b + 1) * self.rows].tobytes() for b in range(self.bands)]
+
+    def _best_match(self, sig: np.ndarray, keys: List[bytes]) -> Optional[Tuple[Hashable, float]]:
+        candidates = {key for band, band_key in enumerate(keys) for key in self._buckets[band].get(band_key, ())}
+        best = None
+        for key in candidates:
+            score = similarity(sig, self._signatures[key])
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (key, score)
+        return best
+
+    def _insert(self, key: Hashable, sig: np.ndarray, keys: List[bytes]) -> None:
+        self._signatures[key] = sig
+        for band, band_key in enumerate(keys):
+            self._buckets[band].setdefault(band_key, []).append(key)
+
+    def query(self, text: str) -> Optional[Tuple[Hashable, float]]:
+        """(key, similarity) of the closest indexed transcript at or above the threshold, or None."""
+        sig = signature(text)
+        with self._lock:
+            return self._best_match(sig, self._band_keys(sig))
+
+    def add(self, key: Hashable, text: str) -> None:
+        sig = signature(text)
+        with self._lock:
+            self._insert(key, sig, self._band_keys(sig))
+
+    def add_if_new(self, key: Hashable, text: str) -> Optional[Tuple[Hashable, float]]:
+        """Index the transcript unless it near-duplicates one already indexed; returns that match."""
+        sig = signature(text)
+        keys = self._band_keys(sig)
+        with self._lock:
+            match = self._best_match(sig, keys)
+            if match is None:
+                self._insert(key, sig, keys)
+            return match
+
+def find_duplicates(items: Iterable[Tuple[Hashable, str]], threshold: float = DEFAULT_THRESHOLD) -> Iterable[Tuple[Hashable, Hashable, float]]:
+    """Stream (key, first similar key, similarity) for every transcript that repeats an earlier one."""
+    index = MinHashIndex(threshold)
+    for key, text in items:
+        match = index.add_if_new(key, text)
+        if match is not None:
+            yield key, match[0], match[1]
@@ -0,0 +1,106 @@
+import json
+import mmap
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+from storage.jsonl_store import atomic_write, iter_record_spans
+
+INDEX_DTYPE = np.dtype([("chat_id", "<i8"), ("offset", "<i8"), ("length", "<i8")])
+
+class RecordIndex:
+    """Byte-offset index over a results/chats file for random access to single records.
+
+    Row i of the index locates record i of the source file, which is also row i
+    of the aggregator's table. The offsets live in a .npy file that is memory
+    mapped, and records are decoded straight from a memory map of the source,
+    so a lookup costs one small read regardless of the dataset size. A JSON
+    sidecar remembers the source file, its size/mtime and the row count to
+    detect stale or half-rebuilt indexes.
+    """
+
+    def __init__(self, index_path: str):
+        self.index_path = Path(index_path)
+        with open(_meta_path(self.index_path), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.source_path = Path(self.meta["source"])
+        self.spans = np.load(self.index_path, mmap_mode="r")
+        # False when a rebuild was interrupted between the offsets and the sidecar
+        self.consistent = self.meta.get("rows") == len(self.spans)
+        self._file = None
+        self._map = None
+
+    @classmethod
+    def build(cls, source_path: str, index_path: str, keep: Optional[Callable[[Any], bool]] = None) -> "RecordIndex":
+        """Scan `source_path` once and write the index and its sidecar atomically.
+
+        With `keep`, only the records it accepts are indexed, mirroring a table
+        built from the same filtered records.
+        """
+        source = Path(source_path).resolve()
+        index_path = Path(index_path)
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        chunks, rows = [], []
+        for i, (record, offset, length) in enumerate(iter_record_spans(str(source))):
+            if keep is not None and not keep(record):
+                continue
+            chat_id = record.get("chat_id", i) if isinstance(record, dict) else i
+            rows.append((chat_id if isinstance(chat_id, int) else i, offset, length))
+            if len(rows) >= 100_000:
+                chunks.append(np.array(rows, dtype=INDEX_DTYPE))
+                rows = []
+        chunks.append(np.array(rows, dtype=INDEX_DTYPE))
+
+        spans = np.concatenate(chunks)
+        with atomic_write(str(index_path), binary=True) as f:
+            np.save(f, spans)
+        # The sidecar goes last: if a rebuild stops before it, the old sidecar's
+        # row count or source stat no longer match and the index reads as stale
+        stat = source.stat()
+        meta = {"source": str(source), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "rows": len(spans)}
+        with atomic_write(str(_meta_path(index_path))) as f:
+            json.dump(meta, f, indent=2)
+        return cls(str(index_path))
+
+    @staticmethod
+    def exists(index_path: str) -> bool:
+        return Path(index_path).exists() and _meta_path(Path(index_path)).exists()
+
+    def __len__(self) -> int:
+        return len(self.spans)
+
+    def is_stale(self) -> bool:
+        """True when the source file was changed or removed after the index was built, or the index is inconsistent."""
+        if not self.consistent:
+            return True
+        try:
+            stat = self.source_path.stat()
+        except FileNotFoundError:
+            return True
+        return stat.st_size != self.meta["size"] or stat.st_mtime_ns != self.meta["mtime_ns"]
+
+    def chat_id(self, row: int) -> int:
+        return int(self.spans[row]["chat_id"])
+
+    def find(self, chat_id: int) -> Optional[int]:
+        """Row of the first record with this chat id, or None."""
+        rows = np.flatnonzero(self.spans["chat_id"] == chat_id)
+        return int(rows[0]) if len(rows) else None
+
+    def read(self, row: int) -> Dict[str, Any]:
+        """Decode record `row` from the memory-mapped source file."""
+        if self._map is None:
+            self._file = open(self.source_path, "rb")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        offset, length = int(self.spans[row]["offset"]), int(self.spans[row]["length"])
+        return json.loads(self._map[offset:offset + length])
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+            self._map = self._file = None
+
+def _meta_path(index_path: Path) -> Path:
+    return index_path.with_suffix(".json")
@@ -0,0 +1,77 @@
+import json
+import hashlib
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from storage.jsonl_store import atomic_write
+
+DONE = "done"
+FAILED = "failed"
+SKIPPED = "skipped"
+# Only the local classifier's intent was recorded; a full run still judges the chat
+INTENT_ONLY = "intent_only"
+
+def chat_fingerprint(chat: Any) -> str:
+    """Stable content hash of a chat: SHA-256 of its canonical JSON form."""
+    canonical = json.dumps(chat, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+class ResumeIndex:
+    """Hash-set of processed chats, kept as an append-only JSONL file next to the output.
+
+    Each line records the latest status of one chat fingerprint (done, intent_only,
+    failed or skipped), so resuming is a set lookup per chat instead of a scan of every result.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.status: Dict[str, str] = {}
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn last line from a killed process is safe to ignore
+                        continue
+                    self.status[entry["hash"]] = entry["status"]
+
+    @classmethod
+    def for_output(cls, output_path: str) -> "ResumeIndex":
+        return cls(f"{output_path}.index.jsonl")
+
+    def get(self, fingerprint: str) -> Optional[str]:
+        return self.status.get(fingerprint)
+
+    def count(self, status: str) -> int:
+        return sum(1 for s in self.status.values() if s == status)
+
+    def mark(self, fingerprint: str, status: str, chat_id: Optional[int] = None, error: Optional[str] = None) -> None:
+        self.status[fingerprint] = status
+        entry = {"hash": fingerprint, "status": status, "chat_id": chat_id}
+        if error:
+            entry["error"] = error
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def rebuild(self, results: Iterable[Dict], status_of: Callable[[Dict], str] = lambda item: DONE) -> None:
+        """Recreate the index from existing results, keeping failed/skipped records.
+
+        `status_of` gives the status a stored result stands for; a full judgement
+        (DONE) wins over any other result stored for the same chat.
+        """
+        kept = {h: s for h, s in self.status.items() if s not in (DONE, INTENT_ONLY)}
+        self.status = {}
+        for item in results:
+            fingerprint = chat_fingerprint(item.get("original_chat"))
+            if self.status.get(fingerprint) != DONE:
+                self.status[fingerprint] = status_of(item)
+        for fingerprint, status in kept.items():
+            self.status.setdefault(fingerprint, status)
+
+        with atomic_write(self.path) as f:
+            for fingerprint, status in self.status.items():
+                f.write(json.dumps({"hash": fingerprint, "status": status}) + "\n")
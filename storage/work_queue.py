@@ -0,0 +1,227 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from storage.jsonl_store import write_records
+from storage.resume_index import chat_fingerprint, DONE, FAILED, SKIPPED
+
+PENDING = "pending"
+LEASED = "leased"
+DEFAULT_LEASE_SECONDS = 600
+ENQUEUE_BATCH_SIZE = 1000
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+class WorkQueue:
+    """Shared SQLite (WAL) queue of chats to analyze, safe for several processes or containers.
+
+    Chats are keyed by content hash, so enqueuing the same input from every
+    worker is idempotent. A worker leases items for `lease_seconds`; acked
+    items keep their result row, failed ones go back to the queue until
+    `max_attempts`, and leases of a worker that died simply expire and are
+    handed to the next caller of lease(). Once the queue is drained, the one
+    worker that wins claim_merge() writes the results in input order with merge().
+    """
+
+    def __init__(self, path: str, lease_seconds: float = DEFAULT_LEASE_SECONDS, max_attempts: int = 3):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+        self._lock = threading.Lock()
+        # Transactions are managed explicitly so lease() can take the write lock up front
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=60, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            "fingerprint TEXT PRIMARY KEY, position INTEGER NOT NULL, chat TEXT NOT NULL, "
+            "status TEXT NOT NULL, worker TEXT, lease_expires REAL, attempts INTEGER NOT NULL DEFAULT 0, "
+            "result TEXT, error TEXT, updated REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_status_position ON items(status, position)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS sources (source TEXT PRIMARY KEY, enqueued INTEGER NOT NULL)")
+        # Single row: who merged last and the newest item change that merge covered
+        self._conn.execute("CREATE TABLE IF NOT EXISTS merges (id INTEGER PRIMARY KEY CHECK (id = 1), worker TEXT NOT NULL, covered REAL NOT NULL)")
+
+    def _write(self, fn):
+        """Run fn(conn) inside one BEGIN IMMEDIATE transaction."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def enqueue(self, chats: Iterable[Tuple[int, Dict]], source: Optional[str] = None) -> int:
+        """Add (position, chat) pairs not queued yet; returns the number of new items.
+
+        With `source` set, the input is enqueued once: workers started later on the
+        same input skip the scan. Invalid chats are recorded as skipped right away.
+        """
+        if source is not None and self._source_enqueued(source):
+            return 0
+        added = 0
+        batch = []
+
+        def flush(conn) -> int:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO items (fingerprint, position, chat, status, updated) VALUES (?, ?, ?, ?, ?)",
+                batch
+            )
+            return conn.total_changes - before
+
+        now = time.time()
+        for position, chat in chats:
+            status = SKIPPED if not chat or "error" in chat else PENDING
+            batch.append((chat_fingerprint(chat), position, json.dumps(chat, ensure_ascii=False), status, now))
+            if len(batch) >= ENQUEUE_BATCH_SIZE:
+                added += self._write(flush)
+                batch = []
+        if batch:
+            added += self._write(flush)
+        if source is not None:
+            self._write(lambda conn: conn.execute(
+                "INSERT OR REPLACE INTO sources (source, enqueued) VALUES (?, ?)", (source, added)
+            ))
+        return added
+
+    def _source_enqueued(self, source: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM sources WHERE source = ?", (source,)).fetchone() is not None
+
+    def lease(self, worker: str, limit: int = 1) -> List[Tuple[str, int, Dict]]:
+        """Lease up to `limit` pending or expired items in input order: [(fingerprint, position, chat)]."""
+        def take(conn) -> List[Tuple[str, int, Dict]]:
+            now = time.time()
+            rows = conn.execute(
+                "SELECT fingerprint, position, chat FROM items "
+                "WHERE status = ? OR (status = ? AND lease_expires < ?) ORDER BY position LIMIT ?",
+                (PENDING, LEASED, now, limit)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE items SET status = ?, worker = ?, lease_expires = ?, attempts = attempts + 1, updated = ? "
+                "WHERE fingerprint = ?",
+                [(LEASED, worker, now + self.lease_seconds, now, fingerprint) for fingerprint, _, _ in rows]
+            )
+            return [(fingerprint, position, json.loads(chat)) for fingerprint, position, chat in rows]
+        return self._write(take)
+
+    def renew(self, worker: str, fingerprints: Optional[Iterable[str]] = None) -> None:
+        """Extend this worker's leases (all of them by default) while their chats are in flight."""
+        expires = time.time() + self.lease_seconds
+        if fingerprints is None:
+            self._write(lambda conn: conn.execute(
+                "UPDATE items SET lease_expires = ? WHERE worker = ? AND status = ?", (expires, worker, LEASED)
+            ))
+            return
+        self._write(lambda conn: conn.executemany(
+            "UPDATE items SET lease_expires = ? WHERE fingerprint = ? AND worker = ? AND status = ?",
+            [(expires, fingerprint, worker, LEASED) for fingerprint in fingerprints]
+        ))
+
+    def ack(self, fingerprint: str, result: Dict) -> bool:
+        """Store the result of a leased item. A late ack after the lease expired is still
+        kept unless another worker already finished the item; returns False in that case."""
+        def done(conn) -> bool:
+            cursor = conn.execute(
+                "UPDATE items SET status = ?, result = ?, error = NULL, lease_expires = NULL, updated = ? "
+                "WHERE fingerprint = ? AND status != ?",
+                (DONE, json.dumps(result, ensure_ascii=False), time.time(), fingerprint, DONE)
+            )
+            return cursor.rowcount == 1
+        return self._write(done)
+
+    def fail(self, worker: str, fingerprint: str, error: str) -> bool:
+        """Return the item to the queue, or mark it failed once max_attempts is reached.
+
+        Only the worker holding the lease can fail an item; returns False when the
+        lease expired and another worker has taken the item over.
+        """
+        return self._write(lambda conn: conn.execute(
+            "UPDATE items SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, "
+            "error = ?, lease_expires = NULL, updated = ? WHERE fingerprint = ? AND status = ? AND worker = ?",
+            (self.max_attempts, FAILED, PENDING, error, time.time(), fingerprint, LEASED, worker)
+        ).rowcount == 1)
+
+    def release(self, worker: str) -> int:
+        """Give back every item still leased by this worker (graceful shutdown)."""
+        return self._write(lambda conn: conn.execute(
+            "UPDATE items SET status = ?, attempts = MAX(attempts - 1, 0), lease_expires = NULL, updated = ? "
+            "WHERE worker = ? AND status = ?",
+            (PENDING, time.time(), worker, LEASED)
+        ).rowcount)
+
+    def requeue(self, statuses: Iterable[str]) -> int:
+        """Put failed and/or skipped items back in the queue with a fresh attempt budget."""
+        statuses = list(statuses)
+        if not statuses:
+            return 0
+        placeholders = ", ".join("?" for _ in statuses)
+        return self._write(lambda conn: conn.execute(
+            f"UPDATE items SET status = ?, attempts = 0, updated = ? WHERE status IN ({placeholders})",
+            (PENDING, time.time(), *statuses)
+        ).rowcount)
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM items GROUP BY status").fetchall()
+        counts = {status: 0 for status in (PENDING, LEASED, DONE, FAILED, SKIPPED)}
+        counts.update(dict(rows))
+        return counts
+
+    def next_expiry(self) -> Optional[float]:
+        """Seconds until the earliest lease expires, or None when nothing is leased."""
+        with self._lock:
+            row = self._conn.execute("SELECT MIN(lease_expires) FROM items WHERE status = ?", (LEASED,)).fetchone()
+        return None if row[0] is None else max(0.0, row[0] - time.time())
+
+    def iter_results(self) -> Iterator[Dict]:
+        """Finished results in input order, streamed through a separate read connection."""
+        conn = sqlite3.connect(self.path, timeout=60)
+        try:
+            for (result,) in conn.execute("SELECT result FROM items WHERE status = ? ORDER BY position", (DONE,)):
+                yield json.loads(result)
+        finally:
+            conn.close()
+
+    def claim_merge(self, worker: str) -> Optional[str]:
+        """Elect this worker to merge a drained queue: None if it won, else why it should not merge.
+
+        A merge is due again only after items change, e.g. in a --retry failed
+        round, so the workers that drain the queue together merge exactly once.
+        """
+        def claim(conn) -> Optional[str]:
+            busy = conn.execute("SELECT COUNT(*) FROM items WHERE status IN (?, ?)", (PENDING, LEASED)).fetchone()[0]
+            if busy:
+                return f"{busy} chats not finished yet"
+            latest = conn.execute("SELECT COALESCE(MAX(updated), 0) FROM items").fetchone()[0]
+            row = conn.execute("SELECT worker, covered FROM merges WHERE id = 1").fetchone()
+            if row is not None and row[1] >= latest:
+                return f"results already merged by {row[0]}"
+            conn.execute("INSERT OR REPLACE INTO merges (id, worker, covered) VALUES (1, ?, ?)", (worker, latest))
+            return None
+        return self._write(claim)
+
+    def merge(self, output_path: str) -> int:
+        """Atomically write all finished results in input order: JSONL for *.jsonl, else a JSON array.
+
+        The results go straight to output_path; the resume journal of a non-queue
+        run on the same output (<output>.jsonl) is left alone.
+        """
+        return write_records(output_path, self.iter_results())
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
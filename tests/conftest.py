@@ -0,0 +1,32 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+EXAMPLE_CHATS = REPO_ROOT / "data" / "examples" / "groq_dataset_260.json"
+EXAMPLE_RESULTS = REPO_ROOT / "data" / "examples" / "groq_analysis_130.json"
+
+@pytest.fixture
+def example_chats(tmp_path):
+    """Write the first `count` example chats to a JSON array file and return its path."""
+    def write(count: int, name: str = "chats.json") -> Path:
+        chats = json.loads(EXAMPLE_CHATS.read_text(encoding="utf-8"))[:count]
+        path = tmp_path / name
+        path.write_text(json.dumps(chats, indent=2), encoding="utf-8")
+        return path
+    return write
+
+def run_script(*args, env=None, timeout=120) -> subprocess.CompletedProcess:
+    """Run a top-level script of the repo against the in-process fake provider."""
+    full_env = {k: v for k, v in os.environ.items() if not k.startswith("FAKE_LLM_")}
+    full_env.update(env or {})
+    return subprocess.run(
+        [sys.executable, *map(str, args)], cwd=REPO_ROOT, env=full_env,
+        capture_output=True, text=True, timeout=timeout
+    )
@@ -0,0 +1,84 @@
+import json
+import sys
+
+import pytest
+
+from conftest import REPO_ROOT, EXAMPLE_CHATS, EXAMPLE_RESULTS
+from storage.jsonl_store import JsonlStore, write_records
+
+sys.path.insert(0, str(REPO_ROOT / "analytics"))
+from aggregation_state import AggregationState, SourceChangedError
+from data_aggregator import SupportChatAggregator
+
+@pytest.fixture
+def results():
+    return json.loads(EXAMPLE_RESULTS.read_text(encoding="utf-8"))
+
+def consume(state, path):
+    return sum(len(batch) for batch in state.iter_new_results(str(path)))
+
+def test_watermark_survives_the_switch_from_json_to_journal(tmp_path, results):
+    output = tmp_path / "results.json"
+    write_records(str(output), results[:100])
+    state = AggregationState()
+    assert consume(state, output) == 100
+
+    # analyze.py resumes: the journal appears next to the array and grows
+    journal = JsonlStore(str(tmp_path / "results.jsonl"))
+    journal.seed_from(str(output))
+    for record in results[100:105]:
+        journal.append(record)
+    assert consume(state, output) == 5
+    assert consume(state, output) == 0
+
+    journal.append(results[105])
+    assert consume(state, output) == 1
+    # Compacted and the journal removed: the array is read again from the record count
+    journal.compact(str(output))
+    journal.close()
+    (tmp_path / "results.jsonl").unlink()
+    write_records(str(output), results[:110])
+    assert consume(state, output) == 4
+    assert list(state.sources) == [str(output.resolve())]
+
+def test_replaced_or_truncated_file_is_detected(tmp_path, results):
+    output = tmp_path / "results.json"
+    write_records(str(output), results[:50])
+    state = AggregationState()
+    consume(state, output)
+
+    write_records(str(output), results[10:60])
+    with pytest.raises(SourceChangedError):
+        consume(state, output)
+
+    write_records(str(output), results[:20])
+    with pytest.raises(SourceChangedError):
+        consume(state, output)
+
+def test_aggregator_rebuilds_a_state_of_a_replaced_file(tmp_path, results):
+    output = tmp_path / "results.json"
+    state_path = tmp_path / "state.json"
+    write_records(str(output), results[:40])
+    aggregator = SupportChatAggregator(chats_path=str(EXAMPLE_CHATS), results_path=str(output))
+    assert aggregator.update_state(str(state_path)).count == 40
+
+    write_records(str(output), results[60:90])
+    state = aggregator.update_state(str(state_path))
+    assert state.count == 30
+    assert AggregationState.load(str(state_path)).count == 30
+
+def test_save_replaces_the_state_atomically(tmp_path, results):
+    path = tmp_path / "state" / "aggregation_state.json"
+    state = AggregationState()
+    write_records(str(tmp_path / "results.json"), results[:20])
+    consume(state, tmp_path / "results.json")
+    state.save(str(path))
+    saved = AggregationState.load(str(path)).sources
+    assert saved == state.sources
+
+    # A save that fails half-way keeps the previous state and leaves no temp file
+    state.sources["broken"] = object()
+    with pytest.raises(TypeError):
+        state.save(str(path))
+    assert AggregationState.load(str(path)).sources == saved
+    assert [p.name for p in path.parent.iterdir()] == [path.name]
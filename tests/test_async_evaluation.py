@@ -0,0 +1,65 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+from analyze import analyze_concurrently, format_dialogue, iter_units
+from providers.base import LLMProvider
+
+class EchoProvider(LLMProvider):
+    """Sync-only provider whose client upper-cases the prompt."""
+
+    def __init__(self):
+        self.threads = set()
+        self.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=self._create)))
+
+    def _create(self, messages, **kwargs):
+        self.threads.add(threading.current_thread().name)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=messages[-1]["content"].upper()))])
+
+    def name(self) -> str:
+        return "echo"
+
+class SlowJudge:
+    """Answers later chats first and records how many judgements overlap."""
+
+    intent_classifier = None
+
+    def __init__(self, delays):
+        self.delays = delays
+        self.in_flight = self.max_in_flight = 0
+
+    def serialize(self, chat):
+        return format_dialogue(chat), None
+
+    async def aevaluate_dialogue(self, dialogue: str):
+        i = int(dialogue.split(": ")[1])
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delays[i])
+        self.in_flight -= 1
+        if i == 3:
+            raise RuntimeError("judge failed")
+        return {"support_quality_analysis": {"chat": i}}
+
+def test_agenerate_runs_sync_clients_in_a_worker_thread():
+    provider = EchoProvider()
+    assert asyncio.run(provider.agenerate("hello", system_prompt="be brief")) == "HELLO"
+    assert threading.main_thread().name not in provider.threads
+
+def test_concurrent_results_are_committed_in_dataset_order():
+    pending = [(i, {"messages": [{"role": "user", "content": str(i)}]}) for i in range(8)]
+    judge = SlowJudge({i: 0.01 * (8 - i) for i in range(8)})
+    committed = []
+
+    def on_result(i, chat, analysis, error):
+        committed.append((i, analysis, error))
+
+    asyncio.run(analyze_concurrently(judge, iter_units(judge, pending, False, None), 3, len(pending), on_result))
+    assert [i for i, _, _ in committed] == list(range(8))
+    assert judge.max_in_flight == 3
+    assert [analysis for i, analysis, _ in committed if i != 3] == [{"chat": i} for i in range(8) if i != 3]
+    assert committed[3][1] is None and str(committed[3][2]) == "judge failed"
+
+def test_format_dialogue_labels_roles():
+    chat = {"messages": [{"role": "user", "content": "Привіт"}, {"role": "assistant", "content": "Вітаю"}]}
+    assert format_dialogue(chat) == "Customer: Привіт\nAgent: Вітаю\n"
@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from judge_agent.config import BATCH_TOKEN_BUDGETS
+from judge_agent.evaluation_agent import LLMJudge
+from judge_agent.models import SupportEvaluationBatch, SupportEvaluationResult
+from providers.fake import FakeProvider
+
+DIALOGUES = [(str(i), f"Customer: order {i} never arrived\nAgent: I will check it\n") for i in (1, 2, 3)]
+
+class BatchProvider(FakeProvider):
+    """Fake provider whose batch answers carry a scripted list of chat ids."""
+
+    def __init__(self, ids=None, invalid=False):
+        super().__init__()
+        self.ids = ids
+        self.invalid = invalid
+        self.calls = []
+
+    def _rewrite(self, response, response_model):
+        self.calls.append(response_model.__name__)
+        if response_model is not SupportEvaluationBatch:
+            return response
+        if self.invalid:
+            # What instructor raises once the model keeps returning an invalid batch
+            SupportEvaluationBatch.model_validate({"evaluations": [{"chat_id": "1"}]})
+        template = response.evaluations[0]
+        return SupportEvaluationBatch(evaluations=[template.model_copy(update={"chat_id": i}) for i in self.ids])
+
+    def generate(self, prompt, system_prompt=None, response_model=None, **kwargs):
+        return self._rewrite(super().generate(prompt, system_prompt, response_model, **kwargs), response_model)
+
+    async def agenerate(self, prompt, system_prompt=None, response_model=None, **kwargs):
+        return self._rewrite(await super().agenerate(prompt, system_prompt, response_model, **kwargs), response_model)
+
+def _single_calls(provider):
+    return provider.calls.count(SupportEvaluationResult.__name__)
+
+@pytest.mark.parametrize("evaluate", ["sync", "async"])
+def test_a_clean_batch_answer_needs_one_request(evaluate):
+    provider = BatchProvider(ids=["3", "1", "2"])
+    judge = LLMJudge(provider)
+    if evaluate == "sync":
+        results, errors = judge.evaluate_batch(DIALOGUES)
+    else:
+        results, errors = asyncio.run(judge.aevaluate_batch(DIALOGUES))
+    assert errors == {} and sorted(results) == ["1", "2", "3"]
+    assert all("chat_id" not in r["result"] and "quality_score" in r["result"] for r in results.values())
+    assert provider.calls == [SupportEvaluationBatch.__name__]
+
+@pytest.mark.parametrize("ids, rejudged", [
+    (["1", "1", "2", "3"], 1),  # a duplicated id is ambiguous, so chat 1 is judged alone
+    (["1", "3"], 1),  # a missing id
+    (["1", "2", "3", "99"], 0),  # an unknown id is ignored
+    (["7", "8", "9"], 3),  # nothing usable
+])
+def test_batch_ids_that_do_not_match_one_to_one_fall_back_per_dialogue(ids, rejudged):
+    provider = BatchProvider(ids=ids)
+    results, errors = LLMJudge(provider).evaluate_batch(DIALOGUES)
+    assert errors == {} and sorted(results) == ["1", "2", "3"]
+    assert _single_calls(provider) == rejudged
+
+def test_split_keeps_only_ids_answered_exactly_once():
+    judge = LLMJudge(BatchProvider(ids=["1", "1", "2", "99"]))
+    response = judge.provider.generate(judge.get_batch_prompt(DIALOGUES), judge.batch_system_prompt, SupportEvaluationBatch)
+    assert judge._split_batch_response(response, DIALOGUES).keys() == {"2"}
+    assert judge._split_batch_response(None, DIALOGUES) == {}
+
+@pytest.mark.parametrize("evaluate", ["sync", "async"])
+def test_invalid_batch_answers_fall_back_to_single_dialogues(evaluate):
+    provider = BatchProvider(invalid=True)
+    judge = LLMJudge(provider)
+    if evaluate == "sync":
+        results, errors = judge.evaluate_batch(DIALOGUES)
+    else:
+        results, errors = asyncio.run(judge.aevaluate_batch(DIALOGUES))
+    assert errors == {} and sorted(results) == ["1", "2", "3"]
+    assert _single_calls(provider) == 3
+
+def test_batch_size_comes_from_the_model_token_budget(monkeypatch):
+    judge = LLMJudge(FakeProvider())
+    monkeypatch.setitem(BATCH_TOKEN_BUDGETS, "fake-support-model", {"input": 1000, "output": 1400})
+    assert judge.batch_limits() == (1000, 4)
+
+    short = [(str(i), "Customer: hi\n", i) for i in range(10)]
+    assert [len(batch) for batch in judge.iter_batches(short)] == [4, 4, 2]
+    assert [len(batch) for batch in judge.iter_batches(short, max_batch_size=3)] == [3, 3, 3, 1]
+    # 300-token dialogues: the input budget fits three before the dialogue cap
+    long = [(str(i), "x" * 1200, i) for i in range(7)]
+    assert [len(batch) for batch in judge.iter_batches(long)] == [3, 3, 1]
+
+    monkeypatch.delitem(BATCH_TOKEN_BUDGETS, "fake-support-model")
+    assert judge.batch_limits() == (4000, 11)
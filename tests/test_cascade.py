@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from judge_agent.cascade import CHEAP_ERROR, CascadeJudge, consistency_issues, disagreements
+from providers.fake import FakeProvider
+
+GOOD = dict(intent="payment_troubles", satisfaction="satisfied", quality_score=4,
+            is_problem_solved=True, agent_mistakes=["none"], thought_process="-")
+
+class ScriptedJudge:
+    """Stands in for one cascade tier: answers per (dialogue, sample) from a script."""
+
+    def __init__(self, answers, provider=None):
+        self.answers = answers
+        self.provider = provider
+        self.calls = []
+
+    def _answer(self, dialogue, sample):
+        self.calls.append((dialogue, sample))
+        answer = self.answers[dialogue][sample] if isinstance(self.answers[dialogue], list) else self.answers[dialogue]
+        if isinstance(answer, Exception):
+            raise answer
+        return {"result": dict(answer)}
+
+    def evaluate_dialogue(self, dialogue, sample=0):
+        return self._answer(dialogue, sample)
+
+    async def aevaluate_dialogue(self, dialogue, sample=0):
+        return self._answer(dialogue, sample)
+
+    def evaluate_batch(self, dialogues, sample=0):
+        results, errors = {}, {}
+        for chat_id, dialogue in dialogues:
+            try:
+                results[chat_id] = self._answer(dialogue, sample)
+            except Exception as e:
+                errors[chat_id] = e
+        return results, errors
+
+def _cascade(cheap_answers, samples=2):
+    judge = CascadeJudge(FakeProvider("fake-support-model-small"), FakeProvider(), samples=samples)
+    judge.cheap = ScriptedJudge(cheap_answers, judge.cheap.provider)
+    judge.strong = ScriptedJudge({dialogue: dict(GOOD, thought_process="strong") for dialogue in cheap_answers},
+                                 judge.strong.provider)
+    return judge
+
+@pytest.mark.parametrize("changes, gates", [
+    ({}, []),
+    ({"agent_mistakes": ["none", "rude_tone"]}, ["none_with_mistakes"]),
+    ({"quality_score": 5, "agent_mistakes": ["rude_tone"]}, ["top_score_with_mistakes"]),
+    ({"quality_score": 2}, ["low_score_without_mistakes"]),
+    ({"agent_mistakes": ["no_resolution"]}, ["solved_with_no_resolution"]),
+    ({"quality_score": 5, "is_problem_solved": False}, ["top_score_unsolved"]),
+])
+def test_consistency_gates(changes, gates):
+    assert consistency_issues(dict(GOOD, **changes)) == gates
+
+def test_disagreement_gate():
+    assert disagreements(GOOD, dict(GOOD, quality_score=5, agent_mistakes=["rude_tone"])) == []
+    assert disagreements(GOOD, dict(GOOD, satisfaction="neutral", quality_score=2)) == [
+        "disagree_satisfaction", "disagree_quality_score"]
+    assert disagreements(GOOD, {"error": "invalid"}) == [CHEAP_ERROR]
+
+def test_confident_cheap_answers_are_kept():
+    judge = _cascade({"a": [GOOD, dict(GOOD, quality_score=5)]})
+    result = judge.evaluate_dialogue("a")["result"]
+    assert result["judge_tier"] == "cheap" and "escalation_reasons" not in result
+    assert judge.cheap.calls == [("a", 0), ("a", 1)] and judge.strong.calls == []
+
+def test_gated_dialogues_escalate_to_the_strong_judge():
+    judge = _cascade({
+        "inconsistent": dict(GOOD, quality_score=5, is_problem_solved=False),
+        "disagreeing": [GOOD, dict(GOOD, intent="other")],
+        "failing": RuntimeError("cheap model down"),
+        "confident": [GOOD, GOOD],
+    })
+    results = {dialogue: judge.evaluate_dialogue(dialogue)["result"] for dialogue in judge.cheap.answers}
+    assert results["inconsistent"]["escalation_reasons"] == ["top_score_unsolved"]
+    assert results["disagreeing"]["escalation_reasons"] == ["disagree_intent"]
+    assert results["failing"]["escalation_reasons"] == [CHEAP_ERROR]
+    assert all(results[d]["judge_tier"] == "strong" and results[d]["thought_process"] == "strong"
+               for d in ("inconsistent", "disagreeing", "failing"))
+    # The consistency gate fires before a second sample is spent
+    assert ("inconsistent", 1) not in judge.cheap.calls
+    assert (judge.stats()["cheap_model"], judge.stats()["strong_model"]) == ("fake-support-model-small", "fake-support-model")
+    assert judge.stats()["escalated"] == 3 and judge.stats()["escalation_rate"] == 75.0
+    assert judge.stats()["gates"] == {"top_score_unsolved": 1, "disagree_intent": 1, CHEAP_ERROR: 1}
+
+def test_single_sample_relies_on_consistency_only():
+    judge = _cascade({"a": [GOOD, dict(GOOD, intent="other")]}, samples=1)
+    assert asyncio.run(judge.aevaluate_dialogue("a"))["result"]["judge_tier"] == "cheap"
+    assert judge.cheap.calls == [("a", 0)]
+
+def test_batches_escalate_only_the_gated_dialogues():
+    judge = _cascade({
+        "a": [GOOD, GOOD],
+        "b": [GOOD, dict(GOOD, is_problem_solved=False)],
+        "c": dict(GOOD, quality_score=1),
+    })
+    results, errors = judge.evaluate_batch([("1", "a"), ("2", "b"), ("3", "c")])
+    assert errors == {}
+    assert {chat_id: r["result"]["judge_tier"] for chat_id, r in results.items()} == {"1": "cheap", "2": "strong", "3": "strong"}
+    assert judge.strong.calls == [("b", 0), ("c", 0)]
+    assert ("c", 1) not in judge.cheap.calls
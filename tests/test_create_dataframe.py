@@ -0,0 +1,46 @@
+import json
+import sys
+
+import pandas as pd
+
+from conftest import EXAMPLE_RESULTS, REPO_ROOT
+
+sys.path.insert(0, str(REPO_ROOT / "analytics"))
+sys.path.insert(0, str(REPO_ROOT / "benchmarks"))
+from create_dataframe import legacy_create_dataframe
+from data_aggregator import SupportChatAggregator
+from mistakes import MISTAKE_TYPES, decode_mask, flags_to_mask
+
+EDGE_CASES = [
+    {"chat_id": 1, "original_chat": {"scenario": "refund", "type": "successful", "messages": [{}, {}]},
+     "analysis": {"result": {"intent": "refund", "satisfaction": "satisfied", "quality_score": 5,
+                             "thought_process": "ok", "agent_mistakes": ["none"]}}},
+    {"chat_id": 2, "original_chat": {"scenario": "other", "type": "agent_mistake", "messages": [{}]},
+     "analysis": {"result": {"intent": "other", "satisfaction": "unsatisfied", "quality_score": 2,
+                             "thought_process": "bad", "agent_mistakes": ["rude_tone", "no_resolution"]}}},
+    # Missing analysis, missing messages, an empty list and an unknown mistake
+    {"chat_id": 3, "original_chat": {"scenario": "refund"}, "analysis": {}},
+    {"chat_id": 4, "original_chat": {}, "analysis": {"result": {"agent_mistakes": []}}},
+    {"chat_id": 5, "analysis": {"result": {"quality_score": 3, "agent_mistakes": ["made_up", "rude_tone"]}}},
+]
+
+def _columnar(results):
+    aggregator = SupportChatAggregator(chats_path="", results_path="")
+    aggregator.results_data = results
+    return aggregator.create_dataframe()
+
+def test_columnar_build_matches_the_row_by_row_reference():
+    results = json.loads(EXAMPLE_RESULTS.read_text(encoding="utf-8")) + EDGE_CASES
+    legacy_df = legacy_create_dataframe(results)
+    flag_columns = [f'mistake_{mistake}' for mistake in MISTAKE_TYPES]
+    expected_df = legacy_df.drop(columns=flag_columns).assign(mistake_mask=flags_to_mask(legacy_df))
+    pd.testing.assert_frame_equal(_columnar(results), expected_df)
+
+def test_edge_cases():
+    df = _columnar(EDGE_CASES).set_index("chat_id")
+    assert df.loc[1, "has_mistakes"] == False and df.loc[1, "mistake_count"] == 0
+    assert decode_mask(df.loc[2, "mistake_mask"]) == ["rude_tone", "no_resolution"]
+    assert (df.loc[3, "intent"], df.loc[3, "quality_score"], df.loc[3, "message_count"]) == ("unknown", 0, 0)
+    assert df.loc[3, "has_mistakes"] == False and df.loc[3, "scenario_type"] == "unknown"
+    # An unknown mistake still counts, but sets no bit
+    assert df.loc[5, "mistake_count"] == 2 and decode_mask(df.loc[5, "mistake_mask"]) == ["rude_tone"]
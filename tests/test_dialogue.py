@@ -0,0 +1,73 @@
+import pytest
+
+from analyze import record_compression
+from judge_agent.config import DIALOGUE_TOKEN_BUDGET
+from judge_agent.dialogue import COURTESY_PLACEHOLDER, format_dialogue, serialize_dialogue
+from judge_agent.evaluation_agent import LLMJudge
+from providers.fake import FakeProvider
+
+def words(text):
+    return len(text.split())
+
+OPENING = "My card was charged twice for the annual plan and I need one charge refunded."
+CLOSING = "Thanks, that fixed it."
+LONG_REPLY = " ".join(f"step{i}" for i in range(120)) + "."
+
+def chat(*middle):
+    turns = [("user", OPENING), *middle, ("user", "Ok, waiting."), ("user", CLOSING)]
+    return {"messages": [{"role": role, "content": content} for role, content in turns]}
+
+COURTEOUS = chat(("assistant", "Hello there! Thank you for reaching out. I see the duplicate charge."),
+                 ("assistant", "Have a great day!"))
+
+def test_chats_within_the_budget_are_sent_verbatim():
+    assert serialize_dialogue(COURTEOUS, words, None) == (format_dialogue(COURTEOUS), None)
+    assert serialize_dialogue(COURTEOUS, words, 0) == (format_dialogue(COURTEOUS), None)
+    assert serialize_dialogue(COURTEOUS, words, words(format_dialogue(COURTEOUS))) == (format_dialogue(COURTEOUS), None)
+
+def test_stage_one_drops_courtesy_sentences():
+    budget = words(format_dialogue(COURTEOUS)) - 1
+    text, stats = serialize_dialogue(COURTEOUS, words, budget)
+    assert "Agent: I see the duplicate charge.\n" in text
+    assert f"Agent: {COURTESY_PLACEHOLDER}\n" in text
+    # Customer turns are protected even when they are pleasantries
+    assert text.startswith(f"Customer: {OPENING}\n") and text.endswith(f"Customer: {CLOSING}\n")
+    assert (stats["courtesy_sentences"], stats["truncated_turns"], stats["omitted_turns"]) == (3, 0, 0)
+
+def test_stage_two_cuts_the_middle_of_long_turns():
+    long_chat = chat(("assistant", LONG_REPLY))
+    text, stats = serialize_dialogue(long_chat, words, 100)
+    assert "Agent: step0 " in text and " step119." in text and "words omitted ..." in text
+    assert (stats["truncated_turns"], stats["omitted_turns"]) == (1, 0)
+
+def test_stage_three_omits_whole_middle_turns():
+    long_chat = chat(*[("assistant", f"Checking ledger entry number {i} for the duplicate.") for i in range(6)])
+    text, stats = serialize_dialogue(long_chat, words, 40)
+    assert "turns omitted]" in text
+    assert stats["omitted_turns"] > 0 and stats["tokens"] <= 40
+    assert text.startswith(f"Customer: {OPENING}\n") and text.endswith(f"Customer: {CLOSING}\n")
+
+@pytest.mark.parametrize("budget", [60, 100, 140])
+def test_compression_accounting(budget):
+    long_chat = chat(("assistant", LONG_REPLY), ("assistant", "Have a great day!"))
+    text, stats = serialize_dialogue(long_chat, words, budget)
+    assert stats["original_tokens"] == words(format_dialogue(long_chat))
+    assert stats["budget"] == budget and stats["tokens"] == words(text) <= budget
+    assert stats["saved_pct"] == round((1 - stats["tokens"] / stats["original_tokens"]) * 100, 1)
+
+    analysis = record_compression({"result": {"intent": "refund_request"}}, stats)
+    assert analysis["result"]["dialogue_compression"] is stats
+    assert record_compression({"result": {}}, None) == {"result": {}}
+
+def test_provider_token_counts_use_the_chars_per_token_table():
+    assert FakeProvider().count_tokens("x" * 10) == 3
+
+def test_judges_send_chats_verbatim_unless_a_budget_is_given():
+    judge = LLMJudge(FakeProvider())
+    assert DIALOGUE_TOKEN_BUDGET == 0 and judge.dialogue_budget is None
+    assert judge.serialize(COURTEOUS) == (format_dialogue(COURTEOUS), None)
+
+def test_courtesy_patterns_are_english_only():
+    ukrainian = chat(("assistant", "Добрий день! Дякую за звернення. Бачу подвійне списання."))
+    text, stats = serialize_dialogue(ukrainian, words, words(format_dialogue(ukrainian)) - 1)
+    assert stats["courtesy_sentences"] == 0 and COURTESY_PLACEHOLDER not in text
@@ -0,0 +1,87 @@
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from analyze import analyze_chat
+from conftest import EXAMPLE_RESULTS
+from judge_agent.evaluation_agent import LLMJudge
+from judge_agent.models import SupportChat, SupportEvaluationResult
+from providers.fake import FakeProvider
+from providers.fake_server import FakeServerConfig, parse_latency, start_fake_server
+
+@pytest.fixture
+def server():
+    servers = []
+    def start(**config):
+        servers.append(start_fake_server(config=FakeServerConfig(**config)))
+        return servers[-1]
+    yield start
+    for s in servers:
+        s.shutdown()
+
+def _post(server, path="/v1/chat/completions"):
+    body = json.dumps({"model": "fake", "messages": [{"role": "user", "content": "hi"}]}).encode("utf-8")
+    request = urllib.request.Request(server.base_url + path, data=body, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, dict(response.headers), json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, dict(e.headers), json.loads(e.read())
+
+def test_structured_answers_are_schema_valid_and_deterministic(server):
+    provider = FakeProvider(host=server().base_url)
+    first = provider.generate("Judge this dialogue", response_model=SupportEvaluationResult)
+    assert isinstance(first, SupportEvaluationResult)
+    assert provider.generate("Judge this dialogue", response_model=SupportEvaluationResult).model_dump() == first.model_dump()
+
+    chat = provider.generate("Generate a realistic customer support chat about 'refund'.\nPrimary Case Type: 'agent_mistake'.",
+                             response_model=SupportChat)
+    assert (chat.scenario, chat.type) == ("refund", "agent_mistake")
+    assert [m.role for m in chat.messages[:2]] == ["user", "assistant"]
+
+def test_replay_answers_with_the_recorded_judgement(server):
+    provider = FakeProvider(host=server(replay_path=str(EXAMPLE_RESULTS)).base_url)
+    record = json.loads(EXAMPLE_RESULTS.read_text(encoding="utf-8"))[7]
+    analysis = analyze_chat(LLMJudge(provider), record["original_chat"])
+    expected = record["analysis"]["result"]
+    assert (analysis["result"]["intent"], analysis["result"]["quality_score"]) == (expected["intent"], expected["quality_score"])
+
+def test_injected_faults(server):
+    status, _, body = _post(server(error_rate=1.0))
+    assert status == 500 and body["error"]["type"] == "server_error"
+
+    throttled = server(rate_limit_rate=1.0, retry_after=2.5)
+    status, headers, _ = _post(throttled)
+    assert status == 429 and headers["Retry-After"] == "2.5"
+    assert throttled.stats == {"requests": 1, "errors": 0, "rate_limited": 1}
+
+def test_ollama_protocol(server):
+    status, _, body = _post(server(), "/api/chat")
+    assert status == 200 and body["done"] and body["message"]["role"] == "assistant"
+
+def test_latency_distributions():
+    rng = random.Random(1)
+    assert parse_latency("fixed:0.2")(rng) == 0.2
+    assert all(0.1 <= parse_latency("uniform:0.1,0.5")(rng) <= 0.5 for _ in range(20))
+    assert parse_latency("exponential:0.3")(rng) >= 0
+    with pytest.raises(ValueError):
+        parse_latency("gaussian:1")
+
+def test_ollama_prefix_warm_up_runs_once_in_the_background(server):
+    from judge_agent.cascade import CascadeJudge
+    from providers.ollama import OllamaProvider
+
+    slow = server(latency="fixed:1")
+    provider = OllamaProvider(model_name="llama3.2:1b", host=slow.base_url)
+    start = time.perf_counter()
+    CascadeJudge(provider, provider)
+    assert time.perf_counter() - start < 0.5
+    for thread in [t for t in threading.enumerate() if t.name == "ollama-warmup"]:
+        thread.join(timeout=5)
+    # Three judges registered the same prefix on one provider: one warm-up request
+    assert slow.stats["requests"] == 1
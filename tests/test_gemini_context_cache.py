@@ -0,0 +1,85 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from providers.gemini import GeminiProvider
+
+PREFIX = "Evaluate the dialogue below.\n"
+
+class CacheService:
+    def __init__(self, error=None):
+        self.error = error
+        self.created = 0
+
+    def _create(self, model, config):
+        self.created += 1
+        if self.error:
+            raise self.error
+        return SimpleNamespace(name=f"cachedContents/{self.created}")
+
+    def create(self, model, config):
+        raise AssertionError("the async path must not call the blocking client")
+
+class AsyncCacheService(CacheService):
+    async def create(self, model, config):
+        await asyncio.sleep(0.2)
+        return self._create(model, config)
+
+@pytest.fixture
+def provider(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test")
+    provider = GeminiProvider("gemini-2.5-flash-lite")
+    provider.register_prompt_prefix("system", PREFIX)
+    return provider
+
+def _with_caches(provider, service):
+    provider.genai_client = SimpleNamespace(caches=service, aio=SimpleNamespace(caches=service))
+    return service
+
+async def _concurrent_requests(provider, count):
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    clock = asyncio.create_task(ticker())
+    applied = await asyncio.gather(*(
+        provider._aapply_prompt_cache(PREFIX + f"dialogue {i}", "system", {"config": {"temperature": 0}})
+        for i in range(count)
+    ))
+    clock.cancel()
+    return applied, ticks
+
+def test_async_requests_share_one_cache_without_blocking_the_loop(provider):
+    service = _with_caches(provider, AsyncCacheService())
+    applied, ticks = asyncio.run(_concurrent_requests(provider, 5))
+    assert service.created == 1
+    # The event loop kept running while the cache was being created
+    assert ticks >= 10
+    assert [prompt for prompt, _, _ in applied] == [f"dialogue {i}" for i in range(5)]
+    assert all(system is None and kwargs["config"] == {"temperature": 0, "cached_content": "cachedContents/1"}
+               for _, system, kwargs in applied)
+
+    # A later event loop reuses the live cache
+    asyncio.run(_concurrent_requests(provider, 2))
+    assert service.created == 1
+
+def test_failed_async_cache_creation_sends_the_full_prompt(provider):
+    service = _with_caches(provider, AsyncCacheService(error=ValueError("too small to cache")))
+    applied, _ = asyncio.run(_concurrent_requests(provider, 3))
+    assert service.created == 1
+    assert applied[0] == (PREFIX + "dialogue 0", "system", {"config": {"temperature": 0}})
+
+def test_sync_requests_use_the_blocking_client(provider):
+    class SyncCacheService(CacheService):
+        create = CacheService._create
+
+    service = _with_caches(provider, SyncCacheService())
+    prompt, system, kwargs = provider._apply_prompt_cache(PREFIX + "dialogue", "system", {})
+    assert (prompt, system, kwargs) == ("dialogue", None, {"config": {"cached_content": "cachedContents/1"}})
+    assert provider._apply_prompt_cache("Other prompt", "system", {}) == ("Other prompt", "system", {})
+    assert service.created == 1
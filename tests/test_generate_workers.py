@@ -0,0 +1,48 @@
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from generate import generate_chat, task_rng
+from judge_agent.config import CASE_TYPES, INTENTS
+from judge_agent.models import SupportChat
+
+class ScriptedProvider:
+    """Returns a fixed chat and remembers the prompt sent for each scenario/case type."""
+
+    def __init__(self):
+        self.prompts = {}
+        self.lock = threading.Lock()
+
+    def generate(self, prompt, system_prompt=None, response_model=None, sample=0):
+        scenario = prompt.split("'")[1]
+        case_type = prompt.split("Primary Case Type: '")[1].split("'")[0]
+        with self.lock:
+            self.prompts[(scenario, case_type)] = prompt
+        return SupportChat(scenario=scenario, type=case_type, messages=[{"role": "user", "content": "Привіт"}])
+
+def _plan():
+    return [(i, INTENTS[i % len(INTENTS)], CASE_TYPES[i % len(CASE_TYPES)]) for i in range(12)]
+
+def _run(plan, workers, seed=42):
+    provider = ScriptedProvider()
+    def task(item):
+        plan_index, intent, case_type = item
+        return plan_index, generate_chat(provider, intent, case_type, "system", rng=task_rng(seed, plan_index, intent, case_type))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return dict(executor.map(task, plan))
+
+def test_task_rng_depends_only_on_the_task():
+    first = [task_rng(42, 3, "refund", "agent_mistake").random() for _ in range(3)]
+    assert first == [task_rng(42, 3, "refund", "agent_mistake").random() for _ in range(3)]
+    assert task_rng(42, 4, "refund", "agent_mistake").random() != first[0]
+    assert task_rng(7, 3, "refund", "agent_mistake").random() != first[0]
+
+def test_parallel_generation_samples_like_sequential_generation():
+    plan = _plan()
+    sequential = _run(plan, workers=1)
+    shuffled = plan[:]
+    random.Random(0).shuffle(shuffled)
+    parallel = _run(shuffled, workers=4)
+    assert {i: chat["metadata"] for i, chat in parallel.items()} == {i: chat["metadata"] for i, chat in sequential.items()}
+    assert any(chat["metadata"]["intended_mistakes"] for chat in sequential.values())
+    assert _run(plan, workers=4, seed=43) != sequential
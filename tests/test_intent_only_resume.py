@@ -0,0 +1,51 @@
+import json
+import sys
+
+from conftest import REPO_ROOT, EXAMPLE_RESULTS, run_script
+from storage.jsonl_store import iter_records
+from storage.resume_index import ResumeIndex, DONE, INTENT_ONLY
+from judge_agent.intent_classifier import is_intent_only
+
+sys.path.insert(0, str(REPO_ROOT / "analytics"))
+from data_aggregator import SupportChatAggregator
+
+def test_full_run_judges_chats_labeled_by_an_intent_only_run(tmp_path, example_chats):
+    chats = example_chats(20)
+    model = tmp_path / "intent.npz"
+    output = tmp_path / "results.json"
+    trained = run_script("-m", "judge_agent.intent_classifier", "--results", EXAMPLE_RESULTS, "--output", model)
+    assert trained.returncode == 0, trained.stderr
+    analyze = ["analyze.py", "--provider", "fake", "--no-cache", "--input", chats, "--output", output]
+
+    first = run_script(*analyze, "--intent-only", "--intent-model", model)
+    assert first.returncode == 0, first.stderr
+    labeled = [r for r in iter_records(str(output)) if is_intent_only(r)]
+    assert labeled, "the classifier should label some of the example chats"
+    assert ResumeIndex.for_output(str(output)).count(INTENT_ONLY) == len(labeled)
+
+    # An intent-only rerun has nothing left to do
+    again = run_script(*analyze, "--intent-only", "--intent-model", model)
+    assert "Analyzing chat" not in again.stdout
+
+    full = run_script(*analyze)
+    assert full.returncode == 0, full.stderr
+    records = list(iter_records(str(output)))
+    assert sorted(r["chat_id"] for r in records) == list(range(1, 21))
+    assert not any(is_intent_only(r) for r in records)
+    assert all("quality_score" in r["analysis"]["result"] for r in records)
+    assert ResumeIndex.for_output(str(output)).count(DONE) == 20
+
+def test_aggregator_skips_intent_only_records(tmp_path):
+    results = json.loads(EXAMPLE_RESULTS.read_text(encoding="utf-8"))[:10]
+    for record in results[:4]:
+        record["analysis"] = {"result": {"intent": "refund_request", "intent_confidence": 0.9, "intent_source": "classifier"}}
+    path = tmp_path / "results.json"
+    path.write_text(json.dumps(results), encoding="utf-8")
+    aggregator = SupportChatAggregator(chats_path=str(path), results_path=str(path))
+    aggregator.load_data()
+    df = aggregator.create_dataframe()
+    assert len(df) == 6 and aggregator.intent_only_skipped == 4
+    assert (df["quality_score"] > 0).all()
+    index = aggregator.build_transcript_index(str(tmp_path / "analytics.parquet"))
+    assert len(index) == len(df)
+    assert index.read(0)["chat_id"] == df["chat_id"].iloc[0]
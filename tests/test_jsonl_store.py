@@ -0,0 +1,95 @@
+import json
+
+import pytest
+
+from conftest import EXAMPLE_RESULTS
+from storage.jsonl_store import (JsonlStore, RecordStream, iter_json_array, iter_record_spans, iter_records,
+                                 journal_path, write_records)
+from storage.record_index import RecordIndex
+
+RECORDS = [{"chat_id": i, "score": i + 0.5, "text": "Дякую" * i, "tags": [i, None, True]} for i in range(1, 30)]
+
+def test_journal_path_sits_next_to_the_json_output():
+    assert journal_path("data/results.json") == "data/results.jsonl"
+    assert journal_path("data/results.jsonl") == "data/results.jsonl"
+
+def test_append_survives_reopening_and_drops_a_torn_last_line(tmp_path):
+    store = JsonlStore(str(tmp_path / "results.jsonl"))
+    for record in RECORDS[:3]:
+        store.append(record)
+    store.close()
+    with open(store.path, "a", encoding="utf-8") as f:
+        f.write('{"chat_id": 4, "sco')
+
+    reopened = JsonlStore(str(store.path))
+    assert list(reopened) == RECORDS[:3] and len(reopened) == 3
+    reopened.append(RECORDS[3])
+    reopened.close()
+    assert list(iter_records(str(store.path))) == RECORDS[:4]
+
+def test_compact_matches_json_dump_byte_for_byte(tmp_path):
+    store = JsonlStore(str(tmp_path / "results.jsonl"))
+    for record in RECORDS:
+        store.append(record)
+    store.close()
+    assert store.compact(str(tmp_path / "results.json")) == len(RECORDS)
+    assert (tmp_path / "results.json").read_text(encoding="utf-8") == json.dumps(RECORDS, ensure_ascii=False, indent=2)
+
+    empty = JsonlStore(str(tmp_path / "empty.jsonl"))
+    assert empty.compact(str(tmp_path / "empty.json")) == 0
+    assert json.loads((tmp_path / "empty.json").read_text(encoding="utf-8")) == []
+
+def test_seed_from_migrates_a_legacy_json_array(tmp_path):
+    legacy = tmp_path / "results.json"
+    legacy.write_text(json.dumps(RECORDS, ensure_ascii=False, indent=2), encoding="utf-8")
+    store = JsonlStore(journal_path(str(legacy)))
+    assert store.seed_from(str(legacy)) == len(RECORDS)
+    assert list(store) == RECORDS
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 16])
+def test_json_array_streams_across_chunk_boundaries(tmp_path, chunk_size):
+    path = tmp_path / "results.json"
+    path.write_text(json.dumps(RECORDS + [12.25, "x", 1e-5], ensure_ascii=False), encoding="utf-8")
+    assert list(iter_json_array(str(path), chunk_size)) == RECORDS + [12.25, "x", 1e-5]
+
+def test_non_arrays_are_rejected(tmp_path):
+    path = tmp_path / "results.json"
+    path.write_text('{"chat_id": 1}', encoding="utf-8")
+    with pytest.raises(ValueError):
+        list(iter_json_array(str(path)))
+
+def test_record_stream_is_reiterable_and_counts_records(tmp_path):
+    path = tmp_path / "results.json"
+    path.write_text(json.dumps(RECORDS), encoding="utf-8")
+    stream = RecordStream(str(path))
+    assert len(stream) == len(RECORDS)
+    assert list(stream) == list(stream) == RECORDS
+
+def _records():
+    records = json.loads(EXAMPLE_RESULTS.read_text(encoding="utf-8"))[:12]
+    records[0]["note"] = "Дякую за допомогу"  # multi-byte characters shift later offsets
+    return records
+
+def _assert_spans_match_bytes(path, records, chunk_size=None):
+    data = path.read_bytes()
+    spans = list(iter_record_spans(str(path)))
+    assert [record for record, _, _ in spans] == records
+    for record, offset, length in spans:
+        assert json.loads(data[offset:offset + length].decode("utf-8")) == record
+
+def test_spans_on_crlf_json_array(tmp_path):
+    records = _records()
+    path = tmp_path / "results.json"
+    path.write_bytes(json.dumps(records, ensure_ascii=False, indent=2).replace("\n", "\r\n").encode("utf-8"))
+    _assert_spans_match_bytes(path, records)
+    assert list(iter_records(str(path))) == records
+
+    index = RecordIndex.build(str(path), str(tmp_path / "results.idx.npy"))
+    assert [index.read(row) for row in range(len(index))] == records
+
+def test_spans_on_lf_array_and_jsonl(tmp_path):
+    records = _records()
+    for name in ("results.json", "results.jsonl"):
+        path = tmp_path / name
+        assert write_records(str(path), records) == len(records)
+        _assert_spans_match_bytes(path, records)
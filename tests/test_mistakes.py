@@ -0,0 +1,62 @@
+import itertools
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from pydantic import ValidationError
+
+from conftest import REPO_ROOT
+from judge_agent.config import MISTAKE_TYPES as MISTAKE_REGISTRY
+from judge_agent.models import SupportEvaluationResult
+
+sys.path.insert(0, str(REPO_ROOT / "analytics"))
+from data_aggregator import read_analytics
+from mistakes import (MISTAKE_TYPES, MASK_DTYPE, cooccurrence, decode_mask, flags_to_mask,
+                      has_mistake, mask_of, mistake_counts, mistake_flags)
+
+ALL_SUBSETS = [list(combo) for n in range(len(MISTAKE_TYPES) + 1)
+               for combo in itertools.combinations(MISTAKE_TYPES, n)]
+
+def test_registry_bits_are_unique_and_drive_the_model():
+    bits = [m["bit"] for m in MISTAKE_REGISTRY]
+    assert sorted(bits) == list(range(len(bits)))
+    result = dict(intent="other", satisfaction="neutral", quality_score=3, is_problem_solved=True,
+                  thought_process="-", agent_mistakes=[MISTAKE_REGISTRY[-1]["name"]])
+    assert SupportEvaluationResult.model_validate(result).agent_mistakes == [MISTAKE_REGISTRY[-1]["name"]]
+    with pytest.raises(ValidationError):
+        SupportEvaluationResult.model_validate({**result, "agent_mistakes": ["made_up"]})
+
+@pytest.mark.parametrize("names", ALL_SUBSETS)
+def test_encode_decode_round_trip(names):
+    assert decode_mask(mask_of(names)) == names
+
+def test_flags_round_trip_and_legacy_folding():
+    masks = np.array([mask_of(names) for names in ALL_SUBSETS])
+    flags = pd.DataFrame(mistake_flags(masks), columns=[f'mistake_{m}' for m in MISTAKE_TYPES])
+    folded = flags_to_mask(flags)
+    assert folded.dtype == MASK_DTYPE
+    assert folded.tolist() == masks.tolist()
+
+def test_filters_counts_and_cooccurrence():
+    masks = [mask_of(["rude_tone"]), mask_of(["rude_tone", "no_resolution"]), 0]
+    assert has_mistake(masks, ["rude_tone", "no_resolution"]).tolist() == [True, True, False]
+    assert has_mistake(masks, ["rude_tone", "no_resolution"], require_all=True).tolist() == [False, True, False]
+    counts = mistake_counts(masks)
+    assert (counts["rude_tone"], counts["no_resolution"], counts["ignored_question"]) == (2, 1, 0)
+    # Weights stand for several chats sharing one mask
+    weighted = cooccurrence(masks, weights=[3, 2, 10])
+    assert weighted.loc["rude_tone", "rude_tone"] == 5
+    assert weighted.loc["rude_tone", "no_resolution"] == weighted.loc["no_resolution", "rude_tone"] == 2
+    assert mistake_counts(masks, weights=[3, 2, 10]).tolist() == np.diag(weighted).tolist()
+
+def test_read_analytics_folds_legacy_boolean_columns(tmp_path):
+    path = tmp_path / "legacy.csv"
+    legacy = pd.DataFrame({"chat_id": [1, 2], "intent": ["other", "refund_request"]})
+    for mistake in MISTAKE_TYPES:
+        legacy[f'mistake_{mistake}'] = [mistake == "rude_tone", mistake in ("rude_tone", "incorrect_info")]
+    legacy.to_csv(path, index=False)
+
+    df = read_analytics(str(path), columns=["chat_id", "mistake_mask"])
+    assert df.columns.tolist() == ["chat_id", "mistake_mask"]
+    assert [decode_mask(mask) for mask in df["mistake_mask"]] == [["rude_tone"], ["incorrect_info", "rude_tone"]]
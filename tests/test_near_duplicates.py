@@ -0,0 +1,74 @@
+import json
+import random
+
+from conftest import EXAMPLE_CHATS, run_script
+from storage.near_duplicates import MinHashIndex, find_duplicates
+
+BASE = ("Доброго дня, я оформив замовлення минулого тижня, але посилка досі не прийшла. "
+        "Номер замовлення 48213, оплата пройшла карткою і гроші вже списані з рахунку. "
+        "Підкажіть будь ласка коли очікувати доставку та чи можна змінити адресу отримання.")
+
+def _perturb(text, changes, seed):
+    words = text.split()
+    rng = random.Random(seed)
+    for i in rng.sample(range(len(words)), changes):
+        words[i] = f"слово{i}"
+    return " ".join(words)
+
+def test_index_matches_near_duplicates_and_skips_different_chats():
+    index = MinHashIndex(threshold=0.8)
+    index.add("base", BASE)
+    assert index.query(BASE) == ("base", 1.0)
+    assert index.query(BASE + " Дякую.")[0] == "base"
+    assert index.query("Hello, I would like to cancel my subscription and get a refund for last month.") is None
+    assert index.add_if_new("copy", BASE)[0] == "base"
+    assert len(index) == 1
+
+def test_lsh_recall_follows_the_band_curve():
+    # A changed last word keeps the Jaccard similarity near 0.95, where 16 bands
+    # of 8 rows make a pair a candidate with probability ~0.998
+    found = sum(_found(BASE, f"{BASE.rsplit(' ', 1)[0]} варіант{seed}") for seed in range(50))
+    assert found >= 48
+    # A third of the words replaced puts the pairs far below the threshold
+    assert not any(_found(BASE, _perturb(BASE, 14, seed)) for seed in range(50))
+
+def _found(a, b):
+    index = MinHashIndex(0.8)
+    index.add("a", a)
+    return index.query(b) is not None
+
+def test_find_duplicates_streams_repeats():
+    items = [(1, BASE), (2, "Зовсім інше питання про повернення коштів за підписку."), (3, BASE)]
+    assert [(key, first) for key, first, _ in find_duplicates(items)] == [(3, 1)]
+
+def test_dedupe_script_writes_output_and_removes_its_journal(tmp_path):
+    chats = json.loads(EXAMPLE_CHATS.read_text(encoding="utf-8"))[:30]
+    source = tmp_path / "chats.json"
+    source.write_text(json.dumps(chats + chats[:5], ensure_ascii=False), encoding="utf-8")
+    output, report = tmp_path / "dedup.json", tmp_path / "report.json"
+    run = run_script("dedupe.py", "--input", source, "--output", output, "--report", report)
+    assert run.returncode == 0, run.stderr
+
+    kept = json.loads(output.read_text(encoding="utf-8"))
+    assert len(kept) == len({json.dumps(chat, sort_keys=True) for chat in chats})
+    duplicates = json.loads(report.read_text(encoding="utf-8"))["duplicates"]
+    assert {pair["record"] for pair in duplicates} >= set(range(31, 36))
+    assert not (tmp_path / "dedup.jsonl").exists()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["chats.json", "dedup.json", "report.json"]
+
+def test_dedupe_script_handles_an_empty_input(tmp_path):
+    source, output = tmp_path / "chats.json", tmp_path / "dedup.json"
+    source.write_text("[]", encoding="utf-8")
+    run = run_script("dedupe.py", "--input", source, "--output", output)
+    assert run.returncode == 0, run.stderr
+    assert json.loads(output.read_text(encoding="utf-8")) == []
+    assert "Scanned 0 records" in run.stdout
+    assert not (tmp_path / "dedup.jsonl").exists()
+
+def test_dedupe_script_keeps_no_output_after_a_failed_scan(tmp_path):
+    source, output = tmp_path / "chats.json", tmp_path / "dedup.json"
+    chats = json.loads(EXAMPLE_CHATS.read_text(encoding="utf-8"))[:3]
+    source.write_text(json.dumps(chats, ensure_ascii=False)[:-40], encoding="utf-8")
+    run = run_script("dedupe.py", "--input", source, "--output", output)
+    assert run.returncode != 0
+    assert not output.exists()
@@ -0,0 +1,42 @@
+import json
+
+from conftest import run_script
+
+def _pipeline(tmp_path, *extra, cache=False):
+    metrics = tmp_path / "metrics.json"
+    cache_args = ("--cache-dir", tmp_path / "cache") if cache else ("--no-cache",)
+    run = run_script("pipeline.py", "--provider", "fake", "--count", "5", *cache_args,
+                     "--chats-output", tmp_path / "chats.json", "--output", tmp_path / "results.json",
+                     "--metrics-output", metrics, *extra)
+    assert run.returncode == 0, run.stderr
+    calls = sum(m["calls"] for m in json.loads(metrics.read_text(encoding="utf-8"))["models"].values())
+    return run.stdout, calls
+
+def test_resume_judges_leftover_chats_then_generates_the_rest(tmp_path):
+    # An interrupted run left generated chats that were never judged
+    run = run_script("generate.py", "--provider", "fake", "--count", "3", "--no-cache", "--output", tmp_path / "chats.json")
+    assert run.returncode == 0, run.stderr
+
+    stdout, calls = _pipeline(tmp_path)
+    assert "3 existing chats, 2 to generate" in stdout
+    assert calls == 2 + 5
+    chats = json.loads((tmp_path / "chats.json").read_text(encoding="utf-8"))
+    results = json.loads((tmp_path / "results.json").read_text(encoding="utf-8"))
+    assert len(chats) == 5
+    assert [r["original_chat"] for r in results] == chats
+    assert [r["chat_id"] for r in results] == [1, 2, 3, 4, 5]
+    assert all("result" in r["analysis"] for r in results)
+
+    # Everything is checkpointed: running the same command again makes no calls
+    stdout, calls = _pipeline(tmp_path)
+    assert "5 existing chats, 0 to generate" in stdout
+    assert calls == 0
+    assert json.loads((tmp_path / "results.json").read_text(encoding="utf-8")) == results
+
+def test_a_separate_judge_provider_is_reported(tmp_path):
+    stdout, calls = _pipeline(tmp_path, "--judge-model", "fake-support-model-small", cache=True)
+    assert calls == 10
+    assert "\nResponse cache: " in stdout and "\nJudge response cache: " in stdout
+    metrics = json.loads((tmp_path / "metrics.json").read_text(encoding="utf-8"))["models"]
+    assert {name: m["calls"] for name, m in metrics.items()} == {
+        "fake/fake-support-model": 5, "fake/fake-support-model-small": 5}
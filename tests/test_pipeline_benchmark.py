@@ -0,0 +1,46 @@
+import json
+import sys
+
+from conftest import EXAMPLE_CHATS, REPO_ROOT, run_script
+from storage.jsonl_store import iter_records
+from storage.resume_index import chat_fingerprint
+
+sys.path.insert(0, str(REPO_ROOT / "benchmarks"))
+from pipeline import compare_to_baseline, write_scaled
+
+def test_benchmark_reports_every_stage(tmp_path):
+    report_path = tmp_path / "report.json"
+    run = run_script("benchmarks/pipeline.py", "--stages", "generate,analyze,aggregate", "--generate-counts", "4",
+                     "--analyze-scales", "10", "--scales", "300", "--work-dir", tmp_path / "work", "--output", report_path,
+                     timeout=300)
+    assert run.returncode == 0, run.stderr
+    report = json.loads(report_path.read_text(encoding="utf-8"))
+    rows = {(r["stage"], r["dataset"]): r["rows"] for r in report["results"]}
+    assert rows[("generate", "synthetic-4")] == 4
+    assert rows[("analyze", "synthetic-10")] == 10
+    assert rows[("aggregate", "synthetic-300")] == 300
+    assert all(r["rows_per_sec"] > 0 for r in report["results"])
+    assert report["regressions"] == []
+
+def test_scaled_copies_get_distinct_fingerprints(tmp_path):
+    path = write_scaled(EXAMPLE_CHATS, 600, tmp_path / "chats.jsonl", "chats")
+    chats = list(iter_records(str(path)))
+    assert len(chats) == 600
+    copy = dict(chats[260])
+    assert copy.pop("benchmark_copy") == 1 and copy == chats[0]
+    assert chat_fingerprint(chats[260]) != chat_fingerprint(chats[0])
+    assert len({chat_fingerprint(chat) for chat in chats}) > 590
+
+def test_throughput_drops_beyond_the_tolerance_are_regressions(tmp_path):
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps({"results": [
+        {"stage": "analyze", "dataset": "a", "rows_per_sec": 100.0},
+        {"stage": "aggregate", "dataset": "b", "rows_per_sec": 100.0},
+    ]}), encoding="utf-8")
+    report = {"results": [
+        {"stage": "analyze", "dataset": "a", "rows_per_sec": 85.0},
+        {"stage": "aggregate", "dataset": "b", "rows_per_sec": 70.0},
+        {"stage": "generate", "dataset": "new", "rows_per_sec": 1.0},
+    ]}
+    assert compare_to_baseline(report, str(baseline), 0.2) == ["aggregate/b: 100.0 -> 70.0 rows/sec"]
+    assert report["results"][0]["vs_baseline"] == 0.85
@@ -0,0 +1,38 @@
+import json
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+import llm_factory
+from conftest import REPO_ROOT
+from providers.base import LLMProvider
+
+class PluginProvider(LLMProvider):
+    def __init__(self, model_name: str = "plugin-default"):
+        self.model_name = model_name
+
+    def name(self) -> str:
+        return "plugin"
+
+def _sdks_loaded_by(code: str) -> list:
+    probe = f"{code}; import sys, json; print(json.dumps([m for m in ('groq', 'google.genai', 'ollama') if m in sys.modules]))"
+    run = subprocess.run([sys.executable, "-c", probe], cwd=REPO_ROOT, capture_output=True, text=True,
+                         env={"GROQ_API_KEY": "test", "PATH": ""}, check=True)
+    return json.loads(run.stdout.strip().splitlines()[-1])
+
+def test_entry_points_import_no_provider_sdk():
+    assert _sdks_loaded_by("import analyze, generate") == []
+
+def test_a_provider_imports_only_its_own_sdk():
+    assert _sdks_loaded_by("import llm_factory; llm_factory.get_llm_provider('groq')") == ["groq"]
+
+def test_plugins_register_through_entry_points(monkeypatch):
+    plugin = SimpleNamespace(name="plugin", load=lambda: PluginProvider)
+    monkeypatch.setattr(llm_factory, "entry_points", lambda group: [plugin] if group == llm_factory.ENTRY_POINT_GROUP else [])
+    assert "plugin" in llm_factory.available_providers()
+    assert llm_factory.get_llm_provider("Plugin").model_name == "plugin-default"
+    assert llm_factory.get_llm_provider("plugin", model_name="custom").model_name == "custom"
+    with pytest.raises(ValueError, match="Unknown provider type"):
+        llm_factory.get_llm_provider("missing")
@@ -0,0 +1,112 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from providers.base import (AdaptiveConcurrency, RateLimiter, TokenBucket, estimate_tokens,
+                            is_rate_limit_error, resolve_rate_limits, retry_after_seconds)
+
+class RateLimitError(Exception):
+    def __init__(self, retry_after=None):
+        super().__init__("429 Too Many Requests")
+        self.status_code = 429
+        self.response = SimpleNamespace(headers={"retry-after": retry_after} if retry_after else {})
+
+def test_token_bucket_allows_a_burst_then_queues_callers():
+    bucket = TokenBucket(60)  # one token per second
+    assert all(bucket.reserve(1) == 0.0 for _ in range(60))
+    assert bucket.reserve(1) == pytest.approx(1.0, abs=0.05)
+    # Going into debt makes the next caller wait behind the previous one
+    assert bucket.reserve(1) == pytest.approx(2.0, abs=0.05)
+
+def test_token_bucket_caps_oversized_requests_at_capacity():
+    bucket = TokenBucket(600)
+    assert bucket.reserve(10_000) == 0.0
+    assert bucket.reserve(10) == pytest.approx(1.0, abs=0.05)
+
+def test_aimd_window_halves_on_throttling_and_grows_back():
+    window = AdaptiveConcurrency(8)
+    assert all(window.try_acquire() for _ in range(8))
+    assert not window.try_acquire()
+    window.release(throttled=True)
+    assert window.limit == 4.0
+    for _ in range(3):
+        window.release(throttled=True)
+    assert window.limit == 1.0  # never below one request in flight
+    for _ in range(20):
+        window.try_acquire()
+        window.release()
+    assert 5.0 < window.limit <= 8.0
+    for _ in range(200):
+        window.try_acquire()
+        window.release()
+    assert window.limit == 8.0
+
+def test_async_acquire_waits_for_a_release():
+    window = AdaptiveConcurrency(1)
+
+    async def scenario():
+        await window.aacquire()
+        waiter = asyncio.create_task(window.aacquire())
+        await asyncio.sleep(0.1)
+        assert not waiter.done()
+        window.release()
+        await asyncio.wait_for(waiter, 1.0)
+        return window.in_flight
+
+    assert asyncio.run(scenario()) == 1
+
+def test_async_waiters_are_woken_by_a_release_from_another_thread():
+    window = AdaptiveConcurrency(1)
+    window.acquire()
+
+    async def scenario():
+        cancelled = asyncio.create_task(window.aacquire())
+        waiter = asyncio.create_task(window.aacquire())
+        await asyncio.sleep(0.05)
+        cancelled.cancel()
+        released_at = time.perf_counter()
+        threading.Thread(target=window.release).start()
+        await asyncio.wait_for(waiter, 1.0)
+        return time.perf_counter() - released_at
+
+    # Woken by the release itself, not by polling
+    assert asyncio.run(scenario()) < 0.03
+    assert window.in_flight == 1 and window._async_waiters == []
+
+def test_rate_limit_detection_and_retry_after():
+    error = RateLimitError(retry_after="3")
+    assert is_rate_limit_error(error)
+    assert retry_after_seconds(error) == 3.0
+    try:
+        try:
+            raise error
+        except RateLimitError as cause:
+            raise RuntimeError("wrapped by the SDK") from cause
+    except RuntimeError as wrapped:
+        assert is_rate_limit_error(wrapped) and retry_after_seconds(wrapped) == 3.0
+    genai_error = Exception("429 RESOURCE_EXHAUSTED {'retryDelay': '12s'}")
+    assert retry_after_seconds(genai_error) == 12.0
+    assert not is_rate_limit_error(ValueError("bad request"))
+
+def test_retry_after_blocks_every_caller_of_the_quota():
+    limiter = RateLimiter(rpm=None, tpm=None, max_concurrency=4)
+    limiter.acquire(100)
+    limiter.release(RateLimitError(retry_after="0.3"))
+    assert limiter.concurrency.limit == 2.0
+    start = time.monotonic()
+    limiter.acquire(100)
+    assert time.monotonic() - start >= 0.25
+    limiter.release()
+
+def test_limits_merge_provider_model_and_env(monkeypatch):
+    assert resolve_rate_limits("groq", "llama-3.3-70b-versatile") == {"rpm": 30, "tpm": 12000, "max_concurrency": 8}
+    assert resolve_rate_limits("unknown") == {"rpm": None, "tpm": None, "max_concurrency": 4}
+    monkeypatch.setenv("GROQ_TPM", "500")
+    assert resolve_rate_limits("groq", "llama-3.3-70b-versatile")["tpm"] == 500
+
+def test_token_estimate_counts_prompt_and_completion():
+    messages = [{"role": "system", "content": "x" * 400}, {"role": "user", "content": "y" * 400}]
+    assert estimate_tokens(messages) == 200 + 512
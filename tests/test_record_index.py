@@ -0,0 +1,37 @@
+import json
+
+from conftest import EXAMPLE_RESULTS
+from storage.jsonl_store import write_records
+from storage.record_index import RecordIndex
+
+def _results(count):
+    return json.loads(EXAMPLE_RESULTS.read_text(encoding="utf-8"))[:count]
+
+def test_build_writes_the_index_and_sidecar_without_leftovers(tmp_path):
+    source = tmp_path / "results.json"
+    write_records(str(source), _results(12))
+    index = RecordIndex.build(str(source), str(tmp_path / "index" / "results.idx.npy"),
+                              keep=lambda record: record["chat_id"] % 2 == 0)
+    assert len(index) == 6 and index.meta["rows"] == 6 and not index.is_stale()
+    assert index.read(index.find(4))["chat_id"] == 4
+    index.close()
+    assert sorted(p.name for p in (tmp_path / "index").iterdir()) == ["results.idx.json", "results.idx.npy"]
+
+def test_an_interrupted_rebuild_reads_as_stale(tmp_path):
+    source, index_path = tmp_path / "results.json", tmp_path / "results.idx.npy"
+    write_records(str(source), _results(12))
+    RecordIndex.build(str(source), str(index_path)).close()
+    old_meta = (tmp_path / "results.idx.json").read_text(encoding="utf-8")
+
+    # The offsets of a new build were written, the sidecar was not
+    write_records(str(source), _results(10))
+    RecordIndex.build(str(source), str(index_path)).close()
+    (tmp_path / "results.idx.json").write_text(old_meta, encoding="utf-8")
+    reopened = RecordIndex(str(index_path))
+    assert not reopened.consistent and reopened.is_stale()
+
+    # Sidecars written before the row count was recorded are rebuilt too
+    meta = json.loads(old_meta)
+    del meta["rows"]
+    (tmp_path / "results.idx.json").write_text(json.dumps(meta), encoding="utf-8")
+    assert RecordIndex(str(index_path)).is_stale()
@@ -0,0 +1,100 @@
+import math
+import time
+
+import pytest
+from pydantic import BaseModel
+from tenacity import wait_none
+
+import providers.base as base
+from providers.base import (AUTH, CIRCUIT_OPEN, RATE_LIMIT, TRANSIENT, VALIDATION, CircuitBreaker,
+                            CircuitOpenError, RetryBudget, classify_error)
+from providers.fake import FakeProvider
+from providers.fake_server import FakeServerConfig, start_fake_server
+
+class Answer(BaseModel):
+    answer: str
+
+@pytest.fixture
+def server(monkeypatch):
+    # Retries without backoff keep the tests fast; the attempt counts stay those of RETRY_POLICY
+    monkeypatch.setitem(base.RETRY_POLICY, TRANSIENT, (base.RETRY_POLICY[TRANSIENT][0], wait_none()))
+    monkeypatch.setattr(base, "_retry_budget", RetryBudget(ratio=0.2, min_retries=100))
+    server = start_fake_server(config=FakeServerConfig(error_rate=1.0, seed=1))
+    yield server
+    server.shutdown()
+
+def _provider(server, request):
+    # Breakers are shared per (provider, model), so each test gets its own model name
+    return FakeProvider(model_name=f"resilience-{request.node.name}", host=server.base_url)
+
+def test_breaker_opens_fails_fast_and_closes_after_a_probe(server, request, monkeypatch):
+    monkeypatch.setenv("FAKE_BREAKER_FAILURES", "3")
+    monkeypatch.setenv("FAKE_BREAKER_COOLDOWN", "0.3")
+    provider = _provider(server, request)
+    breaker = provider.circuit_breaker
+
+    for _ in range(3):
+        with pytest.raises(Exception) as failure:
+            provider.generate("hello", response_model=Answer)
+        assert classify_error(failure.value) == TRANSIENT
+    assert breaker.state == "open"
+    assert server.stats["requests"] == 9  # three calls of three attempts each
+
+    with pytest.raises(CircuitOpenError):
+        provider.generate("hello", response_model=Answer)
+    assert server.stats["requests"] == 9
+    assert breaker.stats()["rejected_calls"] == 1
+
+    # A failed probe reopens the breaker with a doubled cooldown and no retries
+    time.sleep(0.35)
+    with pytest.raises(Exception):
+        provider.generate("hello", response_model=Answer)
+    assert server.stats["requests"] == 10
+    assert breaker.state == "open" and breaker.cooldown == pytest.approx(0.6)
+
+    server.config.error_rate = 0.0
+    time.sleep(0.65)
+    assert provider.generate("hello", response_model=Answer).answer
+    assert breaker.state == "closed" and breaker.failures == 0 and breaker.cooldown == pytest.approx(0.3)
+    assert breaker.stats()["trips"] == 2
+
+def test_retry_budget_stops_retries_once_spent(server, request, monkeypatch):
+    budget = RetryBudget(ratio=0.0, min_retries=3)
+    monkeypatch.setattr(base, "_retry_budget", budget)
+    provider = _provider(server, request)
+
+    for expected_requests in (3, 5, 6):
+        with pytest.raises(Exception):
+            provider.generate("hello", response_model=Answer)
+        assert server.stats["requests"] == expected_requests
+    assert budget.stats() == {"calls": 3, "retries": 3, "denied": 2, "limit": 3}
+    assert base.resilience_summary()["retry_budget"]["denied"] == 2
+
+def test_breaker_transitions_by_error_class():
+    breaker = CircuitBreaker("test/model", failure_threshold=2, cooldown=0.05, max_cooldown=0.1)
+    breaker.record(TRANSIENT)
+    breaker.record(VALIDATION)  # an answer, even an invalid one, resets the failure count
+    breaker.record(RATE_LIMIT)
+    assert breaker.state == "closed" and breaker.allows_retry()
+    breaker.record(RATE_LIMIT)
+    assert breaker.state == "open" and not breaker.allows_retry()
+
+    time.sleep(0.06)
+    breaker.before_call()
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # only one probe at a time
+    breaker.record(TRANSIENT)
+    assert breaker.state == "open" and breaker.cooldown == 0.1  # a failed probe doubles the cooldown
+    time.sleep(0.11)
+    breaker.before_call()
+    breaker.record(TRANSIENT)
+    assert breaker.cooldown == 0.1  # capped at max_cooldown
+
+    breaker.record(AUTH)
+    assert breaker.state == "open" and breaker.opened_until == math.inf
+    with pytest.raises(CircuitOpenError, match="until restarted"):
+        breaker.before_call()
+
+def test_circuit_open_is_its_own_error_class():
+    assert classify_error(CircuitOpenError("open")) == CIRCUIT_OPEN
@@ -0,0 +1,81 @@
+import time
+from types import SimpleNamespace
+
+from pydantic import BaseModel
+
+from providers.base import LLMProvider
+from providers.cache import ResponseCache
+
+class Verdict(BaseModel):
+    score: int
+    comment: str
+
+class CountingProvider(LLMProvider):
+    model_name = "counting-model"
+
+    def __init__(self):
+        self.calls = 0
+        self.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=self._create)))
+
+    def _create(self, messages, **kwargs):
+        self.calls += 1
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=f"answer {self.calls}"))])
+
+    def _get_generation_kwargs(self) -> dict:
+        return {"temperature": 0, "seed": 42}
+
+    def name(self) -> str:
+        return "counting"
+
+def _key(**overrides):
+    args = {"provider": "groq", "model": "m", "system_prompt": "sys", "prompt": "p",
+            "response_model": Verdict, "generation_kwargs": {"temperature": 0, "seed": 42}}
+    args.update(overrides)
+    return ResponseCache.make_key(**args)
+
+def test_key_is_stable_and_covers_every_input():
+    assert _key() == _key(generation_kwargs={"seed": 42, "temperature": 0})
+    variants = [_key(provider="gemini"), _key(model="other"), _key(system_prompt=None), _key(prompt="q"),
+                _key(response_model=None), _key(generation_kwargs={"temperature": 0.7, "seed": 42})]
+    assert len({_key(), *variants}) == len(variants) + 1
+
+def test_entries_survive_reopening_and_validate_into_the_model(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.put(_key(), Verdict(score=4, comment="Дякую"))
+    cache.close()
+
+    reopened = ResponseCache(str(tmp_path))
+    assert reopened.get(_key(), Verdict) == Verdict(score=4, comment="Дякую")
+    assert reopened.get(_key(prompt="other")) is None
+    assert reopened.stats()["hits"] == 1 and reopened.stats()["misses"] == 1
+
+class Renamed(BaseModel):
+    verdict: str
+
+def test_entries_that_no_longer_validate_are_misses(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.put(_key(), {"score": 4, "comment": "ok"})
+    assert cache.get(_key(), Renamed) is None
+    assert cache.stats()["misses"] == 1
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_size_mb=1)
+    cache.max_size_bytes = 1100
+    payload = "x" * 300  # ~302 bytes once serialized
+    for name in ("a", "b", "c"):
+        cache.put(name, payload)
+        time.sleep(0.01)
+    assert cache.get("a") == payload  # "a" becomes the most recently used entry
+    time.sleep(0.01)
+    cache.put("d", payload)
+    assert cache.get("b") is None
+    assert all(cache.get(name) == payload for name in ("a", "c", "d"))
+    assert cache.stats()["size_bytes"] <= 990
+
+def test_generate_answers_repeated_prompts_from_the_cache(tmp_path):
+    provider = CountingProvider()
+    provider.response_cache = ResponseCache(str(tmp_path))
+    assert provider.generate("hello", system_prompt="sys") == "answer 1"
+    assert provider.generate("hello", system_prompt="sys") == "answer 1"
+    assert provider.generate("hello again", system_prompt="sys") == "answer 2"
+    assert provider.calls == 2
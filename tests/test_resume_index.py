@@ -0,0 +1,62 @@
+import json
+
+from conftest import run_script
+from storage.jsonl_store import iter_records
+from storage.resume_index import ResumeIndex, chat_fingerprint, DONE, FAILED, SKIPPED
+
+def test_fingerprint_ignores_key_order():
+    chat = {"messages": [{"role": "client", "text": "Привіт"}], "scenario": {"intent": "refund_request"}}
+    reordered = {"scenario": {"intent": "refund_request"}, "messages": [{"text": "Привіт", "role": "client"}]}
+    assert chat_fingerprint(chat) == chat_fingerprint(reordered)
+    assert chat_fingerprint(chat) != chat_fingerprint({**chat, "scenario": {"intent": "other"}})
+
+def test_index_reloads_latest_status_and_ignores_a_torn_line(tmp_path):
+    index = ResumeIndex.for_output(str(tmp_path / "results.json"))
+    index.mark("a", FAILED, chat_id=1, error="timeout")
+    index.mark("b", SKIPPED, chat_id=2)
+    index.mark("a", DONE, chat_id=1)
+    with open(index.path, "a", encoding="utf-8") as f:
+        f.write('{"hash": "c", "sta')
+
+    reloaded = ResumeIndex(str(index.path))
+    assert (reloaded.get("a"), reloaded.get("b"), reloaded.get("c")) == (DONE, SKIPPED, None)
+    assert reloaded.count(DONE) == 1
+
+def test_rebuild_keeps_failed_and_skipped_chats(tmp_path):
+    index = ResumeIndex(str(tmp_path / "index.jsonl"))
+    chats = [{"messages": [{"role": "client", "text": f"chat {i}"}]} for i in range(3)]
+    index.mark(chat_fingerprint(chats[0]), FAILED)
+    index.mark(chat_fingerprint(chats[2]), SKIPPED)
+    index.mark("stale", DONE)
+
+    index.rebuild([{"chat_id": 1, "original_chat": chats[0]}, {"chat_id": 2, "original_chat": chats[1]}])
+    reloaded = ResumeIndex(str(index.path))
+    assert reloaded.status == {chat_fingerprint(chats[0]): DONE, chat_fingerprint(chats[1]): DONE,
+                               chat_fingerprint(chats[2]): SKIPPED}
+    assert [p.name for p in tmp_path.iterdir()] == ["index.jsonl"]
+
+def test_failed_chats_are_held_back_until_retried(tmp_path, example_chats):
+    chats = example_chats(10)
+    output = tmp_path / "results.json"
+    analyze = ["analyze.py", "--provider", "fake", "--no-cache", "--concurrency", "4", "--input", chats, "--output", output]
+    no_retries = {"LLM_RETRY_BUDGET_RATIO": "0", "LLM_RETRY_BUDGET_MIN": "0", "FAKE_BREAKER_FAILURES": "100"}
+
+    failing = run_script(*analyze, env={"FAKE_LLM_ERROR_RATE": "1", **no_retries})
+    assert failing.returncode == 0, failing.stderr
+    index = ResumeIndex.for_output(str(output))
+    assert index.count(FAILED) == 10 and index.count(DONE) == 0
+
+    held_back = run_script(*analyze)
+    assert "Analyzing chat" not in held_back.stdout
+    assert ResumeIndex.for_output(str(output)).count(FAILED) == 10
+
+    retried = run_script(*analyze, "--retry", FAILED)
+    assert retried.returncode == 0, retried.stderr
+    assert sorted(r["chat_id"] for r in iter_records(str(output))) == list(range(1, 11))
+    assert ResumeIndex.for_output(str(output)).count(DONE) == 10
+
+    # A lost index is rebuilt from the results, so nothing is judged twice
+    index.path.unlink()
+    again = run_script(*analyze)
+    assert "Analyzing chat" not in again.stdout
+    assert len(json.loads(output.read_text(encoding="utf-8"))) == 10
@@ -0,0 +1,29 @@
+import random
+import statistics
+
+from providers.telemetry import LATENCY_SAMPLE_SIZE, CallStats, MetricsRegistry
+
+def _record(registry, wall_time):
+    stats = CallStats("fake", "fake-support-model")
+    stats.wall_time = wall_time
+    registry.record(stats)
+
+def test_small_runs_report_exact_percentiles():
+    registry = MetricsRegistry()
+    latencies = [ms / 1000 for ms in range(1, 101)]
+    for latency in latencies:
+        _record(registry, latency)
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+    assert registry.summary()["models"]["fake/fake-support-model"]["latency_s"] == {
+        "p50": round(cuts[49], 3), "p95": round(cuts[94], 3), "p99": round(cuts[98], 3)}
+
+def test_latency_sample_stays_bounded_on_long_runs():
+    registry = MetricsRegistry()
+    rng = random.Random(1)
+    for _ in range(20 * LATENCY_SAMPLE_SIZE):
+        _record(registry, rng.uniform(0, 2))
+    model = registry._models[("fake", "fake-support-model")]
+    assert len(model.latencies) == LATENCY_SAMPLE_SIZE
+    assert sum(model.bucket_counts) == model.calls == 20 * LATENCY_SAMPLE_SIZE
+    latency = registry.summary()["models"]["fake/fake-support-model"]["latency_s"]
+    assert abs(latency["p50"] - 1.0) < 0.1 and abs(latency["p95"] - 1.9) < 0.1
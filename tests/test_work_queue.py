@@ -0,0 +1,103 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from storage.jsonl_store import iter_records
+from storage.resume_index import DONE, FAILED
+from storage.work_queue import WorkQueue, LEASED, PENDING
+from conftest import run_script
+
+def chats(count):
+    return [(i, {"messages": [{"role": "user", "content": f"chat {i}"}]}) for i in range(count)]
+
+def test_concurrent_workers_lease_each_chat_once(tmp_path):
+    db = tmp_path / "queue.sqlite"
+    WorkQueue(db).enqueue(chats(200))
+    leased = []
+    lock = threading.Lock()
+
+    def worker(name):
+        queue = WorkQueue(db)
+        while True:
+            items = queue.lease(name, limit=7)
+            if not items:
+                return
+            for fingerprint, position, chat in items:
+                with lock:
+                    leased.append(position)
+                queue.ack(fingerprint, {"chat_id": position + 1})
+
+    with ThreadPoolExecutor(4) as pool:
+        list(pool.map(worker, [f"w{i}" for i in range(4)]))
+    assert sorted(leased) == list(range(200))
+    assert WorkQueue(db).counts()[DONE] == 200
+
+def test_expired_lease_is_taken_over_and_old_worker_cannot_fail_it(tmp_path):
+    queue = WorkQueue(tmp_path / "queue.sqlite", lease_seconds=0.05)
+    queue.enqueue(chats(1))
+    [(fingerprint, _, _)] = queue.lease("slow")
+    time.sleep(0.1)
+    assert queue.lease("fast") != []
+    assert queue.fail("slow", fingerprint, "timeout") is False
+    assert queue.counts()[LEASED] == 1
+    assert queue.fail("fast", fingerprint, "boom") is True
+    assert queue.counts()[PENDING] == 1
+
+def test_renew_keeps_a_slow_lease(tmp_path):
+    queue = WorkQueue(tmp_path / "queue.sqlite", lease_seconds=0.2)
+    queue.enqueue(chats(1))
+    queue.lease("slow")
+    for _ in range(3):
+        time.sleep(0.1)
+        queue.renew("slow")
+    assert queue.lease("other") == []
+
+def test_failures_stop_after_max_attempts(tmp_path):
+    queue = WorkQueue(tmp_path / "queue.sqlite", max_attempts=2)
+    queue.enqueue(chats(1))
+    for _ in range(2):
+        [(fingerprint, _, _)] = queue.lease("w")
+        queue.fail("w", fingerprint, "boom")
+    assert queue.counts()[FAILED] == 1
+
+def test_only_one_worker_wins_the_merge(tmp_path):
+    db = tmp_path / "queue.sqlite"
+    queue = WorkQueue(db)
+    queue.enqueue(chats(3))
+    for fingerprint, position, _ in queue.lease("w", limit=3):
+        queue.ack(fingerprint, {"chat_id": position + 1})
+    with ThreadPoolExecutor(8) as pool:
+        claims = list(pool.map(lambda i: WorkQueue(db).claim_merge(f"w{i}"), range(8)))
+    assert claims.count(None) == 1
+    # A retry round changes items, so the next drain merges again
+    queue.requeue([DONE])
+    for fingerprint, position, _ in queue.lease("w", limit=3):
+        queue.ack(fingerprint, {"chat_id": position + 1})
+    assert queue.claim_merge("w") is None
+
+def test_merge_leaves_the_resume_journal_alone(tmp_path):
+    queue = WorkQueue(tmp_path / "queue.sqlite")
+    queue.enqueue(chats(2))
+    for fingerprint, position, _ in queue.lease("w", limit=2):
+        queue.ack(fingerprint, {"chat_id": position + 1})
+    journal = tmp_path / "out.jsonl"
+    journal.write_text('{"chat_id": 99}\n', encoding="utf-8")
+    assert queue.merge(str(tmp_path / "out.json")) == 2
+    assert [r["chat_id"] for r in iter_records(str(tmp_path / "out.json"))] == [1, 2]
+    assert journal.read_text(encoding="utf-8") == '{"chat_id": 99}\n'
+    assert not list(tmp_path.glob("*.tmp")) and not list(tmp_path.glob(".*.tmp"))
+
+def test_concurrent_queue_workers_end_to_end(tmp_path, example_chats):
+    source = example_chats(20)
+    output = tmp_path / "out.json"
+    env = {"FAKE_LLM_LATENCY": "fixed:0.02", "FAKE_LLM_REPLAY": "data/examples/groq_analysis_130.json"}
+    args = ["analyze.py", "--provider", "fake", "--no-cache", "--input", source, "--output", output,
+            "--queue", tmp_path / "queue.sqlite"]
+    with ThreadPoolExecutor(4) as pool:
+        runs = list(pool.map(lambda i: run_script(*args, "--worker-id", f"w{i}", env=env), range(4)))
+    for run in runs:
+        assert run.returncode == 0, run.stderr
+    assert sum("Merged 20 analysis results" in run.stdout for run in runs) == 1
+    records = json.loads(output.read_text(encoding="utf-8"))
+    assert [r["chat_id"] for r in records] == list(range(1, 21))